@@ -0,0 +1,176 @@
+"""
+Tjek af indkomne valgstedsresultater for tastefejl og ombytninger.
+
+Et fejlindtastet valgsted (et nul for meget, to partier byttet om) slår
+straks igennem i swing-estimatet. Hvert indkomne valgsted sammenlignes derfor
+med det forventede resultat:
+
+1. Forventet partifordeling: valgstedets fordeling ved forrige valg ganget
+   med det aktuelle swing (medianen af valgstedernes swing, så et enkelt
+   forkert valgsted ikke flytter det), plus den gennemsnitlige afvigelse på
+   de valgsteder der lignede det mest ved forrige valg
+2. Forventet størrelse: valgstedets stemmetal ved forrige valg ganget med
+   den typiske ændring i stemmetal
+
+Afvigelserne måles i robuste standardafvigelser (MAD over de optalte
+valgsteder), og scoren er den største afvigelse. Alt beregnes for hele
+batchen på én gang med arrays.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class Anomaliscore(NamedTuple):
+    """Scorer for en batch af valgsteder."""
+    # Største afvigelse i robuste standardafvigelser (NaN = kunne ikke scores)
+    score: np.ndarray
+    # Partiindeks med størst afvigelse i fordelingen (-1 = stemmetallet)
+    værste_parti: np.ndarray
+
+
+def _andele(stemmer: np.ndarray) -> np.ndarray:
+    """Rækkevise andele (nul-rækker giver nuller)."""
+    total = stemmer.sum(axis=1, keepdims=True)
+    return np.divide(stemmer, total, out=np.zeros_like(stemmer), where=total > 0)
+
+
+def _mad(x: np.ndarray) -> np.ndarray:
+    """Robust standardafvigelse (1.4826 × median absolut afvigelse) per søjle."""
+    return 1.4826 * np.median(np.abs(x - np.median(x, axis=0)), axis=0)
+
+
+def _nanmedian(x: np.ndarray) -> np.ndarray:
+    """
+    Median per søjle hvor NaN ignoreres (NaN for søjler uden værdier).
+
+    np.nanmedian går over maskerede arrays og er mange gange langsommere for
+    de små matricer her, så medianen tages direkte i den sorterede matrix,
+    hvor NaN lægger sig sidst.
+    """
+    sorteret = np.sort(x, axis=0)
+    antal = np.isfinite(x).sum(axis=0)
+    nedre = np.take_along_axis(sorteret, np.maximum((antal - 1) // 2, 0)[None, :], axis=0)[0]
+    øvre = np.take_along_axis(sorteret, np.maximum(antal // 2, 0)[None, :], axis=0)[0]
+    return np.where(antal > 0, (nedre + øvre) / 2, np.nan)
+
+
+class Anomalitjek:
+    """
+    Scorer valgsteder mod deres forventede resultat og markerer afvigere.
+    """
+
+    def __init__(
+        self,
+        grænse: float = 6.0,
+        karantæne: bool = True,
+        naboer: int = 5,
+        min_reference: int = 5,
+        min_andel_afvigelse: float = 0.01,
+        min_størrelse_afvigelse: float = 0.05
+    ):
+        """
+        Args:
+            grænse: Score (robuste standardafvigelser) over hvilken et
+                    valgsted er en afviger
+            karantæne: Hold afvigere ude af summerne (ellers markeres de kun)
+            naboer: Antal lignende valgsteder hvis afvigelse lægges til
+            min_reference: Færre valgsteder end dette scores ikke
+            min_andel_afvigelse: Mindste spredning på en partiandel (1 = 100%)
+            min_størrelse_afvigelse: Mindste spredning på log(stemmetal-ændring)
+        """
+        self.grænse = grænse
+        self.karantæne = karantæne
+        self.naboer = naboer
+        self.min_reference = min_reference
+        self.min_andel_afvigelse = min_andel_afvigelse
+        self.min_størrelse_afvigelse = min_størrelse_afvigelse
+
+    def _forventet(self, forrige_andele: np.ndarray, swing: np.ndarray, median_andel: np.ndarray) -> np.ndarray:
+        """Forrige fordeling × swing (nye partier: typisk andel), normaliseret."""
+        forventet = np.where(forrige_andele > 0, forrige_andele * swing, median_andel)
+        return _andele(np.nan_to_num(forventet))
+
+    def scor(
+        self,
+        nuværende: np.ndarray,
+        forrige: np.ndarray,
+        reference_nuværende: np.ndarray,
+        reference_forrige: np.ndarray,
+        reference_maske: Optional[np.ndarray] = None
+    ) -> Anomaliscore:
+        """
+        Scorer en batch af valgsteder.
+
+        Args:
+            nuværende: Stemmer per valgsted i batchen × parti
+            forrige: Samme valgsteders stemmer ved forrige valg
+            reference_nuværende: Stemmer per allerede optalt valgsted × parti
+            reference_forrige: De optalte valgsteders stemmer ved forrige valg
+            reference_maske: Batch × reference, True hvor referencen er samme
+                             valgsted (en rettelse må ikke sammenlignes med
+                             sin egen tidligere version)
+
+        Returns:
+            Anomaliscore med score og værste parti per valgsted
+        """
+        antal = len(nuværende)
+        score = np.full(antal, np.nan)
+        værste = np.full(antal, -1, dtype=np.int64)
+
+        # Swing og spredning findes ud fra de optalte valgsteder og batchen
+        # tilsammen - medianerne tåler et mindretal af fejl i begge
+        alle_nuværende = np.vstack((reference_nuværende, nuværende))
+        alle_forrige = np.vstack((reference_forrige, forrige))
+        kendt = (alle_forrige.sum(axis=1) > 0) & (alle_nuværende.sum(axis=1) > 0)
+        if kendt.sum() < self.min_reference:
+            return Anomaliscore(score, værste)
+
+        a, f = _andele(alle_nuværende[kendt]), _andele(alle_forrige[kendt])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            swing = _nanmedian(np.where(f > 0, a / f, np.nan))
+            median_andel = np.median(a, axis=0)
+            forventet = self._forventet(f, swing, median_andel)
+            rest = a - forventet
+            andel_spredning = np.maximum(_mad(rest), self.min_andel_afvigelse)
+
+            størrelse = np.log(alle_nuværende[kendt].sum(axis=1) / alle_forrige[kendt].sum(axis=1))
+            størrelse_median = np.median(størrelse)
+            størrelse_spredning = max(_mad(størrelse), self.min_størrelse_afvigelse)
+
+        scorbar = (forrige.sum(axis=1) > 0) & (nuværende.sum(axis=1) > 0)
+        if not scorbar.any():
+            return Anomaliscore(score, værste)
+
+        batch_a, batch_f = _andele(nuværende[scorbar]), _andele(forrige[scorbar])
+        batch_forventet = self._forventet(batch_f, swing, median_andel)
+
+        # Afvigelsen på de optalte valgsteder der lignede mest ved forrige valg
+        ref_kendt = kendt[:len(reference_nuværende)]
+        if self.naboer > 0 and ref_kendt.sum() > 0:
+            ref_f = f[:ref_kendt.sum()]
+            ref_rest = rest[:ref_kendt.sum()]
+            afstand = ((batch_f[:, None, :] - ref_f[None, :, :]) ** 2).sum(axis=2)
+            if reference_maske is not None:
+                afstand[reference_maske[scorbar][:, ref_kendt]] = np.inf
+            k = min(self.naboer, afstand.shape[1])
+            nærmeste = np.argpartition(afstand, k - 1, axis=1)[:, :k]
+            gyldig = np.isfinite(np.take_along_axis(afstand, nærmeste, axis=1))
+            nabo_rest = np.where(gyldig[:, :, None], ref_rest[nærmeste], 0.0).sum(axis=1)
+            nabo_rest /= np.maximum(gyldig.sum(axis=1, keepdims=True), 1)
+            batch_forventet = _andele(np.clip(batch_forventet + nabo_rest, 0, None))
+
+        # Afvigelse i fordelingen: robust spredning plus stikprøvestøj
+        n = nuværende[scorbar].sum(axis=1, keepdims=True)
+        spredning = np.sqrt(andel_spredning ** 2 + batch_forventet * (1 - batch_forventet) / n)
+        z_andel = np.abs(batch_a - batch_forventet) / spredning
+        z_størrelse = np.abs(
+            np.log(n[:, 0] / forrige[scorbar].sum(axis=1)) - størrelse_median
+        ) / størrelse_spredning
+
+        parti = z_andel.argmax(axis=1)
+        z_parti = z_andel[np.arange(len(parti)), parti]
+        score[scorbar] = np.maximum(z_parti, z_størrelse)
+        værste[scorbar] = np.where(z_størrelse >= z_parti, -1, parti)
+        return Anomaliscore(score, værste)
@@ -0,0 +1,272 @@
+"""
+Belastningstest af live-serveren.
+
+Simulerer mange dashboards der (som live_mandatfordeling.html) henter
+live_data.json hvert 5. sekund, og eventuelt abonnenter på
+/live_data/stream (server-sent events). Klienterne kører i én asyncio-løkke
+og måler svartid, gennemløb og fejl. Samtidig kan en genafspillet valgnat
+drive opdateringerne, så serveren belastes som på valgaftenen.
+
+Testen kører kun mod localhost.
+
+Eksempel:
+    python belastningstest.py --start-server --klienter 2000 --sse 200 --varighed 60
+"""
+
+import asyncio
+import random
+import socket
+import time
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+LOKALE_VÆRTER = ('127.0.0.1', 'localhost', '::1')
+
+
+class Belastningsresultat:
+    """
+    Målinger fra en belastningstest.
+    """
+
+    def __init__(self):
+        self.svartider: List[float] = []
+        self.statuskoder = Counter()
+        self.fejl = Counter()
+        self.antal_bytes = 0
+        self.sse_hændelser = 0
+        self.sse_forsinkelser: List[float] = []
+        self.varighed = 0.0
+
+    @property
+    def antal_forespørgsler(self) -> int:
+        return len(self.svartider) + sum(self.fejl.values())
+
+    @property
+    def fejlrate(self) -> float:
+        antal_fejl = sum(self.fejl.values()) + sum(
+            antal for status, antal in self.statuskoder.items() if status not in (200, 304)
+        )
+        return antal_fejl / max(self.antal_forespørgsler, 1)
+
+    def percentiler(self, værdier: List[float], procenter=(50, 90, 99)) -> dict:
+        """Percentiler i millisekunder."""
+        if not værdier:
+            return {p: float('nan') for p in procenter}
+        return dict(zip(procenter, np.percentile(np.array(værdier) * 1000, procenter)))
+
+    def print_rapport(self):
+        """Printer en rapport over testen."""
+        print("\n" + "="*70)
+        print("BELASTNINGSTEST")
+        print("="*70)
+        print(f"Varighed:           {self.varighed:.1f} s")
+        print(f"Forespørgsler:      {self.antal_forespørgsler}")
+        print(f"Gennemløb:          {self.antal_forespørgsler / max(self.varighed, 1e-9):.1f} forespørgsler/s")
+        print(f"Data:               {self.antal_bytes / 1e6:.1f} MB")
+        print(f"Fejlrate:           {self.fejlrate * 100:.2f}%")
+        print(f"Statuskoder:        {dict(self.statuskoder)}")
+        if self.fejl:
+            print(f"Fejl:               {dict(self.fejl)}")
+
+        print("\nSvartid (ms):")
+        for procent, værdi in self.percentiler(self.svartider).items():
+            print(f"  p{procent:<3} {værdi:8.2f}")
+        if self.svartider:
+            print(f"  max  {max(self.svartider) * 1000:8.2f}")
+
+        if self.sse_hændelser:
+            print(f"\nSSE hændelser:      {self.sse_hændelser}")
+            print("Forsinkelse fra publicering til abonnent (ms):")
+            for procent, værdi in self.percentiler(self.sse_forsinkelser).items():
+                print(f"  p{procent:<3} {værdi:8.2f}")
+
+
+async def _hent(vært: str, port: int, sti: str) -> Tuple[int, int]:
+    """
+    Én HTTP GET som browseren laver den.
+
+    Returns:
+        Tuple med (statuskode, antal bytes i svaret)
+    """
+    læser, skriver = await asyncio.open_connection(vært, port)
+    try:
+        skriver.write(
+            f"GET {sti} HTTP/1.1\r\nHost: {vært}:{port}\r\n"
+            f"Accept-Encoding: gzip, deflate, br\r\nConnection: close\r\n\r\n".encode('ascii')
+        )
+        await skriver.drain()
+        svar = await læser.read()
+    finally:
+        skriver.close()
+
+    statuslinje = svar.split(b'\r\n', 1)[0].split()
+    if len(statuslinje) < 2:
+        raise ConnectionError("Ufuldstændigt svar")
+    return int(statuslinje[1]), len(svar)
+
+
+async def _dashboard(vært: str, port: int, interval: float, slut: float,
+                     timeout: float, resultat: Belastningsresultat):
+    """Ét dashboard: henter live_data.json hvert interval indtil slut."""
+    # Dashboards åbnes ikke på samme tid
+    await asyncio.sleep(random.uniform(0, interval))
+
+    while time.perf_counter() < slut:
+        start = time.perf_counter()
+        try:
+            status, antal_bytes = await asyncio.wait_for(
+                _hent(vært, port, f"/live_data.json?{int(time.time() * 1000)}"), timeout
+            )
+            resultat.svartider.append(time.perf_counter() - start)
+            resultat.statuskoder[status] += 1
+            resultat.antal_bytes += antal_bytes
+        except asyncio.TimeoutError:
+            resultat.fejl['timeout'] += 1
+        except OSError as e:
+            resultat.fejl[type(e).__name__] += 1
+
+        await asyncio.sleep(max(0.0, min(start + interval, slut) - time.perf_counter()))
+
+
+async def _abonnent(vært: str, port: int, slut: float, resultat: Belastningsresultat):
+    """Én SSE-abonnent på /live_data/stream indtil slut."""
+    try:
+        læser, skriver = await asyncio.open_connection(vært, port)
+    except OSError as e:
+        resultat.fejl[f"sse {type(e).__name__}"] += 1
+        return
+
+    try:
+        skriver.write(
+            f"GET /live_data/stream HTTP/1.1\r\nHost: {vært}:{port}\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode('ascii')
+        )
+        await skriver.drain()
+
+        tidspunkt = None
+        while True:
+            resterende = slut - time.perf_counter()
+            if resterende <= 0:
+                break
+            try:
+                linje = await asyncio.wait_for(læser.readline(), resterende)
+            except asyncio.TimeoutError:
+                break
+            if not linje:
+                resultat.fejl['sse lukket'] += 1
+                break
+
+            if linje.startswith(b': '):
+                try:
+                    tidspunkt = float(linje[2:])
+                except ValueError:
+                    tidspunkt = None
+            elif linje.startswith(b'data: '):
+                resultat.sse_hændelser += 1
+                if tidspunkt is not None:
+                    resultat.sse_forsinkelser.append(time.time() - tidspunkt)
+                tidspunkt = None
+    except OSError as e:
+        resultat.fejl[f"sse {type(e).__name__}"] += 1
+    finally:
+        skriver.close()
+
+
+async def kør_belastning(
+    vært: str = '127.0.0.1',
+    port: int = 8000,
+    antal_klienter: int = 1000,
+    varighed: float = 60.0,
+    interval: float = 5.0,
+    antal_abonnenter: int = 0,
+    timeout: float = 10.0
+) -> Belastningsresultat:
+    """
+    Kører belastningstesten mod en lokal server.
+
+    Args:
+        vært: Serverens adresse (kun localhost er tilladt)
+        port: Serverens port
+        antal_klienter: Antal dashboards der poller live_data.json
+        varighed: Sekunder testen kører
+        interval: Sekunder mellem hvert dashboards forespørgsler
+        antal_abonnenter: Antal SSE-abonnenter
+        timeout: Sekunder før en forespørgsel tæller som fejl
+
+    Returns:
+        Belastningsresultat
+    """
+    if vært not in LOKALE_VÆRTER:
+        raise ValueError(f"Belastningstesten kører kun mod localhost, ikke {vært}")
+
+    resultat = Belastningsresultat()
+    start = time.perf_counter()
+    slut = start + varighed
+
+    opgaver = [_dashboard(vært, port, interval, slut, timeout, resultat) for _ in range(antal_klienter)]
+    opgaver += [_abonnent(vært, port, slut, resultat) for _ in range(antal_abonnenter)]
+    await asyncio.gather(*opgaver)
+
+    resultat.varighed = time.perf_counter() - start
+    return resultat
+
+
+def hæv_filgrænse():
+    """Hæver grænsen for åbne filer, da hver klient bruger en socket."""
+    try:
+        import resource
+        _, hård = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hård, hård))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def kør_server(csv_fil: str, mappe: str, port: int, antal_processer: int):
+    """
+    Live-server over en mappe med valgstedsfiler (kører i egen proces).
+
+    Args:
+        csv_fil: CSV med forrige valgs resultater
+        mappe: Mappe hvor valgstedsfilerne lander
+        port: Port serveren lytter på
+        antal_processer: Antal serverprocesser
+    """
+    from valgmodel import Valgmodel
+    from generate_live_data import NYE_PARTIER
+    from serve_live import MyHTTPRequestHandler, start_live_server
+
+    # Ingen logning af hver enkelt forespørgsel
+    MyHTTPRequestHandler.log_message = lambda *args: None
+
+    model = Valgmodel(csv_fil, nye_partier=NYE_PARTIER)
+    start_live_server(model, mappe, interval=0.5, antal_processer=antal_processer, port=port)
+
+
+def vent_på_server(port: int, timeout: float = 30.0):
+    """
+    Venter til serveren på localhost tager imod forbindelser.
+
+    Args:
+        port: Serverens port
+        timeout: Sekunder der højst ventes
+
+    Raises:
+        TimeoutError: Hvis serveren ikke tager imod forbindelser inden timeout
+    """
+    slut = time.perf_counter() + timeout
+    while time.perf_counter() < slut:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Serveren på port {port} startede ikke")
+
+
+if __name__ == "__main__":
+    import sys
+    from valgmodel_cli import main
+
+    sys.exit(main(["bench", *sys.argv[1:]]))
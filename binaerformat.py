@@ -0,0 +1,252 @@
+"""
+Kompakt binært format for live-resultatet.
+
+Et alternativ til live_data.json for forbrugere der henter ofte. Formatet har
+et hoved med fast layout efterfulgt af typede arrays i partiernes faste
+rækkefølge (den statiske dels forbund og partier). Navne og farver ligger i
+en strengtabel, som kun sendes når klienten ikke allerede har den.
+
+Layout (little endian, alle arrays 4-byte alignet fra start):
+
+    Hoved (32 bytes):
+        4s  magic "VLGD"
+        H   layoutversion
+        H   flag (1 = strengtabel med)
+        I   version
+        I   total_stemmer
+        I   strengtabel_id (crc32 af strengtabellen)
+        H   total_mandater
+        H   antal_optalte_valgsteder
+        H   procent_optalt i hundrededele
+        H   antal partier (P)
+        H   antal forbund (F)
+        H   (reserveret)
+    Strengtabel (kun med flag 1):
+        I   længde i bytes, derefter UTF-8 JSON {"forbund", "partier", "farver",
+            "parti_forbund"}, polstret til 4 bytes
+    Arrays:
+        u32[P] stemmer, u32[F] forbund_stemmer,
+        u16[P] procent i hundrededele, u16[F] forbund_procent i hundrededele,
+        u8[P] mandater, u8[F] forbund_mandater
+
+Et parti med 0 stemmer er ikke med i live-data, præcis som i JSON-formatet.
+"""
+
+import json
+import struct
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from deltaprotokol import byg_statisk_data, valgforbund_fra_live_data
+
+MAGIC = b'VLGD'
+LAYOUT_VERSION = 1
+MED_STRENGTABEL = 1
+HOVED = struct.Struct('<4sHHIIIHHHHHH')
+
+
+def _polstret(indhold: bytes) -> bytes:
+    return indhold + b'\0' * (-len(indhold) % 4)
+
+
+class Binærkoder:
+    """
+    Koder live-data til det binære format for én fast partirækkefølge.
+    """
+
+    def __init__(self, statisk: dict):
+        """
+        Args:
+            statisk: Statisk del som fra byg_statisk_data
+        """
+        self.statisk = statisk
+        self.forbund = [f["navn"] for f in statisk["forbund"]]
+        self.partier = [p for f in statisk["forbund"] for p in f["partier"]]
+        self._parti_index = {p: i for i, p in enumerate(self.partier)}
+        self._forbund_index = {f: i for i, f in enumerate(self.forbund)}
+
+        tabel = json.dumps({
+            "forbund": self.forbund,
+            "partier": self.partier,
+            "farver": [statisk["farver"][p] for p in self.partier],
+            "parti_forbund": [
+                self._forbund_index[f["navn"]] for f in statisk["forbund"] for _ in f["partier"]
+            ]
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.strengtabel = struct.pack('<I', len(tabel)) + _polstret(tabel)
+        self.strengtabel_id = zlib.crc32(tabel)
+
+    def kod(self, data: dict, version: int, med_strengtabel: bool = True) -> bytes:
+        """
+        Koder live-data.
+
+        Args:
+            data: Live-data som fra byg_live_data
+            version: Versionsnummer
+            med_strengtabel: Tag strengtabellen med
+
+        Returns:
+            Binært kodet resultat
+        """
+        P, F = len(self.partier), len(self.forbund)
+        stemmer = np.zeros(P + F, dtype='<u4')
+        procent = np.zeros(P + F, dtype='<u2')
+        mandater = np.zeros(P + F, dtype='u1')
+
+        for parti in data["partier"]:
+            i = self._parti_index[parti["bogstav"]]
+            stemmer[i] = parti["stemmer"]
+            procent[i] = int(round(parti["procent"] * 100))
+            mandater[i] = parti["mandater"]
+        for forbund in data["forbund"]:
+            i = P + self._forbund_index[forbund["navn"]]
+            stemmer[i] = forbund["stemmer"]
+            procent[i] = int(round(forbund["procent"] * 100))
+            mandater[i] = forbund["mandater"]
+
+        metadata = data["metadata"]
+        hoved = HOVED.pack(
+            MAGIC, LAYOUT_VERSION, MED_STRENGTABEL if med_strengtabel else 0,
+            version, metadata["total_stemmer"], self.strengtabel_id,
+            metadata["total_mandater"], metadata["antal_optalte_valgsteder"],
+            int(round(metadata["procent_optalt"] * 100)), P, F, 0
+        )
+        return b''.join((
+            hoved,
+            self.strengtabel if med_strengtabel else b'',
+            stemmer.tobytes(),
+            _polstret(procent.tobytes()),
+            mandater.tobytes()
+        ))
+
+
+def afkod(indhold: bytes, strengtabel: dict = None) -> Tuple[int, dict, dict]:
+    """
+    Afkoder det binære format til live-data i det fulde format.
+
+    Args:
+        indhold: Binært kodet resultat
+        strengtabel: Strengtabel fra en tidligere afkodning (hvis den ikke er med)
+
+    Returns:
+        Tuple med (version, live-data, strengtabel)
+    """
+    (magic, layout, flag, version, total_stemmer, strengtabel_id, total_mandater,
+     antal_optalte, procent_optalt, P, F, _) = HOVED.unpack_from(indhold, 0)
+    if magic != MAGIC or layout != LAYOUT_VERSION:
+        raise ValueError("Ikke et kendt binært valgresultat")
+
+    offset = HOVED.size
+    if flag & MED_STRENGTABEL:
+        længde = struct.unpack_from('<I', indhold, offset)[0]
+        strengtabel = json.loads(bytes(indhold[offset + 4:offset + 4 + længde]))
+        offset += 4 + længde + (-længde % 4)
+    elif strengtabel is None:
+        raise ValueError("Strengtabellen mangler")
+
+    stemmer = np.frombuffer(indhold, dtype='<u4', count=P + F, offset=offset)
+    offset += 4 * (P + F)
+    procent = np.frombuffer(indhold, dtype='<u2', count=P + F, offset=offset)
+    offset += 2 * (P + F) + (-2 * (P + F) % 4)
+    mandater = np.frombuffer(indhold, dtype='u1', count=P + F, offset=offset)
+
+    output = {
+        "metadata": {
+            "total_mandater": total_mandater,
+            "total_stemmer": total_stemmer,
+            "antal_optalte_valgsteder": antal_optalte,
+            "procent_optalt": procent_optalt / 100
+        },
+        "forbund": [],
+        "partier": []
+    }
+    forbund_data = []
+    for j, navn in enumerate(strengtabel["forbund"]):
+        forbund_data.append({
+            "navn": navn,
+            "mandater": int(mandater[P + j]),
+            "stemmer": int(stemmer[P + j]),
+            "procent": int(procent[P + j]) / 100,
+            "partier": []
+        })
+    for i, parti in enumerate(strengtabel["partier"]):
+        if stemmer[i] == 0:
+            continue
+        parti_data = {
+            "bogstav": parti,
+            "mandater": int(mandater[i]),
+            "stemmer": int(stemmer[i]),
+            "procent": int(procent[i]) / 100,
+            "farve": strengtabel["farver"][i]
+        }
+        forbund_data[strengtabel["parti_forbund"][i]]["partier"].append(parti_data)
+        output["partier"].append(parti_data)
+
+    for forbund in forbund_data:
+        forbund["partier"].sort(key=lambda x: x["mandater"], reverse=True)
+    output["forbund"] = sorted(forbund_data, key=lambda x: x["mandater"], reverse=True)
+    output["partier"].sort(key=lambda x: x["mandater"], reverse=True)
+    return version, output, strengtabel
+
+
+class Binærudgivelse:
+    """
+    Det seneste snapshot i binært format, kodet én gang per version.
+
+    Læser fra en Snapshotpublicering (eller Bussnapshots) ligesom
+    Deltaudgivelse. Uden valgforbund aflæses partirækkefølgen af hver
+    version, og klienten får en ny strengtabel når den ændrer sig.
+    """
+
+    def __init__(self, publicering, valgforbund: Dict[str, list] = None):
+        """
+        Args:
+            publicering: Kilde med `seneste` LiveSnapshot
+            valgforbund: Pipelinens valgforbund (None = aflæses af hver version)
+        """
+        self.publicering = publicering
+        self.valgforbund = valgforbund
+        # (version, koder, {med_strengtabel: bytes})
+        self._aktuel: Tuple[int, Optional[Binærkoder], Dict[bool, bytes]] = (0, None, {})
+        self._lås = threading.Lock()
+
+    def _koder(self, data: dict, forrige: Optional[Binærkoder]) -> Binærkoder:
+        """Koderen til en version (den forrige genbruges hvis den statiske del er den samme)."""
+        statisk = byg_statisk_data(
+            data["metadata"]["total_mandater"], self.valgforbund or valgforbund_fra_live_data(data)
+        )
+        if forrige is not None and forrige.statisk == statisk:
+            return forrige
+        return Binærkoder(statisk)
+
+    def hent(self, strengtabel_id: Optional[int] = None) -> Optional[bytes]:
+        """
+        Seneste version i binært format.
+
+        Args:
+            strengtabel_id: Id på den strengtabel klienten har (None = ingen)
+
+        Returns:
+            Kodet resultat, eller None hvis der endnu ikke er data
+        """
+        snapshot = self.publicering.seneste
+        if snapshot.data is None:
+            return None
+
+        version, koder, kodninger = self._aktuel
+        if version != snapshot.version:
+            with self._lås:
+                version, koder, kodninger = self._aktuel
+                if version != snapshot.version:
+                    koder = self._koder(snapshot.data, koder)
+                    kodninger = {}
+                    self._aktuel = (snapshot.version, koder, kodninger)
+
+        med_strengtabel = strengtabel_id != koder.strengtabel_id
+        kodet = kodninger.get(med_strengtabel)
+        if kodet is None:
+            kodet = kodninger[med_strengtabel] = koder.kod(snapshot.data, snapshot.version, med_strengtabel)
+        return kodet
@@ -0,0 +1,293 @@
+"""
+Delta-protokol til dashboardet.
+
+I stedet for at hente hele live_data.json ved hver opdatering henter
+dashboardet én gang den statiske del (partier, farver, valgforbund og antal
+mandater) og derefter kun ændringerne siden den version det allerede har:
+
+    /live_data/statisk.json          statisk del
+    /live_data/delta.json?fra=<v>    ændringer fra version v til seneste
+
+Tilstanden for en version er stemmer, procent og mandater per parti og
+forbund samt optællingens metadata. En delta indeholder kun de poster der er
+ændret. Er klienten længere bagud end serverens historik (eller har den
+ingen version endnu), sendes hele tilstanden.
+
+Valgforbundene er pipelinens (fra dens Mandatfordeling). Kendes de ikke
+(f.eks. i en serverproces på en resultatbus), aflæses de af det seneste
+snapshot.
+
+Live-data i det fulde format kan genskabes med byg_live_data_fra_tilstand,
+så klienten viser præcis det samme som med live_data.json.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from partifarver import PARTI_FARVER, DEFAULT_FARVE
+
+# Metadata der ændrer sig under optællingen
+DYNAMISK_METADATA = ('total_stemmer', 'antal_optalte_valgsteder', 'procent_optalt')
+
+
+def byg_statisk_data(total_mandater: int, valgforbund: Dict[str, List[str]]) -> dict:
+    """
+    Bygger den statiske del, som kun hentes én gang.
+
+    Args:
+        total_mandater: Antal mandater
+        valgforbund: Valgforbund som i Mandatfordeling (forbundsnavn -> partier)
+
+    Returns:
+        Dictionary med mandater, forbund og partiernes farver
+    """
+    return {
+        "total_mandater": total_mandater,
+        "forbund": [
+            {"navn": navn, "partier": list(partier)}
+            for navn, partier in valgforbund.items()
+        ],
+        "farver": {
+            parti: PARTI_FARVER.get(parti, DEFAULT_FARVE)
+            for partier in valgforbund.values() for parti in partier
+        }
+    }
+
+
+def valgforbund_fra_live_data(data: dict) -> Dict[str, List[str]]:
+    """
+    Aflæser valgforbundene af live-data (når pipelinens ikke kendes).
+
+    Forbund og partier står i live-dataens rækkefølge, og partier uden
+    stemmer er ikke med. Partier i forskellige forbund med lige mange
+    mandater kan derfor stå i en anden indbyrdes rækkefølge i den samlede
+    partiliste end med pipelinens valgforbund.
+
+    Args:
+        data: Live-data som fra byg_live_data
+
+    Returns:
+        Dictionary med forbundsnavn -> partier
+    """
+    return {f["navn"]: [p["bogstav"] for p in f["partier"]] for f in data["forbund"]}
+
+
+def tilstand_fra_live_data(data: dict) -> dict:
+    """
+    Udtrækker den dynamiske tilstand fra live-data.
+
+    Partier og forbund gemmes som [stemmer, procent, mandater]. Partier der
+    ikke er med i live-data (ingen stemmer) er simpelthen ikke med.
+
+    Args:
+        data: Live-data som fra byg_live_data
+
+    Returns:
+        Dictionary med metadata, partier og forbund
+    """
+    metadata = {felt: data["metadata"][felt] for felt in DYNAMISK_METADATA}
+    metadata["procent_optalt"] = round(metadata["procent_optalt"], 2)
+    return {
+        "metadata": metadata,
+        "partier": {
+            p["bogstav"]: [p["stemmer"], p["procent"], p["mandater"]] for p in data["partier"]
+        },
+        "forbund": {
+            f["navn"]: [f["stemmer"], f["procent"], f["mandater"]] for f in data["forbund"]
+        }
+    }
+
+
+def beregn_delta(fra: dict, til: dict) -> dict:
+    """
+    Ændringer fra én tilstand til en anden.
+
+    Poster der er forsvundet (f.eks. et parti uden stemmer) sendes som None.
+
+    Args:
+        fra: Klientens tilstand
+        til: Seneste tilstand
+
+    Returns:
+        Dictionary med kun de ændrede poster
+    """
+    delta = {}
+    for del_ in ("metadata", "partier", "forbund"):
+        ændringer = {
+            nøgle: værdi for nøgle, værdi in til[del_].items()
+            if fra[del_].get(nøgle) != værdi
+        }
+        ændringer.update({nøgle: None for nøgle in fra[del_] if nøgle not in til[del_]})
+        if ændringer:
+            delta[del_] = ændringer
+    return delta
+
+
+def anvend_delta(tilstand: dict, delta: dict) -> dict:
+    """Anvender en delta på en tilstand og returnerer den nye tilstand."""
+    ny = {del_: dict(tilstand[del_]) for del_ in ("metadata", "partier", "forbund")}
+    for del_, ændringer in delta.items():
+        for nøgle, værdi in ændringer.items():
+            if værdi is None:
+                ny[del_].pop(nøgle, None)
+            else:
+                ny[del_][nøgle] = værdi
+    return ny
+
+
+def byg_live_data_fra_tilstand(statisk: dict, tilstand: dict) -> dict:
+    """
+    Genskaber live-data i det fulde format (som live_data.json).
+
+    Samme rækkefølge som byg_live_data: forbund og partier sorteres stabilt
+    efter mandater ud fra forbundenes rækkefølge.
+
+    Args:
+        statisk: Den statiske del
+        tilstand: Tilstand for én version
+
+    Returns:
+        Dictionary med komplet data til visning
+    """
+    output = {
+        "metadata": {"total_mandater": statisk["total_mandater"], **tilstand["metadata"]},
+        "forbund": [],
+        "partier": []
+    }
+
+    for forbund in statisk["forbund"]:
+        stemmer, procent, mandater = tilstand["forbund"].get(forbund["navn"], [0, 0.0, 0])
+        forbund_data = {
+            "navn": forbund["navn"],
+            "mandater": mandater,
+            "stemmer": stemmer,
+            "procent": procent,
+            "partier": []
+        }
+
+        for parti in forbund["partier"]:
+            if parti not in tilstand["partier"]:
+                continue
+            stemmer, procent, mandater = tilstand["partier"][parti]
+            parti_data = {
+                "bogstav": parti,
+                "mandater": mandater,
+                "stemmer": stemmer,
+                "procent": procent,
+                "farve": statisk["farver"][parti]
+            }
+            forbund_data["partier"].append(parti_data)
+            output["partier"].append(parti_data)
+
+        forbund_data["partier"].sort(key=lambda x: x["mandater"], reverse=True)
+        output["forbund"].append(forbund_data)
+
+    output["forbund"].sort(key=lambda x: x["mandater"], reverse=True)
+    output["partier"].sort(key=lambda x: x["mandater"], reverse=True)
+    return output
+
+
+def _kodet(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _Versionstilstand:
+    """Uforanderligt sæt af seneste version, historik og cache af deltaer."""
+
+    __slots__ = ('version', 'historik', 'statisk_json', 'cache')
+
+    def __init__(self, version: int, historik: "OrderedDict[int, dict]", statisk_json: Optional[bytes]):
+        self.version = version
+        self.historik = historik
+        self.statisk_json = statisk_json
+        # fra-version -> kodet delta. Hører kun til denne version
+        self.cache: Dict[Optional[int], bytes] = {}
+
+
+class Deltaudgivelse:
+    """
+    Statisk del og deltaer for den seneste version.
+
+    Læser fra en Snapshotpublicering (eller Bussnapshots). Når en ny version
+    ses, gemmes dens tilstand i en historik af de seneste versioner, og
+    deltaer kodes højst én gang per (fra, til) par.
+    """
+
+    def __init__(self, publicering, historik_længde: int = 120, valgforbund: Dict[str, List[str]] = None):
+        """
+        Args:
+            publicering: Kilde med `seneste` LiveSnapshot
+            historik_længde: Antal versioner klienter kan få deltaer fra
+            valgforbund: Pipelinens valgforbund (None = aflæses af hver version)
+        """
+        self.publicering = publicering
+        self.historik_længde = historik_længde
+        self.valgforbund = valgforbund
+        self._aktuel = _Versionstilstand(0, OrderedDict(), None)
+        self._lås = threading.Lock()
+
+    def _opdater(self) -> _Versionstilstand:
+        """Registrerer en ny version hvis publiceringen har fået en."""
+        aktuel = self._aktuel
+        snapshot = self.publicering.seneste
+        if snapshot.version == aktuel.version or snapshot.data is None:
+            return aktuel
+
+        with self._lås:
+            aktuel = self._aktuel
+            if snapshot.version == aktuel.version:
+                return aktuel
+
+            historik = OrderedDict(aktuel.historik)
+            historik[snapshot.version] = tilstand_fra_live_data(snapshot.data)
+            while len(historik) > self.historik_længde:
+                historik.popitem(last=False)
+
+            statisk = _kodet(byg_statisk_data(
+                snapshot.data["metadata"]["total_mandater"],
+                self.valgforbund or valgforbund_fra_live_data(snapshot.data)
+            ))
+            if statisk == aktuel.statisk_json:
+                statisk = aktuel.statisk_json
+
+            # Én referencetildeling - læsere ser enten gammel eller ny version
+            self._aktuel = _Versionstilstand(snapshot.version, historik, statisk)
+            return self._aktuel
+
+    def statisk_json(self) -> Optional[bytes]:
+        """Den statiske del som JSON (None før første version)."""
+        return self._opdater().statisk_json
+
+    def delta_json(self, fra: Optional[int]) -> bytes:
+        """
+        Ændringerne fra klientens version til seneste version som JSON.
+
+        Args:
+            fra: Klientens seneste version (None = ingen)
+
+        Returns:
+            {"fra", "til", "delta"} hvis fra er i historikken, ellers
+            {"til", "fuld"} med hele tilstanden
+        """
+        aktuel = self._opdater()
+        if fra not in aktuel.historik:
+            fra = None
+
+        kodet = aktuel.cache.get(fra)
+        if kodet is not None:
+            return kodet
+
+        if aktuel.version == 0:
+            kodet = _kodet({"til": 0})
+        elif fra is None:
+            kodet = _kodet({"til": aktuel.version, "fuld": aktuel.historik[aktuel.version]})
+        else:
+            kodet = _kodet({
+                "fra": fra,
+                "til": aktuel.version,
+                "delta": beregn_delta(aktuel.historik[fra], aktuel.historik[aktuel.version])
+            })
+        aktuel.cache[fra] = kodet
+        return kodet
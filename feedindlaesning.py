@@ -0,0 +1,272 @@
+"""
+Indlæsning af valgresultater fra et HTTP-feed.
+
+På valgnatten kommer resultaterne fra et eller flere HTTP-feeds (f.eks. ét
+per kommune eller opstillingskreds) i samme CSV-format som valgstedsfilerne.
+En Feedindlæser poller feedene i én asyncio-løkke:
+
+- Forbindelserne holdes åbne (HTTP/1.1 keep-alive) og genbruges mellem
+  gennemløbene, så der ikke betales for en ny TCP- (og TLS-) forbindelse
+  hver gang
+- Hvert feeds ETag og Last-Modified sendes med som If-None-Match og
+  If-Modified-Since, så uændrede feeds svarer 304 uden indhold og hverken
+  overføres eller parses igen
+- Højst maks_samtidige forespørgsler er i gang på én gang
+
+Svarene parses direkte fra hukommelsen og lægges ind i indberetningsloggen i
+ét samlet skridt per gennemløb, ligesom Mappeindlæser gør med filer.
+"""
+
+import asyncio
+import gzip
+import ssl
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from indberetningslog import Indberetningslog
+from mappeindlaesning import parse_valgstedstekst
+
+
+def er_feed(kilde) -> bool:
+    """True hvis kilden er en HTTP(S)-URL eller en liste af URL'er."""
+    if isinstance(kilde, (list, tuple)):
+        return bool(kilde) and all(er_feed(url) for url in kilde)
+    return isinstance(kilde, str) and kilde.startswith(('http://', 'https://'))
+
+
+class Feedsvar(NamedTuple):
+    """Ét HTTP-svar fra et feed."""
+    status: int
+    # Headernavne med små bogstaver
+    headere: Dict[str, str]
+    indhold: bytes
+    # Om forbindelsen kan genbruges til næste forespørgsel
+    hold_åben: bool
+
+
+async def _læs_svar(læser: asyncio.StreamReader) -> Feedsvar:
+    """Læser ét HTTP/1.1-svar (Content-Length, chunked eller til forbindelsen lukkes)."""
+    statuslinje = await læser.readline()
+    dele = statuslinje.split(None, 2)
+    if len(dele) < 2:
+        raise ConnectionError("Forbindelsen blev lukket før svaret")
+    http_version, status = dele[0], int(dele[1])
+
+    headere: Dict[str, str] = {}
+    while True:
+        linje = await læser.readline()
+        if linje in (b'\r\n', b'\n', b''):
+            break
+        navn, _, værdi = linje.decode('latin-1').partition(':')
+        headere[navn.strip().lower()] = værdi.strip()
+
+    forbindelse = headere.get('connection', '').lower()
+    hold_åben = forbindelse != 'close' if http_version == b'HTTP/1.1' else forbindelse == 'keep-alive'
+
+    if status in (204, 304) or 100 <= status < 200:
+        indhold = b''
+    elif 'chunked' in headere.get('transfer-encoding', '').lower():
+        stykker = []
+        while True:
+            størrelse = int((await læser.readline()).split(b';', 1)[0], 16)
+            if størrelse == 0:
+                # Eventuelle trailere frem til den tomme linje
+                while (await læser.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            stykker.append(await læser.readexactly(størrelse))
+            await læser.readexactly(2)
+        indhold = b''.join(stykker)
+    elif 'content-length' in headere:
+        indhold = await læser.readexactly(int(headere['content-length']))
+    else:
+        indhold = await læser.read()
+        hold_åben = False
+
+    if headere.get('content-encoding', '').lower() == 'gzip':
+        indhold = gzip.decompress(indhold)
+    return Feedsvar(status, headere, indhold, hold_åben)
+
+
+class Feedindlæser:
+    """
+    Poller HTTP-feeds over vedvarende forbindelser og indlæser ændrede feeds.
+    """
+
+    def __init__(
+        self,
+        urls: Union[str, List[str]],
+        log: Indberetningslog,
+        maks_samtidige: int = 4,
+        timeout: float = 5.0
+    ):
+        """
+        Initialiserer indlæseren.
+
+        Args:
+            urls: URL (eller liste af URL'er) til feeds i valgstedsfilernes
+                  CSV-format. Samme valgsted i flere feeds: det seneste feed
+                  i listen vinder
+            log: Indberetningslog som valgstederne registreres i
+            maks_samtidige: Højeste antal samtidige forespørgsler
+            timeout: Sekunder før en forespørgsel opgives (prøves igen i
+                     næste gennemløb)
+        """
+        self.urls = [urls] if isinstance(urls, str) else list(urls)
+        if not er_feed(self.urls):
+            raise ValueError(f"Feeds skal være http:// eller https:// URL'er: {self.urls}")
+        if maks_samtidige < 1:
+            raise ValueError("maks_samtidige skal være mindst 1")
+
+        self.log = log
+        self.maks_samtidige = maks_samtidige
+        self.timeout = timeout
+
+        # URL -> (ETag, Last-Modified) fra seneste indlæste svar
+        self.validatorer: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        # Antal forespørgsler, 304-svar, fejl og åbnede forbindelser
+        self.statistik = Counter()
+
+        # (skema, vært, port) -> ledige forbindelser
+        self._ledige: Dict[Tuple[str, str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._løkke = asyncio.new_event_loop()
+        # Holdes under et gennemløb, så luk() fra en anden tråd venter på det
+        self._lås = threading.Lock()
+        self._semafor: Optional[asyncio.Semaphore] = None
+        self._ssl: Optional[ssl.SSLContext] = None
+
+    @staticmethod
+    def _oprindelse(url: str) -> Tuple[str, str, int]:
+        del_ = urlsplit(url)
+        return del_.scheme, del_.hostname, del_.port or (443 if del_.scheme == 'https' else 80)
+
+    async def _åbn(self, oprindelse: Tuple[str, str, int]):
+        skema, vært, port = oprindelse
+        if skema == 'https' and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        self.statistik['forbindelser'] += 1
+        return await asyncio.open_connection(vært, port, ssl=self._ssl if skema == 'https' else None)
+
+    async def _forespørg(self, url: str, forbindelse) -> Feedsvar:
+        """Sender én betinget GET over forbindelsen og læser svaret."""
+        læser, skriver = forbindelse
+        del_ = urlsplit(url)
+        sti = (del_.path or '/') + (f"?{del_.query}" if del_.query else '')
+        etag, ændret = self.validatorer.get(url, (None, None))
+
+        forespørgsel = [
+            f"GET {sti} HTTP/1.1", f"Host: {del_.netloc}",
+            "Accept-Encoding: gzip", "Connection: keep-alive",
+        ]
+        if etag is not None:
+            forespørgsel.append(f"If-None-Match: {etag}")
+        if ændret is not None:
+            forespørgsel.append(f"If-Modified-Since: {ændret}")
+        skriver.write(('\r\n'.join(forespørgsel) + '\r\n\r\n').encode('latin-1'))
+        await skriver.drain()
+        return await _læs_svar(læser)
+
+    async def _hent(self, url: str) -> Optional[List[Tuple[str, Dict[str, int]]]]:
+        """
+        Henter ét feed.
+
+        Returns:
+            Feedets valgsteder, eller None hvis feedet er uændret
+        """
+        oprindelse = self._oprindelse(url)
+        async with self._semafor:
+            ledige = self._ledige.setdefault(oprindelse, [])
+            genbrugt = bool(ledige)
+            forbindelse = ledige.pop() if genbrugt else await self._åbn(oprindelse)
+            try:
+                try:
+                    svar = await asyncio.wait_for(self._forespørg(url, forbindelse), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not genbrugt:
+                        raise
+                    # Serveren har lukket en ledig forbindelse - prøv én gang på en ny
+                    forbindelse[1].close()
+                    forbindelse = await self._åbn(oprindelse)
+                    svar = await asyncio.wait_for(self._forespørg(url, forbindelse), self.timeout)
+            except BaseException:
+                forbindelse[1].close()
+                raise
+
+            if svar.hold_åben:
+                ledige.append(forbindelse)
+            else:
+                forbindelse[1].close()
+
+        self.statistik['forespørgsler'] += 1
+        if svar.status == 304:
+            self.statistik['uændrede'] += 1
+            return None
+        if svar.status != 200:
+            raise ConnectionError(f"HTTP {svar.status}")
+
+        valgsteder = parse_valgstedstekst(svar.indhold.decode('utf-8'))
+        self.validatorer[url] = (svar.headere.get('etag'), svar.headere.get('last-modified'))
+        return valgsteder
+
+    async def indlæs_async(self, tidspunkt: float = None) -> int:
+        """
+        Ét gennemløb: henter alle feeds samtidigt og registrerer de ændrede samlet.
+
+        Et feed der fejler meldes og prøves igen i næste gennemløb, mens de
+        øvrige feeds indlæses som normalt.
+
+        Args:
+            tidspunkt: Ankomsttidspunkt i loggen (standard: nu)
+
+        Returns:
+            Antal nye eller rettede valgsteder
+        """
+        if self._semafor is None:
+            self._semafor = asyncio.Semaphore(self.maks_samtidige)
+
+        resultater = await asyncio.gather(*(self._hent(url) for url in self.urls), return_exceptions=True)
+
+        valgsteder: Dict[str, Dict[str, int]] = {}
+        for url, resultat in zip(self.urls, resultater):
+            if isinstance(resultat, BaseException):
+                if not isinstance(resultat, Exception):
+                    raise resultat
+                self.statistik['fejl'] += 1
+                print(f"  ✗ Feed {url}: {type(resultat).__name__} {resultat}".rstrip())
+            elif resultat is not None:
+                valgsteder.update(resultat)
+
+        if not valgsteder:
+            return 0
+        return self.log.registrer_batch(list(valgsteder.items()), tidspunkt if tidspunkt is not None else time.time())
+
+    def indlæs(self, tidspunkt: float = None) -> int:
+        """
+        Som indlæs_async, men fra en almindelig tråd (f.eks. pipelinens indlæsning).
+
+        Løkken og dermed forbindelserne genbruges mellem kaldene. Efter luk()
+        indlæses der ikke mere.
+        """
+        with self._lås:
+            if self._løkke.is_closed():
+                return 0
+            return self._løkke.run_until_complete(self.indlæs_async(tidspunkt))
+
+    def luk(self):
+        """Lukker forbindelserne og løkken. Kan kaldes flere gange og fra enhver tråd."""
+        with self._lås:
+            if self._løkke.is_closed():
+                return
+            self._luk_løkke()
+
+    def _luk_løkke(self):
+        for ledige in self._ledige.values():
+            for _, skriver in ledige:
+                skriver.close()
+        self._ledige.clear()
+        # Lad transporterne afslutte lukningen før løkken lukkes
+        self._løkke.run_until_complete(asyncio.sleep(0))
+        self._løkke.close()
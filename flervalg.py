@@ -0,0 +1,244 @@
+"""
+Fælles indlæsning til flere valg på samme valgnat.
+
+Kommunal- og regionsrådsvalg optælles samme aften på de samme valgsteder.
+I stedet for en model, en CSV-parsing og en overvågning per valg parses hver
+valgstedsfil (eller live CSV) her kun én gang. Stemmerne fordeles på valg ud
+fra kolonnen Valg og registreres i hvert valgs indberetningslog, hvorefter
+valgets egen opdateringspipeline beregner og publicerer. Hvert valg har sin
+egen model (forrige valg), mandatfordeling og antal mandater, mens
+indlæsning og parsing betales én gang uanset antallet af valg.
+
+Rækker uden Valg (og filer helt uden kolonnen) hører til det første valg.
+"""
+
+import os
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, NamedTuple, Optional
+
+import pandas as pd
+
+from valgmodel import Valgmodel
+from indberetningslog import Indberetningslog
+from mandatfordeling import Mandatfordeling
+from mappeindlaesning import Mappeindlæser, parse_valgstedsfil_per_valg
+from anomali import Anomalitjek
+from opdateringspipeline import Opdateringspipeline, Version
+
+
+def _ignorer_ukendt(navn: str, ukendte: set) -> None:
+    """Advarer (én gang per valg) om rækker for et valg der ikke er registreret."""
+    if navn not in ukendte:
+        ukendte.add(navn)
+        print(f"  ⚠ Ukendt valg '{navn}' ignoreres")
+
+
+class Valgopsætning(NamedTuple):
+    """Ét valg i en Flervalgspipeline."""
+    model: Valgmodel
+    mandatfordeling: Mandatfordeling
+    total_mandater: int = 55
+    # JSON-fil som valgets resultat skrives til (None = ingen fil)
+    output_json: Optional[str] = None
+
+
+class Flervalgsindlæser(Mappeindlæser):
+    """
+    Mappeindlæser der fordeler hver fils stemmer på flere valg.
+    """
+
+    def __init__(
+        self,
+        mappe: str,
+        logs: Dict[str, Indberetningslog],
+        antal_arbejdere: int = None,
+        endelse: str = '.csv'
+    ):
+        """
+        Args:
+            mappe: Mappe hvor valgstedsfilerne lander
+            logs: Dictionary med valg -> indberetningslog. Det første valg
+                  får rækker uden Valg
+            antal_arbejdere: Antal arbejdsprocesser (standard: antal CPU'er)
+            endelse: Kun filer med denne endelse indlæses
+        """
+        super().__init__(mappe, None, antal_arbejdere, endelse)
+        self.logs = logs
+        self.standard_valg = next(iter(logs))
+        self.ukendte_valg = set()
+
+    def fordel(self, resultater, tidspunkt: float = None) -> Dict[str, int]:
+        """
+        Registrerer parsede filer i valgenes logs.
+
+        Args:
+            resultater: Dictionaries med valg -> liste af (valgsted, stemmer)
+                        i filernes rækkefølge
+            tidspunkt: Ankomsttidspunkt i loggene (standard: nu)
+
+        Returns:
+            Dictionary med valg -> antal nye eller rettede valgsteder
+        """
+        if tidspunkt is None:
+            tidspunkt = time.time()
+
+        # Samme valgsted i flere filer: den seneste fil (efter navn) vinder
+        valg: Dict[str, Dict[str, Dict[str, int]]] = {navn: {} for navn in self.logs}
+        for resultat in resultater:
+            for navn, valgsteder in resultat.items():
+                if navn in valg:
+                    valg[navn].update(valgsteder)
+                else:
+                    _ignorer_ukendt(navn, self.ukendte_valg)
+
+        return {
+            navn: self.logs[navn].registrer_batch(list(valgsteder.items()), tidspunkt)
+            for navn, valgsteder in valg.items() if valgsteder
+        }
+
+    def indlæs(self, tidspunkt: float = None) -> Dict[str, int]:
+        """
+        Ét gennemløb: parser nye filer én gang og registrerer dem per valg.
+
+        Args:
+            tidspunkt: Ankomsttidspunkt i loggene (standard: nu)
+
+        Returns:
+            Dictionary med valg -> antal nye eller rettede valgsteder
+        """
+        filer = self.nye_filer()
+        if not filer:
+            return {}
+        parser = partial(parse_valgstedsfil_per_valg, standard_valg=self.standard_valg)
+        parsede = self._parse(filer, parser)
+        antal = self.fordel([resultat for _, resultat in parsede], tidspunkt)
+        self._marker_læst(sti for sti, _ in parsede)
+        return antal
+
+
+class Flervalgspipeline:
+    """
+    Én indlæsning der fodrer en opdateringspipeline per valg.
+    """
+
+    def __init__(
+        self,
+        live_sti: str,
+        valg: Dict[str, Valgopsætning],
+        interval: float = 1.0,
+        antal_arbejdere: int = None,
+        ved_publicering: Callable[[str, dict, Version, float], None] = None,
+        bootstrap: int = 0,
+        anomalitjek: Anomalitjek = None
+    ):
+        """
+        Initialiserer pipelinen.
+
+        Args:
+            live_sti: Sti til live CSV eller mappe med én fil per valgsted
+            valg: Dictionary med valgets navn (som i kolonnen Valg) ->
+                  Valgopsætning. Det første valg får rækker uden Valg
+            interval: Sekunder mellem hver indlæsning
+            antal_arbejdere: Antal processer der parser valgstedsfiler (kun mappe)
+            ved_publicering: Kaldes med (valg, data, version, forsinkelse i
+                             sekunder) hver gang et valg er publiceret
+            bootstrap: Antal bootstrap-gentagelser for konfidensintervaller
+                       (0 = ingen intervaller)
+            anomalitjek: Anomalitjek der scorer hvert valgs indlæste
+                         valgsteder (None = intet tjek)
+        """
+        if not valg:
+            raise ValueError("Der skal være mindst ét valg")
+
+        self.live_sti = live_sti
+        self.interval = interval
+        self.pipelines: Dict[str, Opdateringspipeline] = {}
+        for navn, opsætning in valg.items():
+            self.pipelines[navn] = Opdateringspipeline(
+                opsætning.model, None, opsætning.output_json,
+                total_mandater=opsætning.total_mandater,
+                mandatfordeling=opsætning.mandatfordeling,
+                ved_publicering=None if ved_publicering is None else partial(ved_publicering, navn),
+                bootstrap=bootstrap,
+                anomalitjek=anomalitjek
+            )
+        self.standard_valg = next(iter(valg))
+
+        self.indlæser = None
+        if os.path.isdir(live_sti):
+            self.indlæser = Flervalgsindlæser(
+                live_sti, {navn: p.log for navn, p in self.pipelines.items()}, antal_arbejdere
+            )
+        self._sidste_stempel = None
+        self._ukendte_valg = set()
+        self._stop = threading.Event()
+
+    def _indlæs_csv(self) -> Dict[str, int]:
+        """Indlæser en ændret live CSV én gang og registrerer den per valg."""
+        if not os.path.exists(self.live_sti):
+            return {}
+        stat = os.stat(self.live_sti)
+        stempel = (stat.st_mtime_ns, stat.st_size)
+        if stempel == self._sidste_stempel:
+            return {}
+        self._sidste_stempel = stempel
+
+        data = pd.read_csv(self.live_sti, sep=';', encoding='utf-8-sig')
+        if 'Valg' in data.columns:
+            grupper = data.groupby(data['Valg'].fillna(self.standard_valg))
+        else:
+            grupper = [(self.standard_valg, data)]
+
+        tidspunkt = time.time()
+        antal = {}
+        for navn, del_ in grupper:
+            pipeline = self.pipelines.get(navn)
+            if pipeline is None:
+                _ignorer_ukendt(navn, self._ukendte_valg)
+                continue
+            antal[navn] = pipeline.log.registrer_dataframe(pipeline.model._aggreger_data(del_), tidspunkt)
+        return antal
+
+    def indlæs(self) -> Dict[str, int]:
+        """
+        Ét indlæsningsgennemløb. Valg med nye data sendes videre til beregning.
+
+        Returns:
+            Dictionary med valg -> antal nye eller rettede valgsteder
+        """
+        modtaget = time.perf_counter()
+        antal = self.indlæser.indlæs() if self.indlæser is not None else self._indlæs_csv()
+        for navn, n in antal.items():
+            self.pipelines[navn].meld_anomalier()
+            if n > 0:
+                self.pipelines[navn].modtag(modtaget)
+        return antal
+
+    def start(self) -> None:
+        """Starter beregnings- og publiceringstrådene for alle valg."""
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+
+    def kør(self) -> None:
+        """Starter pipelinerne og indlæser i den kaldende tråd indtil stop()."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    self.indlæs()
+                except Exception as e:
+                    print(f"  ✗ Fejl ved indlæsning: {e}")
+                self._stop.wait(max(0.0, self.interval - (time.perf_counter() - start)))
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stopper alle valgs pipelines og lukker arbejdsprocesserne."""
+        self._stop.set()
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+        if self.indlæser is not None:
+            self.indlæser.luk()
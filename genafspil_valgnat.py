@@ -0,0 +1,145 @@
+"""
+Genafspilning af en valgnat til belastningstest.
+
+Tager de rigtige valgstedsdata (f.eks. 2021-filen), påfører konfigurerbare
+swing per parti og skriver valgstederne ud i en realistisk rækkefølge og med
+en konfigurerbar hastighed - enten som én voksende live CSV eller som én fil
+per valgsted i en mappe. Så kan watcher, prediкtion og server testes samlet
+på samme måde som valgnatten faktisk ser ud.
+
+Realistisk rækkefølge: små valgsteder bliver som regel talt op først, så
+valgstederne sorteres efter størrelse med tilfældig spredning.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+KOLONNER = ['Afstemningsområde', 'Bogstavbetegnelse', 'Listenavn', 'Navn', 'Stemmetal']
+
+
+def lav_valgnat(
+    csv_fil: str,
+    swing: Dict[str, float] = None,
+    støj: float = 0.05,
+    spredning: float = 0.5,
+    seed: int = None
+) -> List[Tuple[str, pd.DataFrame]]:
+    """
+    Laver en simuleret valgnat ud fra et rigtigt valg.
+
+    Args:
+        csv_fil: Sti til CSV med valgdata (rå format med kandidatrækker)
+        swing: Dictionary med partibogstav -> faktor på partiets stemmer
+               (f.eks. {"Ø": 1.25, "A": 0.85})
+        støj: Spredning på den lokale (log-normale) variation i swing per
+              valgsted og parti
+        spredning: Spredning på rækkefølgen. 0 giver strengt mindste valgsted først
+        seed: Seed til tilfældighedsgeneratoren
+
+    Returns:
+        Liste af (valgsted, rækker) i den rækkefølge valgstederne ankommer
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(csv_fil, sep=';', encoding='utf-8-sig')[KOLONNER]
+
+    # Lokal variation i swing: én faktor per valgsted og parti
+    nøgler = df['Afstemningsområde'] + '\x00' + df['Bogstavbetegnelse']
+    koder, unikke = pd.factorize(nøgler)
+    lokal = np.exp(rng.normal(0.0, støj, len(unikke)))[koder]
+
+    faktor = df['Bogstavbetegnelse'].map(swing or {}).fillna(1.0).to_numpy()
+    df['Stemmetal'] = np.round(df['Stemmetal'].to_numpy() * faktor * lokal).astype(int)
+
+    # Små valgsteder først, med tilfældig spredning
+    størrelse = df.groupby('Afstemningsområde')['Stemmetal'].sum()
+    nøgle = størrelse * np.exp(rng.normal(0.0, spredning, len(størrelse)))
+    rækkefølge = nøgle.sort_values().index
+
+    grupper = dict(tuple(df.groupby('Afstemningsområde', sort=False)))
+    return [(valgsted, grupper[valgsted]) for valgsted in rækkefølge]
+
+
+def _filnavn(nummer: int, valgsted: str) -> str:
+    """Filnavn for ét valgsted i mappetilstand."""
+    return f"{nummer:04d}_{re.sub(r'[^0-9A-Za-zÆØÅæøå]+', '_', valgsted).strip('_')}.csv"
+
+
+def genafspil(
+    valgnat: List[Tuple[str, pd.DataFrame]],
+    live_csv: str = None,
+    mappe: str = None,
+    hastighed: float = 1.0,
+    vis_status: bool = True
+) -> float:
+    """
+    Skriver valgstederne ud i ankomstrækkefølge med en given hastighed.
+
+    Præcis én af live_csv og mappe skal angives. Indholdet renderes til tekst
+    inden genafspilningen starter, så hastigheden kun begrænses af disken.
+
+    Args:
+        valgnat: Resultat fra lav_valgnat()
+        live_csv: Sti til en live CSV der vokser med ét valgsted ad gangen
+        mappe: Mappe hvor hvert valgsted skrives som sin egen CSV-fil
+        hastighed: Valgsteder per sekund (0 = så hurtigt som muligt)
+        vis_status: Print status undervejs
+
+    Returns:
+        Faktisk antal valgsteder per sekund
+    """
+    if (live_csv is None) == (mappe is None):
+        raise ValueError("Angiv enten live_csv eller mappe")
+
+    header = ';'.join(KOLONNER) + '\n'
+    blokke = [
+        (valgsted, rækker.to_csv(sep=';', header=False, index=False))
+        for valgsted, rækker in valgnat
+    ]
+
+    if live_csv is not None:
+        with open(live_csv, 'w', encoding='utf-8') as f:
+            f.write(header)
+    else:
+        os.makedirs(mappe, exist_ok=True)
+
+    start = time.perf_counter()
+    for nummer, (valgsted, blok) in enumerate(blokke):
+        if hastighed > 0:
+            vent = start + nummer / hastighed - time.perf_counter()
+            if vent > 0:
+                time.sleep(vent)
+
+        if live_csv is not None:
+            # Ét write-kald per valgsted, så et valgsted ikke ses halvt skrevet
+            with open(live_csv, 'a', encoding='utf-8') as f:
+                f.write(blok)
+        else:
+            # Skriv til midlertidig fil og omdøb, så filen aldrig ses halvt skrevet
+            sti = os.path.join(mappe, _filnavn(nummer, valgsted))
+            with open(sti + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(header + blok)
+            os.replace(sti + '.tmp', sti)
+
+        if vis_status:
+            print(f"[{time.strftime('%H:%M:%S')}] {nummer + 1:4d}/{len(blokke)} {valgsted:30s}", end='\r')
+
+    varighed = time.perf_counter() - start
+    opnået = len(blokke) / varighed if varighed > 0 else float('inf')
+
+    if vis_status:
+        print(f"\nGenafspillede {len(blokke)} valgsteder på {varighed:.1f}s "
+              f"({opnået:.0f} valgsteder/s)")
+
+    return opnået
+
+
+if __name__ == "__main__":
+    import sys
+    from valgmodel_cli import main
+
+    sys.exit(main(["replay", *sys.argv[1:]]))
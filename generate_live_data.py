@@ -3,12 +3,20 @@ Genererer JSON data til live HTML visning.
 """
 
 import json
-from valgmodel import Valgmodel
+import os
+from typing import Dict, Union
+import numpy as np
+from valgmodel import Konfidensinterval, Valgmodel
 from mandatfordeling import Mandatfordeling, KØBENHAVN_VALGFORBUND
+from resultatvektor import Resultatvektor
+from partifarver import PARTI_FARVER, DEFAULT_FARVE
 
 # Partier der skal behandles som nye (ikke samme som ved forrige valg)
 NYE_PARTIER = ["M", "N", "Æ", "Q"]
 
+# Deles mellem opdateringer, så den kompilerede fordeling genbruges
+_MANDATFORDELING = Mandatfordeling(KØBENHAVN_VALGFORBUND)
+
 
 def generer_live_data(
     model: Valgmodel,
@@ -35,78 +43,105 @@ def generer_live_data(
     # 2. Få prediкtion
     prediкtion_procent = model.prediкer(nuværende_data, optalte_valgsteder)
 
-    # 2. Konverter til stemmer (antag samme total som forrige valg)
-    total_stemmer = sum(model.forrige_valg_data['Stemmer'])
-    stemmer = {
-        parti: int(pct / 100 * total_stemmer)
-        for parti, pct in prediкtion_procent.items()
-    }
+    return byg_live_data(model, prediкtion_procent, len(optalte_valgsteder), total_mandater)
+
+
+def byg_live_data(
+    model: Valgmodel,
+    prediкtion_procent: Union[Dict[str, float], Resultatvektor],
+    antal_optalte_valgsteder: int,
+    total_mandater: int = 55,
+    konfidensinterval: Konfidensinterval = None,
+    mandatfordeling: Mandatfordeling = None,
+    optalte_stemmer: Resultatvektor = None
+) -> dict:
+    """
+    Bygger data til live visning ud fra en færdig prediкtion.
 
-    # 3. Fordel mandater
-    mf = Mandatfordeling(KØBENHAVN_VALGFORBUND)
-    parti_mandater, forbund_mandater = mf.fordel_mandater(stemmer, total_mandater)
+    Args:
+        model: Valgmodel instans
+        prediкtion_procent: Dictionary (eller Resultatvektor) med
+                            parti_bogstav -> prediкeret procent
+        antal_optalte_valgsteder: Antal valgsteder der er optalt
+        total_mandater: Antal mandater at fordele
+        konfidensinterval: Bootstrap-intervaller der tilføjes metadata
+        mandatfordeling: Valgforbund at fordele med (standard: Københavns)
+        optalte_stemmer: Stemmer på de optalte valgsteder, som tilføjes
+                         metadata (til hvad-nu-hvis scenarier)
 
-    # 4. Byg output struktur
+    Returns:
+        Dictionary med komplet data til visning
+    """
+    # 1. Konverter til stemmer (antag samme total som forrige valg)
+    if not isinstance(prediкtion_procent, Resultatvektor):
+        prediкtion_procent = Resultatvektor.fra_dict(prediкtion_procent)
+    total_stemmer = model.total_stemmer
+    stemmer = prediкtion_procent.erstat(
+        (prediкtion_procent.værdier / 100 * total_stemmer).astype(np.int64)
+    )
+
+    # 2. Fordel mandater
+    if mandatfordeling is None:
+        mandatfordeling = _MANDATFORDELING
+    parti_mandater, forbund_mandater = mandatfordeling.fordel_mandater(stemmer, total_mandater)
+
+    # 3. Byg output struktur
     output = {
         "metadata": {
             "total_mandater": total_mandater,
             "total_stemmer": total_stemmer,
-            "antal_optalte_valgsteder": len(optalte_valgsteder),
-            "procent_optalt": len(optalte_valgsteder) / len(model.forrige_valg_data['Valgsted'].unique()) * 100
+            "antal_optalte_valgsteder": antal_optalte_valgsteder,
+            "procent_optalt": antal_optalte_valgsteder / model.antal_valgsteder * 100
         },
         "forbund": [],
         "partier": []
     }
+    if konfidensinterval is not None:
+        lav, høj = konfidensinterval.lav, konfidensinterval.høj
+        output["metadata"]["konfidensinterval"] = {
+            "niveau": konfidensinterval.niveau,
+            "antal": konfidensinterval.antal,
+            "procent": {parti: [round(lav[parti], 2), round(høj[parti], 2)] for parti in lav}
+        }
+    if optalte_stemmer is not None:
+        output["metadata"]["optalte_stemmer"] = {
+            parti: int(round(antal))
+            for parti, antal in zip(optalte_stemmer.indeks.navne, optalte_stemmer.værdier.tolist()) if antal
+        }
 
-    # Parti farver (standard danske partier)
-    parti_farver = {
-        "A": "#E3515D",  # Socialdemokratiet - rød
-        "B": "#EB4295",  # Radikale - magenta
-        "C": "#429969",  # Konservative - grøn
-        "D": "#5BC0EB",  # Nye Borgerlige - lyseblå
-        "F": "#9C1D5A",  # SF - lilla
-        "I": "#3FB2BE",  # Liberal Alliance - cyan
-        "O": "#FFD700",  # Dansk Folkeparti - gul
-        "V": "#254D73",  # Venstre - mørkeblå
-        "Ø": "#E6801A",  # Enhedslisten - orange/rød
-        "Å": "#50A64E",  # Alternativet - grøn
-        "K": "#F4CE50",  # Kristendemokraterne - gul
-        "M": "#8B4789",  # Danmark for Alle - lilla
-        "N": "#DC143C",  # Kommunisterne - rød
-    }
-
-    # Default farve for andre partier
-    default_farve = "#999999"
+    parti_index = stemmer.indeks.index
+    parti_stemmer_liste = stemmer.værdier.tolist()
+    parti_mandater_liste = parti_mandater.værdier.tolist()
+    forbund_mandater_liste = forbund_mandater.værdier.tolist()
 
     # Byg forbund data
-    for forbund_navn, forbund_partier in KØBENHAVN_VALGFORBUND.items():
-        forbund_stemmer = sum(stemmer.get(p, 0) for p in forbund_partier)
+    for j, (forbund_navn, forbund_partier) in enumerate(mandatfordeling.valgforbund.items()):
+        index = [parti_index.get(p) for p in forbund_partier]
+        forbund_stemmer = sum(parti_stemmer_liste[i] for i in index if i is not None)
         forbund_pct = forbund_stemmer / total_stemmer * 100
-        forbund_m = forbund_mandater.get(forbund_navn, 0)
 
         forbund_data = {
             "navn": forbund_navn,
-            "mandater": forbund_m,
+            "mandater": forbund_mandater_liste[j],
             "stemmer": forbund_stemmer,
             "procent": round(forbund_pct, 2),
             "partier": []
         }
 
         # Byg parti data i forbund
-        for parti in forbund_partier:
-            parti_stemmer = stemmer.get(parti, 0)
+        for parti, i in zip(forbund_partier, index):
+            parti_stemmer = parti_stemmer_liste[i] if i is not None else 0
             if parti_stemmer == 0:
                 continue
 
             parti_pct = parti_stemmer / total_stemmer * 100
-            parti_m = parti_mandater.get(parti, 0)
 
             parti_data = {
                 "bogstav": parti,
-                "mandater": parti_m,
+                "mandater": parti_mandater_liste[i],
                 "stemmer": parti_stemmer,
                 "procent": round(parti_pct, 2),
-                "farve": parti_farver.get(parti, default_farve)
+                "farve": PARTI_FARVER.get(parti, DEFAULT_FARVE)
             }
 
             forbund_data["partier"].append(parti_data)
@@ -127,33 +162,26 @@ def generer_live_data(
 
 
 def gem_live_data_json(output: dict, filnavn: str = "live_data.json"):
-    """Gemmer data som JSON fil."""
-    with open(filnavn, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    """
+    Gemmer data som JSON fil.
 
+    Skrives til en midlertidig fil der omdøbes, så HTML'en aldrig læser en
+    halvt skrevet fil. JSON'en skrives kompakt (uden indrykning), da den
+    hentes ved hver opdatering.
+    """
+    gem_atomisk(json.dumps(output, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), filnavn)
 
-if __name__ == "__main__":
-    # Test eksempel
-    model = Valgmodel(
-        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
-        nye_partier=NYE_PARTIER
-    )
 
-    # Generer data
-    # CSV'en indeholder automatisk hvilke valgsteder der er optalt
-    data = generer_live_data(
-        model,
-        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
-        55
-    )
+def gem_atomisk(indhold: bytes, filnavn: str):
+    """Skriver bytes til en midlertidig fil og omdøber den til filnavn."""
+    midlertidig = filnavn + '.tmp'
+    with open(midlertidig, 'wb') as f:
+        f.write(indhold)
+    os.replace(midlertidig, filnavn)
+
 
-    # Gem som JSON
-    gem_live_data_json(data)
+if __name__ == "__main__":
+    import sys
+    from valgmodel_cli import main
 
-    print("Live data genereret og gemt i live_data.json")
-    print(f"\nMetadata:")
-    print(f"  Total mandater: {data['metadata']['total_mandater']}")
-    print(f"  Optalt: {data['metadata']['antal_optalte_valgsteder']} valgsteder ({data['metadata']['procent_optalt']:.1f}%)")
-    print(f"\nTop 3 partier:")
-    for parti in data['partier'][:3]:
-        print(f"  {parti['bogstav']}: {parti['mandater']} mandater ({parti['procent']:.2f}%)")
+    sys.exit(main(["predict", *sys.argv[1:]]))
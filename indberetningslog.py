@@ -0,0 +1,559 @@
+"""
+Versioneret log over indberetninger fra valgstederne.
+
+Hver indberetning (ankomsttidspunkt, valgsted, version og stemmer per parti)
+tilføjes en log der kun kan vokse. Når et valgsted genudgives med rettede
+tal, trækkes den gamle version fra de løbende summer og den nye lægges til -
+der genberegnes aldrig fra bunden.
+
+Med jævne mellemrum gemmes et snapshot af summerne. Tilstanden på et vilkårligt
+tidligere tidspunkt findes ved at tage det seneste snapshot før tidspunktet og
+lægge de (højst snapshot_interval) efterfølgende ændringer til. Det giver
+konstant tid uanset hvor lang loggen er, så prediкtionen kan genskabes ved
+revision og genafspilning.
+
+Med et Anomalitjek scores hver batch mod valgstedernes forventede resultat
+før den lægges til summerne, og afvigere holdes i karantæne indtil de
+frigives (eller rettes af en ny indberetning).
+"""
+
+import time
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from anomali import Anomalitjek
+from valgmodel import Valgmodel
+from resultatvektor import Partiindeks, Resultatvektor
+
+
+class Indberetning(NamedTuple):
+    """Én indberetning fra et valgsted, som den er gemt i loggen."""
+    tidspunkt: float
+    valgsted: str
+    version: int
+    stemmer: Dict[str, float]
+    # Ændring i de løbende summer som indberetningen gav anledning til
+    delta_nuværende: np.ndarray
+    delta_forrige: np.ndarray
+    delta_optalte: int
+
+
+class Anomali(NamedTuple):
+    """Et valgsted som anomalitjekket har markeret."""
+    tidspunkt: float
+    valgsted: str
+    stemmer: Dict[str, float]
+    score: float
+    # "stemmetal" eller partibogstavet med størst afvigelse
+    grund: str
+
+
+class Indberetningslog:
+    """
+    Append-only log over valgstedsindberetninger med løbende summer.
+    """
+
+    def __init__(self, model: Valgmodel, snapshot_interval: int = 50, anomalitjek: Anomalitjek = None):
+        """
+        Initialiserer loggen.
+
+        Args:
+            model: Valgmodel instans med data fra forrige valg
+            snapshot_interval: Antal indberetninger mellem hvert snapshot
+            anomalitjek: Scorer batches i registrer_batch og markerer eller
+                         holder afvigere tilbage (None = intet tjek)
+        """
+        self.model = model
+        self.snapshot_interval = snapshot_interval
+        self.anomalitjek = anomalitjek
+
+        # Alle markerede valgsteder, og dem der holdes ude af summerne
+        self.anomalier: List[Anomali] = []
+        self.karantæne: Dict[str, Anomali] = {}
+
+        forrige_matrix = model._beregn_valgsted_matrix(model.forrige_valg_data)
+        self.partier: List[str] = list(forrige_matrix.columns)
+        self._parti_index: Dict[str, int] = {p: i for i, p in enumerate(self.partier)}
+        self._indeks = Partiindeks(self.partier)
+        self._forrige_stemmer: Dict[str, np.ndarray] = dict(
+            zip(forrige_matrix.index, forrige_matrix.to_numpy(dtype=float))
+        )
+
+        # Løbende summer over de optalte valgsteder
+        self.nuværende_sum = np.zeros(len(self.partier))
+        self.forrige_sum = np.zeros(len(self.partier))
+        self.antal_optalte = 0
+
+        # Seneste version og stemmevektor for hvert valgsted
+        self._seneste: Dict[str, Tuple[int, np.ndarray]] = {}
+
+        # Stemmer per optalt valgsted (nuværende og forrige valg) i den
+        # rækkefølge valgstederne blev optalt; holdes ved lige sammen med
+        # summerne og bruges som reference i anomalitjekket og til bootstrap
+        self._række: Dict[str, int] = {}
+        self._matrix_nuværende = np.zeros((64, len(self.partier)))
+        self._matrix_forrige = np.zeros((64, len(self.partier)))
+
+        self.hændelser: List[Indberetning] = []
+        self._tidspunkter: List[float] = []
+
+        # Snapshots: (antal hændelser, nuværende_sum, forrige_sum, antal_optalte)
+        self._snapshots: List[Tuple[int, np.ndarray, np.ndarray, int]] = [
+            (0, self.nuværende_sum.copy(), self.forrige_sum.copy(), 0)
+        ]
+        self._snapshot_tidspunkter: List[float] = [float('-inf')]
+
+    def _sikr_partier(self, partier) -> None:
+        """Udvider partiindekset med partier der ikke er set før."""
+        nye = [p for p in partier if p not in self._parti_index]
+        if not nye:
+            return
+
+        for parti in nye:
+            self._parti_index[parti] = len(self.partier)
+            self.partier.append(parti)
+        self._indeks = Partiindeks(self.partier)
+
+        self.nuværende_sum = np.pad(self.nuværende_sum, (0, len(nye)))
+        self.forrige_sum = np.pad(self.forrige_sum, (0, len(nye)))
+        self._matrix_nuværende = np.pad(self._matrix_nuværende, ((0, 0), (0, len(nye))))
+        self._matrix_forrige = np.pad(self._matrix_forrige, ((0, 0), (0, len(nye))))
+
+    def _gem_rækker(self, valgsteder: List[str], stemmer: np.ndarray) -> None:
+        """
+        Skriver valgstedernes seneste stemmer ind i valgstedsmatricerne.
+
+        Nye valgsteder får en række bagerst (med deres stemmer fra forrige
+        valg), og matricerne fordobles når de er fyldt op.
+
+        Args:
+            valgsteder: Nye eller rettede valgsteder
+            stemmer: Deres stemmer (valgsted × parti, alignet med self.partier)
+        """
+        rækker = np.empty(len(valgsteder), dtype=np.intp)
+        nye = []
+        for k, valgsted in enumerate(valgsteder):
+            række = self._række.get(valgsted)
+            if række is None:
+                række = self._række[valgsted] = len(self._række)
+                nye.append(k)
+            rækker[k] = række
+
+        if len(self._række) > len(self._matrix_nuværende):
+            kapacitet = max(len(self._række), 2 * len(self._matrix_nuværende))
+            udvidelse = ((0, kapacitet - len(self._matrix_nuværende)), (0, 0))
+            self._matrix_nuværende = np.pad(self._matrix_nuværende, udvidelse)
+            self._matrix_forrige = np.pad(self._matrix_forrige, udvidelse)
+
+        self._matrix_nuværende[rækker, :stemmer.shape[1]] = stemmer
+        for k in nye:
+            vektor = self._forrige_stemmer.get(valgsteder[k], ())
+            self._matrix_forrige[rækker[k], :len(vektor)] = vektor
+
+    @property
+    def indeks(self) -> Partiindeks:
+        """Uforanderligt partiindeks som summerne er alignet med."""
+        return self._indeks
+
+    @staticmethod
+    def _læg_til(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Lægger to vektorer sammen, hvor den korteste fyldes op med nuller."""
+        if len(a) < len(b):
+            a = np.pad(a, (0, len(b) - len(a)))
+        a[:len(b)] += b
+        return a
+
+    def registrer(
+        self,
+        valgsted: str,
+        stemmer: Dict[str, float],
+        tidspunkt: float = None,
+        version: int = None
+    ) -> bool:
+        """
+        Registrerer en indberetning (eller rettelse) fra et valgsted.
+
+        Args:
+            valgsted: Navn på valgstedet
+            stemmer: Dictionary med partibogstav -> antal stemmer
+            tidspunkt: Ankomsttidspunkt (standard: nu)
+            version: Indberetningens version (standard: seneste version + 1).
+                     Versioner der ikke er nyere end den seneste ignoreres.
+
+        Returns:
+            True hvis indberetningen ændrede summerne
+        """
+        return self._registrer(valgsted, stemmer, tidspunkt, version, tjek=True)
+
+    def _registrer(
+        self,
+        valgsted: str,
+        stemmer: Dict[str, float],
+        tidspunkt: Optional[float],
+        version: Optional[int],
+        tjek: bool
+    ) -> bool:
+        """Som registrer, men anomalitjekket kan springes over (ved frigiv)."""
+        if tidspunkt is None:
+            tidspunkt = time.time()
+        if self._tidspunkter and tidspunkt < self._tidspunkter[-1]:
+            raise ValueError(
+                f"Indberetningen fra {valgsted} er ældre end den seneste i loggen"
+            )
+
+        forrige_version, gammel = self._seneste.get(valgsted, (0, None))
+        if version is None:
+            version = forrige_version + 1
+        elif version <= forrige_version:
+            return False
+
+        self._sikr_partier(stemmer.keys())
+
+        ny = np.zeros(len(self.partier))
+        for parti, antal in stemmer.items():
+            ny[self._parti_index[parti]] = antal
+
+        if tjek and self.anomalitjek is not None:
+            if self._uændret_i_karantæne(valgsted, stemmer):
+                return False
+            forrige = np.zeros_like(ny)
+            vektor = self._forrige_stemmer.get(valgsted, ())
+            forrige[:len(vektor)] = vektor
+            karantæne = self._tjek([(valgsted, stemmer)], ny[None], forrige[None], np.ones(1, dtype=bool), tidspunkt)
+            if karantæne[0]:
+                return False
+
+        # Træk den gamle version fra og læg den nye til
+        if gammel is None:
+            delta_nuværende = ny
+            delta_forrige = self._forrige_stemmer.get(valgsted, np.zeros(0))
+            delta_optalte = 1
+        else:
+            delta_nuværende = ny.copy()
+            delta_nuværende[:len(gammel)] -= gammel
+            delta_forrige = np.zeros(0)
+            delta_optalte = 0
+
+        self.nuværende_sum = self._læg_til(self.nuværende_sum, delta_nuværende)
+        self.forrige_sum = self._læg_til(self.forrige_sum, delta_forrige)
+        self.antal_optalte += delta_optalte
+        self._seneste[valgsted] = (version, ny)
+        self._gem_rækker([valgsted], ny[None])
+
+        self.hændelser.append(Indberetning(
+            tidspunkt, valgsted, version, dict(stemmer),
+            delta_nuværende, delta_forrige, delta_optalte
+        ))
+        self._tidspunkter.append(tidspunkt)
+        self._måske_snapshot(tidspunkt)
+
+        return True
+
+    def registrer_batch(
+        self,
+        indberetninger: List[Tuple[str, Dict[str, float]]],
+        tidspunkt: float = None
+    ) -> int:
+        """
+        Registrerer mange valgsteder med samme ankomsttidspunkt i ét skridt.
+
+        Summerne opdateres med én matrixsummering for hele batchen i stedet
+        for én vektoroperation per valgsted. Hvert valgsted får sin egen
+        hændelse i loggen med version = seneste version + 1.
+
+        Med et anomalitjek scores de nye og rettede valgsteder samlet først;
+        afvigere i karantæne tæller hverken med i summerne eller i antallet.
+        Et valgsted i karantæne der indberettes igen med samme stemmer (f.eks.
+        når live CSV'en genindlæses), scores ikke igen.
+
+        Args:
+            indberetninger: Liste af (valgsted, stemmer) hvor stemmer er
+                            partibogstav -> antal stemmer
+            tidspunkt: Ankomsttidspunkt (standard: nu)
+
+        Returns:
+            Antal nye eller rettede valgsteder
+        """
+        if tidspunkt is None:
+            tidspunkt = time.time()
+        if self._tidspunkter and tidspunkt < self._tidspunkter[-1]:
+            raise ValueError("Batchen er ældre end den seneste indberetning i loggen")
+        if not indberetninger:
+            return 0
+
+        self._sikr_partier(sorted({p for _, stemmer in indberetninger for p in stemmer}))
+        antal_partier = len(self.partier)
+
+        ny = np.zeros((len(indberetninger), antal_partier))
+        gammel = np.zeros_like(ny)
+        forrige = np.zeros_like(ny)
+        er_ny = np.zeros(len(indberetninger), dtype=bool)
+
+        for i, (valgsted, stemmer) in enumerate(indberetninger):
+            for parti, antal in stemmer.items():
+                ny[i, self._parti_index[parti]] = antal
+
+            forrige_vektor = self._forrige_stemmer.get(valgsted, ())
+            forrige[i, :len(forrige_vektor)] = forrige_vektor
+            _, tidligere = self._seneste.get(valgsted, (0, None))
+            if tidligere is None:
+                er_ny[i] = True
+            else:
+                gammel[i, :len(tidligere)] = tidligere
+
+        # Træk gamle versioner fra og læg nye til - for hele batchen på én gang
+        delta = ny - gammel
+        ændret = er_ny | (delta != 0).any(axis=1)
+        if self.anomalitjek is not None:
+            if self.karantæne:
+                for i, (valgsted, stemmer) in enumerate(indberetninger):
+                    if ændret[i] and self._uændret_i_karantæne(valgsted, stemmer):
+                        ændret[i] = False
+            if ændret.any():
+                ændret &= ~self._tjek(indberetninger, ny, forrige, ændret, tidspunkt)
+        forrige[~er_ny] = 0
+
+        self.nuværende_sum += delta[ændret].sum(axis=0)
+        self.forrige_sum += forrige[ændret].sum(axis=0)
+        self.antal_optalte += int((er_ny & ændret).sum())
+
+        tom = np.zeros(0)
+        rækker = np.flatnonzero(ændret)
+        self._gem_rækker([indberetninger[i][0] for i in rækker], ny[rækker])
+        for i in rækker:
+            valgsted, stemmer = indberetninger[i]
+            version = self._seneste.get(valgsted, (0, None))[0] + 1
+            self._seneste[valgsted] = (version, ny[i])
+            self.hændelser.append(Indberetning(
+                tidspunkt, valgsted, version, dict(stemmer),
+                delta[i], forrige[i] if er_ny[i] else tom, int(er_ny[i])
+            ))
+            self._tidspunkter.append(tidspunkt)
+
+        self._måske_snapshot(tidspunkt)
+
+        return int(ændret.sum())
+
+    def _tjek(
+        self,
+        indberetninger: List[Tuple[str, Dict[str, float]]],
+        ny: np.ndarray,
+        forrige: np.ndarray,
+        ændret: np.ndarray,
+        tidspunkt: float
+    ) -> np.ndarray:
+        """
+        Scorer batchens nye og rettede valgsteder mod de optalte valgsteder.
+
+        Returns:
+            Maske over batchen med de valgsteder der holdes i karantæne
+        """
+        rækker = np.flatnonzero(ændret)
+        antal = len(self._række)
+
+        # En rettelse sammenlignes ikke med sin egen tidligere version
+        maske = np.zeros((len(rækker), antal), dtype=bool)
+        for k, i in enumerate(rækker):
+            j = self._række.get(indberetninger[i][0])
+            if j is not None:
+                maske[k, j] = True
+
+        score, værste = self.anomalitjek.scor(
+            ny[rækker], forrige[rækker],
+            self._matrix_nuværende[:antal], self._matrix_forrige[:antal], maske
+        )
+
+        karantæne = np.zeros(len(indberetninger), dtype=bool)
+        for k, i in enumerate(rækker):
+            valgsted, stemmer = indberetninger[i]
+            if not score[k] > self.anomalitjek.grænse:
+                # En godkendt rettelse afløser en version i karantæne
+                self.karantæne.pop(valgsted, None)
+                continue
+            grund = "stemmetal" if værste[k] < 0 else self.partier[værste[k]]
+            anomali = Anomali(tidspunkt, valgsted, dict(stemmer), float(score[k]), grund)
+            self.anomalier.append(anomali)
+            if self.anomalitjek.karantæne:
+                self.karantæne[valgsted] = anomali
+                karantæne[i] = True
+        return karantæne
+
+    def _uændret_i_karantæne(self, valgsted: str, stemmer: Dict[str, float]) -> bool:
+        """True hvis valgstedet allerede er i karantæne med præcis disse stemmer."""
+        anomali = self.karantæne.get(valgsted)
+        return anomali is not None and anomali.stemmer == stemmer
+
+    def frigiv(self, valgsted: str, tidspunkt: float = None) -> bool:
+        """
+        Frigiver et valgsted fra karantæne og registrerer dets stemmer.
+
+        Args:
+            valgsted: Navn på valgstedet
+            tidspunkt: Ankomsttidspunkt i loggen (standard: nu)
+
+        Returns:
+            True hvis indberetningen ændrede summerne
+        """
+        anomali = self.karantæne.pop(valgsted, None)
+        if anomali is None:
+            raise ValueError(f"{valgsted} er ikke i karantæne")
+        return self._registrer(valgsted, anomali.stemmer, tidspunkt, None, tjek=False)
+
+    def afvis(self, valgsted: str) -> None:
+        """
+        Afviser et valgsted i karantæne. Det tæller først med når det indberettes igen.
+
+        Args:
+            valgsted: Navn på valgstedet
+        """
+        if self.karantæne.pop(valgsted, None) is None:
+            raise ValueError(f"{valgsted} er ikke i karantæne")
+
+    def valgstedstilstand(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Seneste version og stemmevektor for hvert optalt valgsted.
+
+        Returns:
+            Tuple med valgsteder, versioner og stemmer (valgsted × parti,
+            alignet med self.partier)
+        """
+        valgsteder = list(self._række)
+        versioner = np.array([self._seneste[v][0] for v in valgsteder], dtype=np.int64)
+        return valgsteder, versioner, self._matrix_nuværende[:len(valgsteder)].copy()
+
+    def valgstedsmatricer(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stemmer per optalt valgsted i nuværende og forrige valg (til bootstrap).
+
+        Returns:
+            Tuple med nuværende og forrige stemmer (valgsted × parti, alignet
+            med self.partier). Summen over valgstederne er de løbende summer
+        """
+        antal = len(self._række)
+        return self._matrix_nuværende[:antal].copy(), self._matrix_forrige[:antal].copy()
+
+    def gendan(
+        self,
+        partier: List[str],
+        valgsteder: List[str],
+        versioner: np.ndarray,
+        stemmer: np.ndarray
+    ) -> None:
+        """
+        Gendanner valgstedernes tilstand (f.eks. fra et kontrolpunkt).
+
+        Loggen skal være tom. Den gendannede tilstand bliver loggens
+        udgangspunkt: hændelserne fra før gendannelsen kendes ikke, så
+        tilstand_ved() giver den gendannede tilstand for alle tidligere
+        tidspunkter.
+
+        Args:
+            partier: Partier som stemmernes søjler svarer til
+            valgsteder: Optalte valgsteder
+            versioner: Seneste version for hvert valgsted
+            stemmer: Stemmer (valgsted × parti)
+        """
+        if self._seneste or self.hændelser:
+            raise ValueError("Kan kun gendanne en tom indberetningslog")
+
+        self._sikr_partier(partier)
+        matrix = np.zeros((len(valgsteder), len(self.partier)))
+        matrix[:, [self._parti_index[p] for p in partier]] = stemmer
+
+        self.nuværende_sum = matrix.sum(axis=0)
+        self.forrige_sum = np.zeros(len(self.partier))
+        for valgsted in valgsteder:
+            self.forrige_sum = self._læg_til(self.forrige_sum, self._forrige_stemmer.get(valgsted, np.zeros(0)))
+        self.antal_optalte = len(valgsteder)
+        self._seneste = {
+            valgsted: (int(version), matrix[i])
+            for i, (valgsted, version) in enumerate(zip(valgsteder, versioner))
+        }
+        self._gem_rækker(list(valgsteder), matrix)
+        self._snapshots = [(0, self.nuværende_sum.copy(), self.forrige_sum.copy(), self.antal_optalte)]
+
+    def _måske_snapshot(self, tidspunkt: float) -> None:
+        """Gemmer et snapshot når der er kommet snapshot_interval nye hændelser."""
+        if len(self.hændelser) - self._snapshots[-1][0] < self.snapshot_interval:
+            return
+
+        self._snapshots.append((
+            len(self.hændelser),
+            self.nuværende_sum.copy(),
+            self.forrige_sum.copy(),
+            self.antal_optalte
+        ))
+        self._snapshot_tidspunkter.append(tidspunkt)
+
+    def registrer_dataframe(self, data: pd.DataFrame, tidspunkt: float = None) -> int:
+        """
+        Registrerer alle valgsteder i en DataFrame (f.eks. en genindlæst live CSV).
+
+        Valgsteder hvis stemmetal er uændrede siden seneste version, springes over,
+        så kun nye og rettede valgsteder ender i loggen.
+
+        Args:
+            data: DataFrame med valgdata (som fra Valgmodel._load_data)
+            tidspunkt: Ankomsttidspunkt (standard: nu)
+
+        Returns:
+            Antal nye eller rettede valgsteder
+        """
+        matrix = self.model._beregn_valgsted_matrix(data)
+        partier = list(matrix.columns)
+
+        return self.registrer_batch([
+            (valgsted, dict(zip(partier, række)))
+            for valgsted, række in zip(matrix.index, matrix.to_numpy(dtype=float))
+        ], tidspunkt)
+
+    def tilstand_ved(self, tidspunkt: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Genskaber de løbende summer som de var på et givet tidspunkt.
+
+        Args:
+            tidspunkt: Tidspunkt (standard: nu)
+
+        Returns:
+            Tuple med:
+            - Stemmer på optalte valgsteder (nuværende valg), alignet med self.partier
+            - Stemmer på samme valgsteder (forrige valg), alignet med self.partier
+            - Antal optalte valgsteder
+        """
+        if tidspunkt is None:
+            return self.nuværende_sum.copy(), self.forrige_sum.copy(), self.antal_optalte
+
+        # Seneste snapshot på eller før tidspunktet
+        snapshot = self._snapshots[bisect_right(self._snapshot_tidspunkter, tidspunkt) - 1]
+        start, nuværende_sum, forrige_sum, antal_optalte = snapshot
+        slut = bisect_right(self._tidspunkter, tidspunkt)
+
+        nuværende_sum = np.pad(nuværende_sum, (0, len(self.partier) - len(nuværende_sum)))
+        forrige_sum = np.pad(forrige_sum, (0, len(self.partier) - len(forrige_sum)))
+
+        # Højst snapshot_interval hændelser skal lægges til
+        for hændelse in self.hændelser[start:slut]:
+            nuværende_sum[:len(hændelse.delta_nuværende)] += hændelse.delta_nuværende
+            forrige_sum[:len(hændelse.delta_forrige)] += hændelse.delta_forrige
+            antal_optalte += hændelse.delta_optalte
+
+        return nuværende_sum, forrige_sum, antal_optalte
+
+    def prediкtion(self, tidspunkt: Optional[float] = None) -> Resultatvektor:
+        """
+        Prediкerer resultatet ud fra de løbende summer.
+
+        Args:
+            tidspunkt: Tidspunkt prediкtionen skal genskabes for (standard: nu)
+
+        Returns:
+            Resultatvektor (og Mapping) med parti_bogstav -> prediкeret procent
+        """
+        nuværende_sum, forrige_sum, _ = self.tilstand_ved(tidspunkt)
+        return self.model.prediкer_fra_stemmer(
+            Resultatvektor(self.indeks, nuværende_sum),
+            Resultatvektor(self.indeks, forrige_sum)
+        )
@@ -0,0 +1,266 @@
+"""
+Søjleeksport af valgnattens data til Parquet.
+
+Til analyser efter valgnatten eksporteres tre tabeller i lang form (én række
+per valgsted og parti eller per version og parti):
+
+    <mappe>/forrige_valg/   valgsted, parti, stemmer
+    <mappe>/indberetninger/ tidspunkt, valgsted, version, parti, stemmer
+    <mappe>/prognoser/      tidspunkt, version, procent_optalt, parti,
+                            procent, mandater
+
+Valgsted og parti er dictionary-kodede, så hvert navn kun gemmes én gang per
+fil og indlæses som kategorier i pandas. Rækkerne samles i hukommelsen og
+skrives som en ny delfil hver gang der er samlet en rækkegruppe (og ved
+luk()). En delfil skrives under et skjult navn og omdøbes når den er
+færdig, så en tabel altid kan læses som helhed - også mens eksporten kører:
+
+    import pandas as pd
+    prognoser = pd.read_parquet("eksport/prognoser")
+
+Eksporten kræver pyarrow. Uden pyarrow fejler Kolonneeksport med ImportError,
+og resten af valgmodellen virker uændret.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def _kategori(navne: List[str], indeks: np.ndarray) -> "pa.DictionaryArray":
+    """Dictionary-kodet søjle ud fra navnene og et indeks per række."""
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indeks, type=pa.int32()), pa.array(navne, type=pa.string())
+    )
+
+
+def _skemaer() -> Dict[str, "pa.Schema"]:
+    """Tabellernes faste skemaer."""
+    kategori = pa.dictionary(pa.int32(), pa.string())
+    return {
+        'forrige_valg': pa.schema([
+            ('valgsted', kategori),
+            ('parti', kategori),
+            ('stemmer', pa.int64()),
+        ]),
+        'indberetninger': pa.schema([
+            ('tidspunkt', pa.float64()),
+            ('valgsted', kategori),
+            ('version', pa.uint32()),
+            ('parti', kategori),
+            ('stemmer', pa.int64()),
+        ]),
+        'prognoser': pa.schema([
+            ('tidspunkt', pa.float64()),
+            ('version', pa.uint32()),
+            ('procent_optalt', pa.float32()),
+            ('parti', kategori),
+            ('procent', pa.float32()),
+            ('mandater', pa.uint8()),
+        ]),
+    }
+
+
+class _Deltabel:
+    """
+    Én tabel skrevet som en række færdige Parquet-delfiler.
+    """
+
+    def __init__(self, mappe: str, skema: "pa.Schema", session: str, række_gruppe: int):
+        self.mappe = mappe
+        self.skema = skema
+        self.session = session
+        self.række_gruppe = række_gruppe
+        self.antal_filer = 0
+        self._buffer: List["pa.Table"] = []
+        self._antal_rækker = 0
+        self._lås = threading.Lock()
+        os.makedirs(mappe, exist_ok=True)
+
+    def tilføj(self, kolonner: dict) -> None:
+        """Tilføjer rækker og skriver en delfil når rækkegruppen er fuld."""
+        tabel = pa.table(kolonner, schema=self.skema)
+        with self._lås:
+            self._buffer.append(tabel)
+            self._antal_rækker += tabel.num_rows
+            if self._antal_rækker >= self.række_gruppe:
+                self._skriv()
+
+    def gem(self) -> None:
+        """Skriver de samlede rækker som en delfil."""
+        with self._lås:
+            self._skriv()
+
+    def _skriv(self) -> None:
+        if not self._buffer:
+            return
+        self.antal_filer += 1
+        navn = f"del-{self.session}-{self.antal_filer:05d}.parquet"
+        skjult = os.path.join(self.mappe, "." + navn)
+        pq.write_table(pa.concat_tables(self._buffer), skjult, compression='zstd')
+        os.replace(skjult, os.path.join(self.mappe, navn))
+        self._buffer = []
+        self._antal_rækker = 0
+
+
+class Kolonneeksport:
+    """
+    Inkrementel eksport af valgsteder og publicerede prognoser til Parquet.
+    """
+
+    def __init__(self, mappe: str, række_gruppe: int = 50_000):
+        """
+        Args:
+            mappe: Mappe som tabellerne skrives i
+            række_gruppe: Antal rækker der samles før en delfil skrives
+        """
+        if pa is None:
+            raise ImportError("Kolonneeksporten kræver pyarrow (pip install pyarrow)")
+
+        self.mappe = mappe
+        # Delfilerne fra en genstartet proces må ikke overskrive de tidligere
+        session = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        skemaer = _skemaer()
+        self._forrige_skema = skemaer['forrige_valg']
+        self.indberetninger = _Deltabel(os.path.join(mappe, 'indberetninger'),
+                                        skemaer['indberetninger'], session, række_gruppe)
+        self.prognoser = _Deltabel(os.path.join(mappe, 'prognoser'),
+                                   skemaer['prognoser'], session, række_gruppe)
+
+    def skriv_forrige_valg(self, matrix: pd.DataFrame) -> None:
+        """
+        Skriver forrige valgs stemmer (erstatter en tidligere eksport).
+
+        Args:
+            matrix: Stemmer per valgsted × parti (som fra
+                    Valgmodel._beregn_valgsted_matrix)
+        """
+        stemmer = matrix.to_numpy(dtype=np.int64)
+        antal_valgsteder, antal_partier = stemmer.shape
+        tabel = pa.table({
+            'valgsted': _kategori([str(v) for v in matrix.index],
+                                  np.repeat(np.arange(antal_valgsteder), antal_partier)),
+            'parti': _kategori([str(p) for p in matrix.columns],
+                               np.tile(np.arange(antal_partier), antal_valgsteder)),
+            'stemmer': stemmer.ravel(),
+        }, schema=self._forrige_skema)
+
+        mappe = os.path.join(self.mappe, 'forrige_valg')
+        os.makedirs(mappe, exist_ok=True)
+        skjult = os.path.join(mappe, ".forrige_valg.parquet")
+        pq.write_table(tabel, skjult, compression='zstd')
+        os.replace(skjult, os.path.join(mappe, "forrige_valg.parquet"))
+
+    def tilføj_indberetninger(self, indberetninger: Iterable) -> int:
+        """
+        Tilføjer valgstedsindberetninger (nye og rettede).
+
+        Args:
+            indberetninger: Indberetning'er som fra Indberetningslog.hændelser
+
+        Returns:
+            Antal tilføjede rækker
+        """
+        valgsteder, valgsted_index = [], {}
+        partier, parti_index = [], {}
+        tidspunkt, valgsted, version, parti, stemmer = [], [], [], [], []
+
+        for indberetning in indberetninger:
+            v = valgsted_index.setdefault(indberetning.valgsted, len(valgsteder))
+            if v == len(valgsteder):
+                valgsteder.append(indberetning.valgsted)
+            for bogstav, antal in indberetning.stemmer.items():
+                p = parti_index.setdefault(bogstav, len(partier))
+                if p == len(partier):
+                    partier.append(bogstav)
+                tidspunkt.append(indberetning.tidspunkt)
+                valgsted.append(v)
+                version.append(indberetning.version)
+                parti.append(p)
+                stemmer.append(antal)
+
+        if not stemmer:
+            return 0
+        self.indberetninger.tilføj({
+            'tidspunkt': np.array(tidspunkt, dtype=np.float64),
+            'valgsted': _kategori([str(v) for v in valgsteder], np.array(valgsted)),
+            'version': np.array(version, dtype=np.uint32),
+            'parti': _kategori([str(p) for p in partier], np.array(parti)),
+            'stemmer': np.array(stemmer, dtype=np.float64).round().astype(np.int64),
+        })
+        return len(stemmer)
+
+    def tilføj_prognose(self, data: dict, version: int, tidspunkt: float) -> None:
+        """
+        Tilføjer en publiceret prognose.
+
+        Args:
+            data: Live-data som fra byg_live_data
+            version: Versionsnummer
+            tidspunkt: Publiceringstidspunkt (time.time())
+        """
+        partier = data['partier']
+        n = len(partier)
+        self.prognoser.tilføj({
+            'tidspunkt': np.full(n, tidspunkt, dtype=np.float64),
+            'version': np.full(n, version, dtype=np.uint32),
+            'procent_optalt': np.full(n, data['metadata']['procent_optalt'], dtype=np.float32),
+            'parti': _kategori([p['bogstav'] for p in partier], np.arange(n)),
+            'procent': np.array([p['procent'] for p in partier], dtype=np.float32),
+            'mandater': np.array([p['mandater'] for p in partier], dtype=np.uint8),
+        })
+
+    def gem(self) -> None:
+        """Skriver alle samlede rækker til disk."""
+        self.indberetninger.gem()
+        self.prognoser.gem()
+
+    def luk(self) -> None:
+        """Skriver de sidste rækker. Eksporten kan fortsat bruges bagefter."""
+        self.gem()
+
+
+def åbn_eksport(mappe: Optional[str]):
+    """
+    Åbner en Kolonneeksport, hvis der er angivet en mappe.
+
+    Uden pyarrow slås eksporten fra med en advarsel - valgnatten skal ikke
+    stoppe af den grund.
+
+    Returns:
+        Kolonneeksporten, eller None
+    """
+    if mappe is None:
+        return None
+    try:
+        return Kolonneeksport(mappe)
+    except ImportError as e:
+        print(f"⚠ Eksport til {mappe} er slået fra: {e}")
+        return None
+
+
+def læs(mappe: str, tabel: str) -> pd.DataFrame:
+    """
+    Indlæser en eksporteret tabel med alle delfiler.
+
+    Args:
+        mappe: Eksportmappen
+        tabel: 'forrige_valg', 'indberetninger' eller 'prognoser'
+
+    Returns:
+        DataFrame med valgsted og parti som kategorier
+    """
+    if pq is None:
+        raise ImportError("Kolonneeksporten kræver pyarrow (pip install pyarrow)")
+    return pq.read_table(os.path.join(mappe, tabel)).to_pandas()
@@ -9,14 +9,21 @@ Dette script viser hvordan du:
 5. Genererer JSON til HTML visning
 """
 
+import pandas as pd
 from valgmodel import Valgmodel
-from generate_live_data import generer_live_data, gem_live_data_json, NYE_PARTIER
+from generate_live_data import byg_live_data, gem_live_data_json, NYE_PARTIER
+from genafspil_valgnat import lav_valgnat
 import time
 
 
-def simuler_valgnat():
+def simuler_valgnat(hastighed: float = 5.0):
     """
     Simulerer en valgnat hvor flere og flere valgsteder optælles.
+
+    Args:
+        hastighed: Valgsteder per sekund som i genafspil (0 = ingen pauser).
+                   Pausen mellem to opdateringer er den tid valgstederne
+                   imellem er om at komme ind
     """
     print("="*70)
     print("LIVE VALGNAT SIMULATION")
@@ -29,8 +36,17 @@ def simuler_valgnat():
         nye_partier=NYE_PARTIER
     )
 
-    # 2. Hent alle valgsteder
-    alle_valgsteder = list(model.forrige_valg_data['Valgsted'].unique())
+    # 2. Simuler en ny valgnat ud fra 2021 (Ø frem, A og C tilbage)
+    #    Valgstederne kommer i realistisk rækkefølge: små valgsteder først
+    valgnat = lav_valgnat(
+        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
+        swing={"Ø": 1.25, "A": 0.85, "C": 0.85},
+        seed=2025
+    )
+    nuværende_data = model._aggreger_data(
+        pd.concat([rækker for _, rækker in valgnat])
+    )
+    alle_valgsteder = [valgsted for valgsted, _ in valgnat]
     total_valgsteder = len(alle_valgsteder)
 
     print(f"Total antal valgsteder: {total_valgsteder}")
@@ -45,10 +61,10 @@ def simuler_valgnat():
         (1.00, "Alle valgsteder optalt")
     ]
 
-    for pct, beskrivelse in milestones:
-        antal = int(total_valgsteder * pct)
-        if antal == 0:
-            antal = 1
+    antal_ved = [max(1, int(total_valgsteder * pct)) for pct, _ in milestones]
+
+    for trin, (pct, beskrivelse) in enumerate(milestones):
+        antal = antal_ved[trin]
 
         optalte = alle_valgsteder[:antal]
 
@@ -57,12 +73,8 @@ def simuler_valgnat():
         print(f"{'='*70}")
 
         # Generer live data
-        data = generer_live_data(
-            model,
-            optalte,
-            "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
-            55
-        )
+        prediкtion = model.prediкer(nuværende_data, optalte)
+        data = byg_live_data(model, prediкtion, len(optalte), 55)
 
         # Gem til JSON (HTML'en læser denne fil)
         gem_live_data_json(data, "live_data.json")
@@ -80,9 +92,10 @@ def simuler_valgnat():
                 print(f"  {forbund['navn']}: {forbund['mandater']} mandater")
 
         # Pause mellem opdateringer (i virkeligheden ville du vente på rigtige data)
-        if pct < 1.0:
-            print("\nVenter 2 sekunder før næste opdatering...")
-            time.sleep(2)
+        if trin + 1 < len(milestones) and hastighed > 0:
+            pause = (antal_ved[trin + 1] - antal) / hastighed
+            print(f"\nVenter {pause:.1f} sekunder før næste opdatering...")
+            time.sleep(pause)
 
     print("\n" + "="*70)
     print("VALGET ER AFSLUTTET!")
@@ -103,16 +116,8 @@ def vis_workflow():
    - Åbn live_mandatfordeling.html i browser
 
 2. PÅ VALGNATTEN (når data kommer ind):
-   # Hent liste over optalte valgsteder
-   optalte_valgsteder = ["1. 1. Østerbro", "2. 1. Nørrebro", ...]
-
-   # Generer live data
-   data = generer_live_data(
-       model,
-       optalte_valgsteder,
-       "live_data.csv",  # Sti til live CSV data
-       55
-   )
+   # live_data.csv indeholder kun de valgsteder der er optalt
+   data = generer_live_data(model, "live_data.csv", 55)
 
    # Gem som JSON
    gem_live_data_json(data, "live_data.json")
@@ -123,6 +128,8 @@ def vis_workflow():
    - Sæt dette script op til at køre automatisk når ny data kommer
    - Eller kør i en loop der checker for nye valgsteder
    - HTML siden vil opdatere automatisk
+   - Test det hele med en genafspillet valgnat:
+     python genafspil_valgnat.py --live-csv live_data.csv --hastighed 5
 
 4. EFTER VALGET:
    - Den endelige mandatfordeling er klar
@@ -131,11 +138,17 @@ def vis_workflow():
 
 
 if __name__ == "__main__":
+    import sys
+
     vis_workflow()
-    print("\n\nVil du køre en simulation? (Dette tager ca. 10 sekunder)")
-    print("Tryk Enter for at fortsætte eller Ctrl+C for at stoppe...")
+    if "--simuler" not in sys.argv:
+        print("\nKør med --simuler for at køre en simulation (ca. 10 sekunder,")
+        print("eller --hastighed N for N valgsteder per sekund, 0 = uden pauser)")
+        sys.exit(0)
+    hastighed = 5.0
+    if "--hastighed" in sys.argv:
+        hastighed = float(sys.argv[sys.argv.index("--hastighed") + 1])
     try:
-        input()
-        simuler_valgnat()
+        simuler_valgnat(hastighed)
     except KeyboardInterrupt:
         print("\n\nSimulation afbrudt.")
@@ -0,0 +1,122 @@
+"""
+Låsefri publicering af live-resultater.
+
+Hver ny version af live-data pakkes i et uforanderligt LiveSnapshot med den
+serialiserede JSON renderet én gang. Publiceringen er en enkelt
+referencetildeling, som er atomisk i Python: læsere henter blot den aktuelle
+reference og ser derfor altid en hel version - aldrig en halvt opdateret.
+Læserne tager ingen låse, og prisen for at publicere afhænger ikke af hvor
+mange læsere der er.
+
+Komprimerede udgaver (gzip, og brotli hvis pakken er installeret) laves også
+én gang per version, så serveren aldrig komprimerer per forespørgsel.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _frys(værdi: Any) -> Any:
+    """Gør dicts og lister (rekursivt) skrivebeskyttede."""
+    if isinstance(værdi, dict):
+        return MappingProxyType({k: _frys(v) for k, v in værdi.items()})
+    if isinstance(værdi, list):
+        return tuple(_frys(v) for v in værdi)
+    return værdi
+
+
+class LiveSnapshot:
+    """
+    Uforanderlig version af live-data med færdigrenderet JSON.
+    """
+
+    __slots__ = ('version', 'tidspunkt', 'data', 'json_bytes', 'etag', 'komprimeret')
+
+    def __init__(self, version: int, data: Optional[dict], json_bytes: bytes = None):
+        """
+        Opretter et snapshot. Data serialiseres og komprimeres her - én gang
+        per version.
+
+        Args:
+            version: Versionsnummer (stigende)
+            data: Live-data som fra byg_live_data (None for tomt snapshot)
+            json_bytes: Allerede serialiseret data (f.eks. fra en resultatbus)
+        """
+        if json_bytes is None:
+            json_bytes = json.dumps(
+                data, ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+
+        komprimeret = {'gzip': gzip.compress(json_bytes, compresslevel=6, mtime=0)}
+        if brotli is not None:
+            komprimeret['br'] = brotli.compress(json_bytes)
+
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'tidspunkt', time.time())
+        object.__setattr__(self, 'data', _frys(data))
+        object.__setattr__(self, 'json_bytes', json_bytes)
+        object.__setattr__(self, 'etag', '"%d-%s"' % (version, hashlib.md5(json_bytes).hexdigest()[:12]))
+        object.__setattr__(self, 'komprimeret', MappingProxyType(komprimeret))
+
+    @classmethod
+    def fra_json(cls, version: int, json_bytes: Optional[bytes]) -> "LiveSnapshot":
+        """Genskaber et snapshot fra dets serialiserede JSON (None = tomt)."""
+        if not json_bytes:
+            return cls(version, None)
+        return cls(version, json.loads(json_bytes), bytes(json_bytes))
+
+    def __setattr__(self, navn, værdi):
+        raise AttributeError("LiveSnapshot kan ikke ændres")
+
+    def __delattr__(self, navn):
+        raise AttributeError("LiveSnapshot kan ikke ændres")
+
+
+class Snapshotpublicering:
+    """
+    Holder det seneste LiveSnapshot. Læsere bruger `seneste` uden låse.
+    """
+
+    def __init__(self):
+        self._seneste = LiveSnapshot(0, None)
+        # Kun opdateringerne serialiseres mod hinanden - aldrig læserne
+        self._skrivelås = threading.Lock()
+
+    @property
+    def seneste(self) -> LiveSnapshot:
+        """Det seneste publicerede snapshot."""
+        return self._seneste
+
+    def publicer(self, data: dict, version: int = None) -> LiveSnapshot:
+        """
+        Publicerer en ny version.
+
+        Snapshottet bygges (og serialiseres) færdigt inden det bliver synligt,
+        hvorefter det udskiftes med én referencetildeling.
+
+        Args:
+            data: Live-data som fra byg_live_data
+            version: Versionsnummer (standard: seneste + 1). Bruges når
+                     nummereringen skal fortsætte efter en genstart
+
+        Returns:
+            Det publicerede snapshot
+        """
+        with self._skrivelås:
+            if version is None:
+                version = self._seneste.version + 1
+            elif version <= self._seneste.version:
+                raise ValueError(f"Version {version} er ikke nyere end {self._seneste.version}")
+            snapshot = LiveSnapshot(version, data)
+            self._seneste = snapshot
+        return snapshot
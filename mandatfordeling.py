@@ -13,6 +13,10 @@ Med valgforbund:
 from typing import Dict, List, Tuple
 from collections import defaultdict
 
+import numpy as np
+
+from resultatvektor import Partiindeks, Resultatvektor
+
 
 class Mandatfordeling:
     """
@@ -35,6 +39,9 @@ class Mandatfordeling:
             for parti in partier:
                 self.parti_til_forbund[parti] = forbund_navn
 
+        # Kompileret fordeling for seneste partiindeks
+        self._kompileret = None
+
     def dhondt(
         self,
         stemmer: Dict[str, int],
@@ -86,8 +93,12 @@ class Mandatfordeling:
         2. Fordel mandater mellem forbund (D'Hondt)
         3. Fordel mandater internt i hvert forbund (D'Hondt)
 
+        Er stemmerne en Resultatvektor, fordeles direkte på arrays med en
+        kompileret fordeling, og mandaterne returneres som Resultatvektorer
+        over partiindekset og forbundene.
+
         Args:
-            stemmer: Dictionary med partibogstav -> antal stemmer
+            stemmer: Dictionary (eller Resultatvektor) med partibogstav -> antal stemmer
             total_mandater: Total antal mandater at fordele
 
         Returns:
@@ -95,6 +106,14 @@ class Mandatfordeling:
             - Dictionary med partibogstav -> antal mandater
             - Dictionary med forbundsnavn -> antal mandater
         """
+        if isinstance(stemmer, Resultatvektor):
+            kompileret = self._kompileret
+            if kompileret is None or kompileret.indeks != stemmer.indeks:
+                kompileret = self._kompileret = self.kompiler(stemmer.indeks.navne)
+            parti_mandater, forbund_mandater = kompileret.fordel(stemmer.værdier, total_mandater)
+            return (Resultatvektor(stemmer.indeks, parti_mandater),
+                    Resultatvektor(kompileret.forbund_indeks, forbund_mandater))
+
         # 1. Summer stemmer per forbund
         forbund_stemmer = defaultdict(int)
         for parti, antal in stemmer.items():
@@ -141,6 +160,18 @@ class Mandatfordeling:
 
         return parti_mandater, dict(forbund_mandater)
 
+    def kompiler(self, partier: List[str]) -> "KompileretMandatfordeling":
+        """
+        Kompilerer fordelingen til et fast partiindeks.
+
+        Args:
+            partier: Partiindekset som stemmevektorerne er alignet med
+
+        Returns:
+            KompileretMandatfordeling der fordeler direkte på arrays
+        """
+        return KompileretMandatfordeling(self.valgforbund, partier)
+
     def print_resultat(
         self,
         stemmer: Dict[str, int],
@@ -217,6 +248,78 @@ class Mandatfordeling:
                 print(f"  {parti}: {mandater} mandater ({pct:.2f}% af stemmerne)")
 
 
+def dhondt_array(stemmer: np.ndarray, antal_mandater: int) -> np.ndarray:
+    """
+    D'Hondt på en stemmevektor i ét skridt.
+
+    Alle kvotienter stemmer / 1..antal_mandater beregnes på én gang, og de
+    antal_mandater største vinder. Ved lige kvotienter vinder partiet med
+    lavest indeks - samme regel som Mandatfordeling.dhondt.
+
+    Args:
+        stemmer: Stemmer per parti
+        antal_mandater: Antal mandater at fordele
+
+    Returns:
+        Mandater per parti
+    """
+    mandater = np.zeros(len(stemmer), dtype=np.int64)
+    if antal_mandater == 0 or not (stemmer > 0).any():
+        return mandater
+
+    kvotienter = stemmer[:, None] / np.arange(1, antal_mandater + 1)
+    vindere = np.argsort(-kvotienter.ravel(), kind='stable')[:antal_mandater] // antal_mandater
+    return np.bincount(vindere, minlength=len(stemmer))
+
+
+class KompileretMandatfordeling:
+    """
+    Mandatfordeling med valgforbund over et fast partiindeks.
+
+    Forbundsmedlemskab er slået op én gang, så en fordeling kun består af
+    få array-operationer - uden dicts per kald.
+    """
+
+    def __init__(self, valgforbund: Dict[str, List[str]], partier: List[str]):
+        """
+        Args:
+            valgforbund: Dictionary med forbundsnavn -> partibogstaver
+            partier: Partiindekset som stemmevektorerne er alignet med
+        """
+        self.forbund = list(valgforbund.keys())
+        self.partier = list(partier)
+        self.indeks = Partiindeks(self.partier)
+        self.forbund_indeks = Partiindeks(self.forbund)
+        parti_index = self.indeks.index
+
+        # Indeks (i partiindekset) for hvert forbunds partier
+        self.forbund_partier = [
+            np.array([parti_index[p] for p in valgforbund[navn] if p in parti_index], dtype=np.int64)
+            for navn in self.forbund
+        ]
+
+    def fordel(self, stemmer: np.ndarray, total_mandater: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fordeler mandater med valgforbund.
+
+        Args:
+            stemmer: Stemmer alignet med partiindekset
+            total_mandater: Total antal mandater at fordele
+
+        Returns:
+            Tuple med mandater per parti og mandater per forbund
+        """
+        forbund_stemmer = np.array([stemmer[index].sum() for index in self.forbund_partier])
+        forbund_mandater = dhondt_array(forbund_stemmer, total_mandater)
+
+        parti_mandater = np.zeros(len(self.partier), dtype=np.int64)
+        for index, antal in zip(self.forbund_partier, forbund_mandater):
+            if antal > 0:
+                parti_mandater[index] = dhondt_array(stemmer[index], int(antal))
+
+        return parti_mandater, forbund_mandater
+
+
 # Standard valgforbund for København
 KØBENHAVN_VALGFORBUND = {
     "Centrum-Venstre (A, B, M)": ["A", "B", "M"],
@@ -226,6 +329,19 @@ KØBENHAVN_VALGFORBUND = {
 }
 
 
+def uden_valgforbund(partier: List[str]) -> Dict[str, List[str]]:
+    """
+    Valgforbund hvor hvert parti står alene (til valg uden forbund).
+
+    Args:
+        partier: Partibogstaver
+
+    Returns:
+        Dictionary med partibogstav -> [partibogstav]
+    """
+    return {parti: [parti] for parti in partier}
+
+
 def test_mandatfordeling():
     """Test mandatfordeling med eksempeldata."""
     print("="*70)
@@ -0,0 +1,234 @@
+"""
+Indlæsning af valgresultater leveret som én fil per valgsted.
+
+Valgdata leveres på valgnatten som mange små filer - én per valgsted. En
+Mappeindlæser holder styr på hvilke filer der allerede er læst, parser nye
+(og ændrede) filer parallelt i en pulje af arbejdsprocesser og lægger deres
+partisummer ind i indberetningsloggen i ét samlet skridt per gennemløb. Når
+mange valgsteder lander på én gang, optages de derfor i én hurtig opdatering.
+
+En fil regnes først for læst når den er parset og registreret. En fil der
+ikke kan parses (f.eks. halvt skrevet), meldes og springes over uden at
+resten af gennemløbet går tabt, og den prøves igen i næste gennemløb.
+"""
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from indberetningslog import Indberetningslog
+
+
+def _summer_rækker(linjer: Iterable[str]) -> List[Tuple[str, Dict[str, int]]]:
+    """Summerer CSV-linjer (med overskrift) per valgsted og parti."""
+    valgsteder: Dict[str, Dict[str, int]] = {}
+
+    for række in csv.DictReader(linjer, delimiter=';'):
+        parti = række['Bogstavbetegnelse']
+        # Lister uden partibogstav springes over som i Valgmodel._load_data
+        if not parti:
+            continue
+        stemmer = valgsteder.setdefault(række['Afstemningsområde'], {})
+        stemmer[parti] = stemmer.get(parti, 0) + int(række['Stemmetal'])
+
+    return list(valgsteder.items())
+
+
+def parse_valgstedsfil(sti: str) -> List[Tuple[str, Dict[str, int]]]:
+    """
+    Parser én resultatfil og summerer stemmerne per valgsted og parti.
+
+    Filen har samme format som den samlede CSV (semikolon-separeret med
+    kolonnerne Afstemningsområde, Bogstavbetegnelse, Listenavn, Navn og
+    Stemmetal). Funktionen ligger på modulniveau så den kan sendes til en
+    arbejdsproces.
+
+    Args:
+        sti: Sti til filen
+
+    Returns:
+        Liste af (valgsted, stemmer) hvor stemmer er partibogstav -> antal
+    """
+    with open(sti, encoding='utf-8-sig', newline='') as f:
+        return _summer_rækker(f)
+
+
+def parse_valgstedstekst(tekst: str) -> List[Tuple[str, Dict[str, int]]]:
+    """
+    Som parse_valgstedsfil, men for CSV der allerede er i hukommelsen (f.eks. et HTTP-svar).
+
+    Args:
+        tekst: CSV-indhold
+
+    Returns:
+        Liste af (valgsted, stemmer) hvor stemmer er partibogstav -> antal
+    """
+    return _summer_rækker(io.StringIO(tekst.lstrip('\ufeff'), newline=''))
+
+
+def parse_valgstedsfil_per_valg(sti: str, standard_valg: str) -> Dict[str, List[Tuple[str, Dict[str, int]]]]:
+    """
+    Parser én resultatfil med flere valg (f.eks. kommunal- og regionsrådsvalg).
+
+    Filen har samme format som i parse_valgstedsfil plus en kolonne Valg med
+    valgets navn. Rækker uden Valg (eller filer helt uden kolonnen) hører til
+    standard_valg.
+
+    Args:
+        sti: Sti til filen
+        standard_valg: Valg for rækker uden Valg
+
+    Returns:
+        Dictionary med valg -> liste af (valgsted, stemmer)
+    """
+    valg: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    with open(sti, encoding='utf-8-sig', newline='') as f:
+        for række in csv.DictReader(f, delimiter=';'):
+            parti = række['Bogstavbetegnelse']
+            if not parti:
+                continue
+            valgsteder = valg.setdefault(række.get('Valg') or standard_valg, {})
+            stemmer = valgsteder.setdefault(række['Afstemningsområde'], {})
+            stemmer[parti] = stemmer.get(parti, 0) + int(række['Stemmetal'])
+
+    return {navn: list(valgsteder.items()) for navn, valgsteder in valg.items()}
+
+
+def _parse_sikkert(parser: Callable, sti: str) -> Tuple[Any, Optional[str]]:
+    """Kører parseren og returnerer (resultat, None) eller (None, fejlbesked)."""
+    try:
+        return parser(sti), None
+    except Exception as e:
+        # Beskeden (ikke undtagelsen) sendes tilbage, da ikke alle undtagelser kan pickles
+        return None, f"{type(e).__name__}: {e}"
+
+
+class Mappeindlæser:
+    """
+    Overvåger en mappe med valgstedsfiler og indlæser nye filer parallelt.
+    """
+
+    def __init__(
+        self,
+        mappe: str,
+        log: Indberetningslog,
+        antal_arbejdere: int = None,
+        endelse: str = '.csv'
+    ):
+        """
+        Initialiserer indlæseren.
+
+        Args:
+            mappe: Mappe hvor valgstedsfilerne lander
+            log: Indberetningslog som valgstederne registreres i
+            antal_arbejdere: Antal arbejdsprocesser (standard: antal CPU'er).
+                             1 parser i samme proces
+            endelse: Kun filer med denne endelse indlæses
+        """
+        self.mappe = mappe
+        self.log = log
+        self.endelse = endelse
+        self.antal_arbejdere = antal_arbejdere or os.cpu_count() or 1
+
+        # Sti -> (mtime, størrelse) for filer der allerede er indlæst
+        self.sete_filer: Dict[str, Tuple[float, int]] = {}
+        # Stempler for filer der er fundet, men endnu ikke indlæst
+        self._ventende: Dict[str, Tuple[float, int]] = {}
+        # Stempler for filer der ikke kunne parses (meldes én gang per version)
+        self._fejlede: Dict[str, Tuple[float, int]] = {}
+
+        self._pulje = None
+        if self.antal_arbejdere > 1:
+            self._pulje = ProcessPoolExecutor(max_workers=self.antal_arbejdere)
+
+    def nye_filer(self) -> List[str]:
+        """
+        Finder filer der er kommet til eller ændret siden sidste gennemløb.
+
+        Filerne regnes først for sete når de er markeret med _marker_læst
+        (efter parsing og registrering).
+
+        Returns:
+            Liste af stier sorteret efter navn
+        """
+        if not os.path.isdir(self.mappe):
+            return []
+
+        nye = []
+        with os.scandir(self.mappe) as indhold:
+            for fil in indhold:
+                if not fil.is_file() or not fil.name.endswith(self.endelse):
+                    continue
+                stat = fil.stat()
+                if self.sete_filer.get(fil.path) != (stat.st_mtime, stat.st_size):
+                    nye.append((fil.path, (stat.st_mtime, stat.st_size)))
+
+        nye.sort()
+        self._ventende = dict(nye)
+
+        return [sti for sti, _ in nye]
+
+    def _parse(self, filer: List[str], parser: Callable = parse_valgstedsfil) -> List[Tuple[str, Any]]:
+        """
+        Parser filerne i puljen (eller i samme proces), i filernes rækkefølge.
+
+        Returns:
+            Liste af (sti, resultat) for filerne der kunne parses. De øvrige
+            meldes og springes over
+        """
+        sikker = partial(_parse_sikkert, parser)
+        if self._pulje is not None and len(filer) > 1:
+            chunksize = max(1, len(filer) // (4 * self.antal_arbejdere))
+            resultater = self._pulje.map(sikker, filer, chunksize=chunksize)
+        else:
+            resultater = map(sikker, filer)
+
+        parsede = []
+        for sti, (resultat, fejl) in zip(filer, resultater):
+            if fejl is None:
+                parsede.append((sti, resultat))
+            elif self._fejlede.get(sti) != self._ventende.get(sti):
+                self._fejlede[sti] = self._ventende.get(sti)
+                print(f"  ✗ Kunne ikke læse {sti} (prøves igen): {fejl}")
+        return parsede
+
+    def _marker_læst(self, filer: Iterable[str]) -> None:
+        """Gemmer stemplerne for filer der er parset og registreret."""
+        for sti in filer:
+            self.sete_filer[sti] = self._ventende.pop(sti)
+            self._fejlede.pop(sti, None)
+
+    def indlæs(self, tidspunkt: float = None) -> int:
+        """
+        Ét gennemløb: parser nye filer parallelt og registrerer dem samlet.
+
+        Args:
+            tidspunkt: Ankomsttidspunkt i loggen (standard: nu)
+
+        Returns:
+            Antal nye eller rettede valgsteder
+        """
+        filer = self.nye_filer()
+        if not filer:
+            return 0
+
+        parsede = self._parse(filer)
+
+        # Samme valgsted i flere filer: den seneste fil (efter navn) vinder
+        valgsteder: Dict[str, Dict[str, int]] = {}
+        for _, resultat in parsede:
+            valgsteder.update(resultat)
+
+        antal = self.log.registrer_batch(list(valgsteder.items()), tidspunkt)
+        self._marker_læst(sti for sti, _ in parsede)
+        return antal
+
+    def luk(self):
+        """Lukker arbejdsprocesserne."""
+        if self._pulje is not None:
+            self._pulje.shutdown()
+            self._pulje = None
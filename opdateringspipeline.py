@@ -0,0 +1,449 @@
+"""
+Trinopdelt opdateringspipeline til valgnatten.
+
+Opdateringen er delt i tre trin der kører i hver sin tråd:
+
+1. Indlæsning: læser nye data (live CSV, mappe med valgstedsfiler eller
+   HTTP-feeds) ind i indberetningsloggen og afleverer et øjebliksbillede af summerne
+2. Beregning: prediкtion, mandatfordeling og opbygning af output
+3. Publicering: et uforanderligt LiveSnapshot (JSON renderet én gang) udskiftes
+   atomisk, og de samme bytes skrives atomisk til JSON-filen og eventuelt
+   til en resultatbus i delt hukommelse for andre processer. Prognosen
+   tilføjes eventuelt til prognosehistorikken og en søjleeksport
+
+Med et kontrolpunkt gemmes hele den levende tilstand (valgstedernes seneste
+stemmer, sete filer, live CSV'ens stempel og seneste publicerede version)
+med jævne mellemrum - atomisk via en midlertidig fil der omdøbes. En
+genstartet pipeline genoptager fra kontrolpunktet, publicerer straks den
+seneste version igen og indlæser kun data der er kommet til siden.
+
+Med et anomalitjek scores hver indlæst batch før den når summerne, og
+valgsteder i karantæne meldes i konsollen (og gemmes i kontrolpunktet).
+
+Mellem trinene ligger en postkasse med plads til ét element. Lægges et nyt
+element i en fuld postkasse, erstatter det det gamle - kun den nyeste version
+betyder noget. Et langsomt trin blokerer derfor aldrig indlæsningen, og det
+publicerede resultat afspejler altid de nyeste data med begrænset forsinkelse.
+"""
+
+import io
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from valgmodel import Valgmodel
+from generate_live_data import byg_live_data, gem_atomisk
+from anomali import Anomalitjek
+from indberetningslog import Anomali, Indberetningslog
+from resultatvektor import Resultatvektor
+from mappeindlaesning import Mappeindlæser
+from feedindlaesning import Feedindlæser, er_feed
+from livesnapshot import Snapshotpublicering
+from mandatfordeling import Mandatfordeling
+from resultatbus import Resultatbus
+from prognosehistorik import Prognosehistorik
+
+if TYPE_CHECKING:
+    from kolonneeksport import Kolonneeksport
+
+
+class Version(NamedTuple):
+    """Ét element i pipelinen."""
+    nummer: int
+    # Tidspunkt (time.perf_counter) hvor data blev indlæst
+    modtaget: float
+    indhold: Any
+
+
+class Senestepost:
+    """
+    Postkasse med plads til ét element, hvor et nyt element erstatter et
+    element der endnu ikke er hentet.
+    """
+
+    def __init__(self):
+        self._betingelse = threading.Condition()
+        self._element: Optional[Version] = None
+        self._lukket = False
+        self.antal_sammenlagt = 0
+
+    def læg(self, element: Version) -> None:
+        """Lægger et element i postkassen uden nogensinde at blokere."""
+        with self._betingelse:
+            if self._element is not None:
+                self.antal_sammenlagt += 1
+            self._element = element
+            self._betingelse.notify()
+
+    def hent(self, timeout: float = None) -> Optional[Version]:
+        """
+        Henter det nyeste element og venter hvis postkassen er tom.
+
+        Returns:
+            Elementet, eller None ved timeout eller når postkassen er lukket
+        """
+        with self._betingelse:
+            if self._element is None and not self._lukket:
+                self._betingelse.wait(timeout)
+            element, self._element = self._element, None
+            return element
+
+    def luk(self) -> None:
+        """Lukker postkassen og vækker ventende trin."""
+        with self._betingelse:
+            self._lukket = True
+            self._betingelse.notify_all()
+
+
+class Opdateringspipeline:
+    """
+    Indlæsning → beregning → publicering med sammenlægning af versioner.
+    """
+
+    def __init__(
+        self,
+        model: Valgmodel,
+        live_sti: Union[str, List[str], None],
+        output_json: Optional[str] = "live_data.json",
+        total_mandater: int = 55,
+        mandatfordeling: Mandatfordeling = None,
+        interval: float = 1.0,
+        antal_arbejdere: int = None,
+        ved_publicering: Callable[[dict, Version, float], None] = None,
+        publicering: Snapshotpublicering = None,
+        resultatbus: Resultatbus = None,
+        prognosehistorik: Prognosehistorik = None,
+        kolonneeksport: "Kolonneeksport" = None,
+        bootstrap: int = 0,
+        anomalitjek: Anomalitjek = None,
+        kontrolpunkt: str = None,
+        kontrolpunkt_interval: float = 5.0
+    ):
+        """
+        Initialiserer pipelinen.
+
+        Args:
+            model: Valgmodel instans
+            live_sti: Sti til live CSV eller mappe med én fil per valgsted,
+                      eller URL (eller liste af URL'er) til HTTP-feeds
+                      (None = loggen fyldes udefra, se modtag())
+            output_json: Output JSON fil som HTML'en læser (None = ingen fil)
+            total_mandater: Antal mandater at fordele
+            mandatfordeling: Valgforbund at fordele med (standard: Københavns)
+            interval: Sekunder mellem hver indlæsning
+            antal_arbejdere: Antal processer der parser valgstedsfiler (kun mappe)
+            ved_publicering: Kaldes med (data, version, forsinkelse i sekunder)
+                             hver gang en version er skrevet
+            publicering: Snapshotpublicering som læsere i samme proces (f.eks.
+                         serveren) henter det seneste snapshot fra
+            resultatbus: Resultatbus som andre processer læser den seneste
+                         version fra
+            prognosehistorik: Prognosehistorik som hver publiceret version
+                              tilføjes til
+            kolonneeksport: Kolonneeksport som valgstederne og hver
+                            publiceret version eksporteres til
+            bootstrap: Antal bootstrap-gentagelser for konfidensintervaller
+                       i metadata (0 = ingen intervaller)
+            anomalitjek: Anomalitjek der scorer de indlæste valgsteder og
+                         holder afvigere tilbage (None = intet tjek)
+            kontrolpunkt: Fil med kontrolpunkt. Findes den, genoptages der
+                          derfra
+            kontrolpunkt_interval: Mindste antal sekunder mellem kontrolpunkter
+        """
+        self.model = model
+        self.live_sti = live_sti
+        self.output_json = output_json
+        self.total_mandater = total_mandater
+        self.mandatfordeling = mandatfordeling
+        self.interval = interval
+        self.ved_publicering = ved_publicering
+        self.publicering = publicering or Snapshotpublicering()
+        self.resultatbus = resultatbus
+        self.prognosehistorik = prognosehistorik
+        self.kolonneeksport = kolonneeksport
+        self.bootstrap = bootstrap
+
+        self.log = Indberetningslog(model, anomalitjek=anomalitjek)
+        self._meldte_anomalier = 0
+        self._eksporterede_hændelser = 0
+        if kolonneeksport is not None:
+            kolonneeksport.skriv_forrige_valg(model._beregn_valgsted_matrix(model.forrige_valg_data))
+        self.indlæser = None
+        if er_feed(live_sti):
+            self.indlæser = Feedindlæser(live_sti, self.log)
+        elif live_sti is not None and os.path.isdir(live_sti):
+            self.indlæser = Mappeindlæser(live_sti, self.log, antal_arbejdere)
+        self._sidste_stempel = None
+
+        self.til_beregning = Senestepost()
+        self.til_publicering = Senestepost()
+
+        self.version = 0
+        self.publiceret_version = 0
+        self._seneste_data = None
+        self._stop = threading.Event()
+        self._tråde = []
+        # Tråden der indlæser i kør(), mens den kører
+        self._indlæsningstråd = None
+
+        if kontrolpunkt is not None and live_sti is None:
+            raise ValueError("Et kontrolpunkt kræver at pipelinen selv indlæser (live_sti)")
+        self.kontrolpunkt = kontrolpunkt
+        self.kontrolpunkt_interval = kontrolpunkt_interval
+        self._sidste_kontrolpunkt = time.perf_counter()
+        self._kontrolpunkt_version = 0
+        if kontrolpunkt is not None and os.path.exists(kontrolpunkt):
+            self.gendan_kontrolpunkt()
+
+    def indlæs(self) -> bool:
+        """
+        Ét indlæsningsgennemløb. Nye data sendes videre til beregning.
+
+        Returns:
+            True hvis der kom en ny version
+        """
+        modtaget = time.perf_counter()
+
+        if self.indlæser is not None:
+            antal = self.indlæser.indlæs()
+        elif self.live_sti is None:
+            return False
+        else:
+            if not os.path.exists(self.live_sti):
+                return False
+            stat = os.stat(self.live_sti)
+            stempel = (stat.st_mtime_ns, stat.st_size)
+            if stempel == self._sidste_stempel:
+                return False
+            self._sidste_stempel = stempel
+            antal = self.log.registrer_dataframe(self.model._load_data(self.live_sti))
+
+        self.meld_anomalier()
+        if antal == 0:
+            return False
+
+        self.modtag(modtaget)
+        return True
+
+    def meld_anomalier(self) -> None:
+        """Skriver valgsteder som anomalitjekket har markeret siden sidst."""
+        for anomali in self.log.anomalier[self._meldte_anomalier:]:
+            handling = "i karantæne" if anomali.valgsted in self.log.karantæne else "markeret"
+            print(f"  ⚠ {anomali.valgsted} {handling}: afvigelse på {anomali.score:.1f} ({anomali.grund})")
+        self._meldte_anomalier = len(self.log.anomalier)
+
+    def modtag(self, modtaget: float) -> None:
+        """
+        Sender loggens aktuelle tilstand videre til beregning som en ny version.
+
+        Kaldes af indlæs(), eller udefra når nye valgsteder er registreret
+        direkte i self.log (f.eks. af en fælles indlæsning for flere valg).
+
+        Args:
+            modtaget: Tidspunkt (time.perf_counter) hvor data blev indlæst
+        """
+        if self.kolonneeksport is not None:
+            self.kolonneeksport.tilføj_indberetninger(self.log.hændelser[self._eksporterede_hændelser:])
+            self._eksporterede_hændelser = len(self.log.hændelser)
+
+        self.version += 1
+        self._send_til_beregning(modtaget)
+
+    def _send_til_beregning(self, modtaget: float) -> None:
+        """Sender et øjebliksbillede af summerne, så beregningen ikke deler tilstand med loggen."""
+        self.til_beregning.læg(Version(self.version, modtaget, (
+            self.log.indeks,
+            self.log.nuværende_sum.copy(),
+            self.log.forrige_sum.copy(),
+            self.log.antal_optalte,
+            self.log.valgstedsmatricer() if self.bootstrap > 0 else None
+        )))
+
+    @property
+    def _kilde(self):
+        """Kilden som den gemmes i kontrolpunktet (absolut sti eller URL'er)."""
+        if er_feed(self.live_sti):
+            return self.live_sti if isinstance(self.live_sti, str) else list(self.live_sti)
+        return os.path.abspath(self.live_sti)
+
+    def gem_kontrolpunkt(self) -> None:
+        """
+        Gemmer den levende tilstand atomisk i kontrolpunktsfilen.
+
+        Kaldes fra indlæsningstråden, som er den eneste der ændrer loggen.
+        """
+        valgsteder, versioner, stemmer = self.log.valgstedstilstand()
+        snapshot = self.publicering.seneste
+        meta = {
+            "live_sti": self._kilde,
+            "version": self.version,
+            "sidste_stempel": self._sidste_stempel,
+            "sete_filer": self.indlæser.sete_filer if isinstance(self.indlæser, Mappeindlæser) else {},
+            "publiceret_version": snapshot.version,
+            "karantæne": [anomali._asdict() for anomali in self.log.karantæne.values()],
+            "data": json.loads(snapshot.json_bytes),
+        }
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+            partier=np.array(self.log.partier),
+            valgsteder=np.array(valgsteder, dtype=str),
+            versioner=versioner,
+            stemmer=stemmer
+        )
+        gem_atomisk(buffer.getvalue(), self.kontrolpunkt)
+        self._sidste_kontrolpunkt = time.perf_counter()
+        self._kontrolpunkt_version = self.version
+
+    def gendan_kontrolpunkt(self) -> None:
+        """
+        Genoptager fra kontrolpunktet: gendanner loggen og de sete filer,
+        publicerer den seneste version igen og sender summerne til beregning.
+        """
+        with np.load(self.kontrolpunkt, allow_pickle=False) as indhold:
+            meta = json.loads(str(indhold['meta']))
+            if meta["live_sti"] != self._kilde:
+                raise ValueError(
+                    f"Kontrolpunktet {self.kontrolpunkt} hører til {meta['live_sti']}, ikke {self.live_sti}"
+                )
+            self.log.gendan(
+                list(indhold['partier']), list(indhold['valgsteder']),
+                indhold['versioner'], indhold['stemmer']
+            )
+
+        self.log.karantæne = {a["valgsted"]: Anomali(**a) for a in meta.get("karantæne", [])}
+        self.version = meta["version"]
+        self._kontrolpunkt_version = self.version
+        if meta["sidste_stempel"] is not None:
+            self._sidste_stempel = tuple(meta["sidste_stempel"])
+        if isinstance(self.indlæser, Mappeindlæser):
+            self.indlæser.sete_filer = {sti: tuple(stempel) for sti, stempel in meta["sete_filer"].items()}
+
+        if meta["publiceret_version"] > 0:
+            snapshot = self.publicering.publicer(meta["data"], version=meta["publiceret_version"])
+            self._udgiv(snapshot)
+        if self.log.antal_optalte > 0:
+            self._send_til_beregning(time.perf_counter())
+
+    def _beregn(self, version: Version) -> Version:
+        """Prediкtion og mandatfordeling for én version."""
+        indeks, nuværende_sum, forrige_sum, antal_optalte, matricer = version.indhold
+        prediкtion = self.model.prediкer_fra_stemmer(
+            Resultatvektor(indeks, nuværende_sum),
+            Resultatvektor(indeks, forrige_sum)
+        )
+        konfidensinterval = None
+        if matricer is not None:
+            # Fast seed, så intervallerne kun flytter sig når data gør
+            konfidensinterval = self.model.bootstrap_interval(*matricer, indeks, self.bootstrap, seed=0)
+        data = byg_live_data(self.model, prediкtion, antal_optalte, self.total_mandater,
+                             konfidensinterval, self.mandatfordeling, Resultatvektor(indeks, nuværende_sum))
+        return version._replace(indhold=data)
+
+    def _publicer(self, version: Version) -> None:
+        """Publicerer én version som snapshot og skriver den atomisk til fil."""
+        # Ældre versioner må aldrig overskrive nyere
+        if version.nummer <= self.publiceret_version:
+            return
+
+        snapshot = self.publicering.publicer(version.indhold)
+        self._udgiv(snapshot)
+        if self.prognosehistorik is not None:
+            self.prognosehistorik.tilføj(version.indhold, snapshot.version, snapshot.tidspunkt)
+        if self.kolonneeksport is not None:
+            self.kolonneeksport.tilføj_prognose(version.indhold, snapshot.version, snapshot.tidspunkt)
+
+        self.publiceret_version = version.nummer
+        if self.ved_publicering is not None:
+            self.ved_publicering(version.indhold, version, time.perf_counter() - version.modtaget)
+
+    def _udgiv(self, snapshot) -> None:
+        """Skriver et publiceret snapshot til JSON-filen og resultatbussen."""
+        if self.output_json is not None:
+            gem_atomisk(snapshot.json_bytes, self.output_json)
+        if self.resultatbus is not None:
+            self.resultatbus.skriv(snapshot.json_bytes, snapshot.version)
+
+    def _kør_trin(self, indgang: Senestepost, behandl: Callable, udgang: Senestepost = None):
+        """Løkke for ét trin: hent nyeste version, behandl, send videre."""
+        while not self._stop.is_set():
+            version = indgang.hent(timeout=0.5)
+            if version is None:
+                continue
+            try:
+                resultat = behandl(version)
+                if udgang is not None:
+                    udgang.læg(resultat)
+            except Exception as e:
+                print(f"  ✗ Fejl i version {version.nummer}: {e}")
+
+    def start(self) -> None:
+        """Starter beregnings- og publiceringstrådene."""
+        self._tråde = [
+            threading.Thread(
+                target=self._kør_trin,
+                args=(self.til_beregning, self._beregn, self.til_publicering),
+                name="beregning", daemon=True
+            ),
+            threading.Thread(
+                target=self._kør_trin,
+                args=(self.til_publicering, self._publicer),
+                name="publicering", daemon=True
+            ),
+        ]
+        for tråd in self._tråde:
+            tråd.start()
+
+    def kør(self) -> None:
+        """Starter pipelinen og indlæser i den kaldende tråd indtil stop()."""
+        self._indlæsningstråd = threading.current_thread()
+        self.start()
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    self.indlæs()
+                    if (self.kontrolpunkt is not None
+                            and self.version != self._kontrolpunkt_version
+                            and time.perf_counter() - self._sidste_kontrolpunkt >= self.kontrolpunkt_interval):
+                        self.gem_kontrolpunkt()
+                except Exception as e:
+                    print(f"  ✗ Fejl ved indlæsning: {e}")
+                self._stop.wait(max(0.0, self.interval - (time.perf_counter() - start)))
+        finally:
+            if self.kontrolpunkt is not None and self.version != self._kontrolpunkt_version:
+                self.gem_kontrolpunkt()
+            self._indlæsningstråd = None
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        Stopper pipelinen og lukker arbejdsprocesserne.
+
+        Kører kør() i en anden tråd, ventes der på at den har afsluttet sit
+        gennemløb og gemt sit sidste kontrolpunkt; indlæseren lukkes så af
+        kør() selv fra indlæsningstråden.
+        """
+        self._stop.set()
+        self.til_beregning.luk()
+        self.til_publicering.luk()
+        nuværende = threading.current_thread()
+        for tråd in self._tråde:
+            if tråd is not nuværende:
+                tråd.join()
+
+        indlæsning = self._indlæsningstråd
+        if indlæsning is not None and indlæsning is not nuværende:
+            # Fra beregnings- eller publiceringstråden kan der ikke ventes
+            # (kør() venter selv på dem)
+            if nuværende not in self._tråde:
+                indlæsning.join()
+            return
+        if self.indlæser is not None:
+            self.indlæser.luk()
@@ -0,0 +1,26 @@
+"""
+Partiernes farver i visningen.
+
+Ligger for sig selv, så serveren og delta-protokollen kan bruge dem uden at
+indlæse modellen (og pandas).
+"""
+
+# Parti farver (standard danske partier)
+PARTI_FARVER = {
+    "A": "#E3515D",  # Socialdemokratiet - rød
+    "B": "#EB4295",  # Radikale - magenta
+    "C": "#429969",  # Konservative - grøn
+    "D": "#5BC0EB",  # Nye Borgerlige - lyseblå
+    "F": "#9C1D5A",  # SF - lilla
+    "I": "#3FB2BE",  # Liberal Alliance - cyan
+    "O": "#FFD700",  # Dansk Folkeparti - gul
+    "V": "#254D73",  # Venstre - mørkeblå
+    "Ø": "#E6801A",  # Enhedslisten - orange/rød
+    "Å": "#50A64E",  # Alternativet - grøn
+    "K": "#F4CE50",  # Kristendemokraterne - gul
+    "M": "#8B4789",  # Danmark for Alle - lilla
+    "N": "#DC143C",  # Kommunisterne - rød
+}
+
+# Default farve for andre partier
+DEFAULT_FARVE = "#999999"
@@ -0,0 +1,200 @@
+"""
+Tidsserie over alle publicerede prognoser.
+
+Hver publiceret version tilføjes som én post med fast størrelse til en
+binær logfil: tidspunkt, version, andel optalt og hvert partis procent og
+mandater i partiernes faste rækkefølge. Partiindekset ligger i en .json-fil
+ved siden af (som for Valghistorik). De seneste poster holdes desuden i en
+ringbuffer i hukommelsen, så de typiske forespørgsler (de seneste minutter)
+aldrig rører disken. Ældre intervaller læses memory-mapped fra filen og
+findes med binær søgning på tidspunktet.
+
+En anden proces (f.eks. en serverproces) kan åbne samme fil og hente nye
+poster med opdater().
+"""
+
+import json
+import os
+import threading
+from typing import List
+
+import numpy as np
+
+
+def _post_dtype(antal_partier: int) -> np.dtype:
+    """Posternes faste layout."""
+    return np.dtype([
+        ('tidspunkt', '<f8'),
+        ('version', '<u4'),
+        ('procent_optalt', '<f4'),
+        ('procent', '<f4', (antal_partier,)),
+        ('mandater', 'u1', (antal_partier,)),
+    ])
+
+
+class Prognosehistorik:
+    """
+    Logfil med faste poster plus ringbuffer med de seneste prognoser.
+    """
+
+    def __init__(self, sti: str, partier: List[str] = None, ring_størrelse: int = 1024):
+        """
+        Åbner (eller opretter) historikken.
+
+        Args:
+            sti: Sti til logfilen
+            partier: Partiernes faste rækkefølge (f.eks. partierne i
+                      pipelinens valgforbund). Skal angives når filen
+                      oprettes, og bruges kun da
+            ring_størrelse: Antal seneste poster der holdes i hukommelsen
+        """
+        self.sti = sti
+        index_fil = os.path.splitext(sti)[0] + '.json'
+
+        if os.path.exists(index_fil):
+            with open(index_fil, encoding='utf-8') as f:
+                self.partier = json.load(f)['partier']
+        else:
+            if partier is None:
+                raise ValueError(f"Prognosehistorikken {sti} findes ikke, og der er ikke angivet partier")
+            self.partier = list(partier)
+            with open(index_fil, 'w', encoding='utf-8') as f:
+                json.dump({'partier': self.partier}, f, ensure_ascii=False)
+
+        self.parti_index = {p: i for i, p in enumerate(self.partier)}
+        self.dtype = _post_dtype(len(self.partier))
+
+        # En halvt skrevet post efter et nedbrud skæres væk
+        størrelse = os.path.getsize(sti) if os.path.exists(sti) else 0
+        self.antal = størrelse // self.dtype.itemsize
+        if størrelse % self.dtype.itemsize:
+            with open(sti, 'r+b') as f:
+                f.truncate(self.antal * self.dtype.itemsize)
+
+        self._ring = np.zeros(ring_størrelse, dtype=self.dtype)
+        self._lås = threading.Lock()
+        self._fil = None
+        if self.antal:
+            self._læg_i_ring(self._poster(max(0, self.antal - ring_størrelse), self.antal))
+
+    def _poster(self, start: int, slut: int) -> np.ndarray:
+        """Poster [start, slut) læst memory-mapped fra filen."""
+        if slut <= start:
+            return np.zeros(0, dtype=self.dtype)
+        poster = np.memmap(self.sti, dtype=self.dtype, mode='r', shape=(self.antal,))
+        return np.array(poster[start:slut])
+
+    def _læg_i_ring(self, poster: np.ndarray):
+        """Lægger poster (post nummer antal-len(poster) og frem) i ringen."""
+        n = len(self._ring)
+        for i, post in enumerate(poster[-n:], start=self.antal - len(poster[-n:])):
+            self._ring[i % n] = post
+
+    def _ring_poster(self) -> np.ndarray:
+        """Ringens poster i kronologisk rækkefølge."""
+        n = len(self._ring)
+        if self.antal <= n:
+            return self._ring[:self.antal]
+        start = self.antal % n
+        return np.concatenate((self._ring[start:], self._ring[:start]))
+
+    def tilføj(self, data: dict, version: int, tidspunkt: float) -> None:
+        """
+        Tilføjer en publiceret prognose.
+
+        Args:
+            data: Live-data som fra byg_live_data
+            version: Versionsnummer
+            tidspunkt: Publiceringstidspunkt (time.time())
+        """
+        post = np.zeros(1, dtype=self.dtype)
+        post['tidspunkt'] = tidspunkt
+        post['version'] = version
+        post['procent_optalt'] = data['metadata']['procent_optalt']
+        for parti in data['partier']:
+            i = self.parti_index.get(parti['bogstav'])
+            if i is not None:
+                post['procent'][0, i] = parti['procent']
+                post['mandater'][0, i] = parti['mandater']
+
+        with self._lås:
+            if self._fil is None:
+                self._fil = open(self.sti, 'ab')
+            self._fil.write(post.tobytes())
+            self._fil.flush()
+            self._ring[self.antal % len(self._ring)] = post[0]
+            self.antal += 1
+
+    def opdater(self) -> int:
+        """
+        Henter poster som en anden proces har tilføjet til filen.
+
+        Returns:
+            Antal nye poster
+        """
+        antal = os.path.getsize(self.sti) // self.dtype.itemsize if os.path.exists(self.sti) else 0
+        if antal <= self.antal:
+            return 0
+        with self._lås:
+            start, self.antal = self.antal, antal
+            self._læg_i_ring(self._poster(start, antal))
+        return antal - start
+
+    def hent(self, fra: float = None, til: float = None, maks_punkter: int = None) -> np.ndarray:
+        """
+        Henter prognoserne i et tidsinterval.
+
+        Args:
+            fra: Første tidspunkt (None = fra starten)
+            til: Sidste tidspunkt (None = til nu)
+            maks_punkter: Højst så mange poster (jævnt udtyndet, seneste med)
+
+        Returns:
+            Struktureret array med felterne tidspunkt, version,
+            procent_optalt, procent og mandater
+        """
+        with self._lås:
+            if self.antal == 0:
+                return np.zeros(0, dtype=self.dtype)
+            ring = self._ring_poster()
+            if len(ring) == self.antal or (fra is not None and fra >= ring['tidspunkt'][0]):
+                poster = ring
+            else:
+                poster = np.memmap(self.sti, dtype=self.dtype, mode='r', shape=(self.antal,))
+
+            start = 0 if fra is None else int(np.searchsorted(poster['tidspunkt'], fra, side='left'))
+            slut = len(poster) if til is None else int(np.searchsorted(poster['tidspunkt'], til, side='right'))
+            udsnit = np.array(poster[start:slut])
+
+        if maks_punkter is not None and len(udsnit) > maks_punkter > 0:
+            index = np.unique(np.linspace(0, len(udsnit) - 1, maks_punkter).round().astype(int))
+            udsnit = udsnit[index]
+        return udsnit
+
+    def som_json(self, fra: float = None, til: float = None, maks_punkter: int = None) -> dict:
+        """
+        Et tidsinterval i søjleform til tendenslinjer.
+
+        Returns:
+            Dictionary med tidspunkt, version, procent_optalt og procent og
+            mandater som liste per parti
+        """
+        poster = self.hent(fra, til, maks_punkter)
+        procent = poster['procent'].astype(np.float64).round(2)
+        return {
+            "partier": self.partier,
+            "tidspunkt": poster['tidspunkt'].tolist(),
+            "version": poster['version'].tolist(),
+            "procent_optalt": poster['procent_optalt'].astype(np.float64).round(2).tolist(),
+            "procent": {parti: procent[:, i].tolist() for i, parti in enumerate(self.partier)},
+            "mandater": {
+                parti: poster['mandater'][:, i].tolist() for i, parti in enumerate(self.partier)
+            }
+        }
+
+    def luk(self):
+        """Lukker logfilen."""
+        with self._lås:
+            if self._fil is not None:
+                self._fil.close()
+                self._fil = None
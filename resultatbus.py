@@ -0,0 +1,223 @@
+"""
+Resultatbus i delt hukommelse til flere forbrugerprocesser.
+
+Opdateringen skriver hver version af live-data (den færdigrenderede JSON)
+ind i et multiprocessing.shared_memory segment. Serverprocesser, eksportører
+og overvågning i terminalen kan så læse den seneste version uden disk-I/O.
+
+Segmentets layout:
+
+    0   4s  magic "VLGB"
+    4   I   layoutversion
+    8   Q   sekvensnummer (ulige mens der skrives)
+    16  Q   version (LiveSnapshot-versionen)
+    24  Q   længde af indholdet
+    32  ... indhold
+
+Skrivning og læsning følger seqlock-mønstret: skriveren gør sekvensnummeret
+ulige, skriver indholdet og gør det lige igen. En læser der ser samme lige
+sekvensnummer før og efter læsningen, har læst en hel version. En forbruger
+opdager nye versioner ved kun at læse sekvensnummeret.
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+from livesnapshot import LiveSnapshot
+
+MAGIC = b'VLGB'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<4sIQQQ')
+SEKVENS = struct.Struct('<Q')
+SEKVENS_OFFSET = 8
+
+
+class Resultatbus:
+    """
+    Seneste version af live-data i et delt hukommelsessegment.
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory, ejer: bool):
+        self.segment = segment
+        self.ejer = ejer
+        self.buffer = segment.buf
+        self.kapacitet = len(self.buffer) - HEADER.size
+
+    @classmethod
+    def opret(cls, navn: str = "valgmodel_live", kapacitet: int = 1 << 20) -> "Resultatbus":
+        """
+        Opretter et nyt segment (gøres af den proces der skriver).
+
+        Args:
+            navn: Segmentets navn
+            kapacitet: Største indhold i bytes
+
+        Returns:
+            Resultatbus instans
+        """
+        segment = shared_memory.SharedMemory(name=navn, create=True, size=HEADER.size + kapacitet)
+        HEADER.pack_into(segment.buf, 0, MAGIC, LAYOUT_VERSION, 0, 0, 0)
+        return cls(segment, ejer=True)
+
+    @classmethod
+    def tilslut(cls, navn: str = "valgmodel_live") -> "Resultatbus":
+        """
+        Tilslutter til et eksisterende segment (gøres af forbrugerne).
+
+        Args:
+            navn: Segmentets navn
+
+        Returns:
+            Resultatbus instans
+        """
+        try:
+            segment = shared_memory.SharedMemory(name=navn, track=False)
+        except TypeError:
+            # Før Python 3.13 registreres segmentet altid hos resource_tracker,
+            # som ellers ville fjerne det når forbrugeren afslutter. Vi undgår
+            # registreringen i stedet for at afregistrere bagefter, da en
+            # forket proces deler resource_tracker med ejeren.
+            from multiprocessing import resource_tracker
+            registrer = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                segment = shared_memory.SharedMemory(name=navn)
+            finally:
+                resource_tracker.register = registrer
+
+        magic, layout, _, _, _ = HEADER.unpack_from(segment.buf, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            segment.close()
+            raise ValueError(f"Segmentet {navn} er ikke en resultatbus")
+
+        return cls(segment, ejer=False)
+
+    @property
+    def sekvens(self) -> int:
+        """Aktuelt sekvensnummer. Ændrer sig når der er en ny version."""
+        return SEKVENS.unpack_from(self.buffer, SEKVENS_OFFSET)[0]
+
+    def ny_version(self, sidste_sekvens: int) -> bool:
+        """Om der er publiceret en ny version siden sidste_sekvens."""
+        sekvens = self.sekvens
+        return sekvens != sidste_sekvens and sekvens % 2 == 0
+
+    def skriv(self, indhold: bytes, version: int) -> int:
+        """
+        Skriver en ny version.
+
+        Args:
+            indhold: Indholdet (f.eks. LiveSnapshot.json_bytes)
+            version: Versionsnummer
+
+        Returns:
+            Det nye sekvensnummer
+        """
+        if len(indhold) > self.kapacitet:
+            raise ValueError(
+                f"Indholdet ({len(indhold)} bytes) er større end bussens kapacitet ({self.kapacitet} bytes)"
+            )
+
+        sekvens = self.sekvens
+        SEKVENS.pack_into(self.buffer, SEKVENS_OFFSET, sekvens + 1)
+        self.buffer[HEADER.size:HEADER.size + len(indhold)] = indhold
+        HEADER.pack_into(self.buffer, 0, MAGIC, LAYOUT_VERSION, sekvens + 1, version, len(indhold))
+        SEKVENS.pack_into(self.buffer, SEKVENS_OFFSET, sekvens + 2)
+        return sekvens + 2
+
+    def læs_uden_kopi(self) -> Tuple[int, int, memoryview]:
+        """
+        Giver et view direkte ind i segmentet uden at kopiere indholdet.
+
+        Viewet kan blive overskrevet af næste version. Kald stadig_gyldig()
+        med det returnerede sekvensnummer når viewet er brugt.
+
+        Returns:
+            Tuple med (sekvensnummer, version, view af indholdet)
+        """
+        while True:
+            sekvens = self.sekvens
+            if sekvens % 2 == 0:
+                break
+            time.sleep(0)
+
+        _, _, _, version, længde = HEADER.unpack_from(self.buffer, 0)
+        return sekvens, version, self.buffer[HEADER.size:HEADER.size + længde]
+
+    def stadig_gyldig(self, sekvens: int) -> bool:
+        """Om en læsning startet ved sekvens stadig er en hel version."""
+        return self.sekvens == sekvens
+
+    def læs(self) -> Tuple[int, int, Optional[bytes]]:
+        """
+        Læser den seneste hele version.
+
+        Returns:
+            Tuple med (sekvensnummer, version, indhold). Indhold er None hvis
+            der endnu ikke er publiceret noget
+        """
+        while True:
+            sekvens, version, view = self.læs_uden_kopi()
+            indhold = bytes(view)
+            view.release()
+            if self.stadig_gyldig(sekvens):
+                return sekvens, version, (indhold if sekvens > 0 else None)
+
+    def luk(self):
+        """Lukker forbindelsen til segmentet. Ejeren fjerner også segmentet."""
+        self.buffer.release()
+        self.segment.close()
+        if self.ejer:
+            self.segment.unlink()
+
+
+class Bussnapshots:
+    """
+    Seneste LiveSnapshot læst fra en resultatbus.
+
+    Har samme `seneste` som Snapshotpublicering, så en server i en anden
+    proces kan bruge bussen som kilde. Et nyt snapshot (med komprimering)
+    bygges kun når sekvensnummeret har ændret sig.
+    """
+
+    def __init__(self, bus: Resultatbus):
+        self.bus = bus
+        self._sekvens = -1
+        self._seneste = LiveSnapshot(0, None)
+
+    @property
+    def seneste(self) -> LiveSnapshot:
+        """Det seneste snapshot på bussen."""
+        if self.bus.ny_version(self._sekvens):
+            sekvens, version, indhold = self.bus.læs()
+            # Samtidige forespørgsler kan bygge samme version to gange; det er
+            # harmløst da begge snapshots er ens og tildelingen er atomisk
+            self._seneste = LiveSnapshot.fra_json(version, indhold)
+            self._sekvens = sekvens
+        return self._seneste
+
+
+if __name__ == "__main__":
+    # Simpel overvågning i terminalen: python resultatbus.py [navn]
+    import json
+    import sys
+
+    bus = Resultatbus.tilslut(sys.argv[1] if len(sys.argv) > 1 else "valgmodel_live")
+    print("Overvåger resultatbus - tryk Ctrl+C for at stoppe\n")
+
+    sidste_sekvens = -1
+    try:
+        while True:
+            if bus.ny_version(sidste_sekvens):
+                sidste_sekvens, version, indhold = bus.læs()
+                data = json.loads(indhold)
+                top = ", ".join(f"{p['bogstav']}: {p['mandater']}" for p in data['partier'][:3])
+                print(f"[{time.strftime('%H:%M:%S')}] Version {version}: "
+                      f"{data['metadata']['procent_optalt']:.1f}% optalt - {top}")
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.luk()
@@ -0,0 +1,122 @@
+"""
+Kompakte resultater over et fast partiindeks.
+
+Et Partiindeks er en uforanderlig rækkefølge af partier (eller forbund), som
+deles mellem alle opdateringer. En Resultatvektor er et numpy-array alignet
+med indekset plus en maske over de partier der er med. Prediкtion,
+mandatfordeling og JSON-opbygning arbejder direkte på arrays, så en
+opdatering kun allokerer en håndfuld objekter i stedet for en dict per trin.
+
+Resultatvektoren er samtidig en read-only Mapping (parti -> værdi), så kode
+der forventer en dict (f.eks. prediкtion["Ø"] eller .items()) virker uændret.
+"""
+
+from collections.abc import Mapping
+from typing import Dict, Iterator, Sequence
+
+import numpy as np
+
+
+class Partiindeks:
+    """
+    Fast rækkefølge af partier som resultatvektorer er alignet med.
+    """
+
+    __slots__ = ('navne', 'index')
+
+    def __init__(self, navne: Sequence[str]):
+        """
+        Args:
+            navne: Partibogstaver (eller forbundsnavne) i fast rækkefølge
+        """
+        self.navne = tuple(navne)
+        self.index: Dict[str, int] = {navn: i for i, navn in enumerate(self.navne)}
+
+    def __len__(self) -> int:
+        return len(self.navne)
+
+    def __eq__(self, other) -> bool:
+        return self is other or (isinstance(other, Partiindeks) and self.navne == other.navne)
+
+    def __hash__(self) -> int:
+        return hash(self.navne)
+
+    def __repr__(self) -> str:
+        return f"Partiindeks({list(self.navne)})"
+
+
+class Resultatvektor(Mapping):
+    """
+    Værdier per parti alignet med et Partiindeks.
+
+    Som Mapping ses kun partierne i masken (alle hvis masken er None).
+    """
+
+    __slots__ = ('indeks', 'værdier', 'med')
+
+    def __init__(self, indeks: Partiindeks, værdier: np.ndarray, med: np.ndarray = None):
+        """
+        Args:
+            indeks: Partiindekset værdierne er alignet med
+            værdier: Array med én værdi per parti i indekset
+            med: Boolsk maske over partierne der er med (None = alle)
+        """
+        if len(værdier) != len(indeks):
+            raise ValueError(f"Forkert antal værdier: {len(værdier)} (forventet {len(indeks)})")
+        self.indeks = indeks
+        self.værdier = værdier
+        self.med = med
+
+    @classmethod
+    def fra_dict(cls, værdier: Dict[str, float], indeks: Partiindeks = None,
+                 dtype=np.float64) -> "Resultatvektor":
+        """
+        Bygger en vektor ud fra en dict.
+
+        Args:
+            værdier: Dictionary med parti -> værdi
+            indeks: Partiindeks (standard: dict'ens partier i rækkefølge).
+                    Partier uden for indekset udelades
+            dtype: Værdiernes type
+
+        Returns:
+            Resultatvektor med dict'ens partier i masken
+        """
+        if indeks is None:
+            indeks = Partiindeks(værdier.keys())
+        vektor = np.zeros(len(indeks), dtype=dtype)
+        med = np.zeros(len(indeks), dtype=bool)
+        for navn, værdi in værdier.items():
+            i = indeks.index.get(navn)
+            if i is not None:
+                vektor[i] = værdi
+                med[i] = True
+        return cls(indeks, vektor, med)
+
+    def erstat(self, værdier: np.ndarray) -> "Resultatvektor":
+        """Ny vektor med samme indeks og maske men andre værdier."""
+        return Resultatvektor(self.indeks, værdier, self.med)
+
+    def __getitem__(self, navn: str):
+        i = self.indeks.index[navn]
+        if self.med is not None and not self.med[i]:
+            raise KeyError(navn)
+        return self.værdier[i].item()
+
+    def __iter__(self) -> Iterator[str]:
+        if self.med is None:
+            return iter(self.indeks.navne)
+        return (navn for navn, med in zip(self.indeks.navne, self.med) if med)
+
+    def __len__(self) -> int:
+        return len(self.indeks) if self.med is None else int(self.med.sum())
+
+    def som_dict(self) -> dict:
+        """Partierne i masken som en almindelig dict."""
+        værdier = self.værdier.tolist()
+        if self.med is None:
+            return dict(zip(self.indeks.navne, værdier))
+        return {navn: v for navn, v, med in zip(self.indeks.navne, værdier, self.med) if med}
+
+    def __repr__(self) -> str:
+        return f"Resultatvektor({self.som_dict()})"
@@ -0,0 +1,185 @@
+"""
+Hurtige hvad-nu-hvis beregninger til kommentatorernes skydere.
+
+"Hvad hvis Ø får 2 procentpoint mere på de resterende valgsteder?" En
+Scenarieberegner bygges én gang per publiceret version ud fra den aktuelle
+prognose og de optalte stemmer (loggens summer, som pipelinen lægger i
+metadata). De optalte stemmer ligger fast; hver forespørgsel lægger
+justeringen til den del af prognosen der mangler at blive talt op,
+skalerer de øvrige partier og fordeler mandaterne med en kompileret Mandatfordeling -
+kun få array-operationer, ingen CSV og ingen DataFrames.
+"""
+
+import json
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from mandatfordeling import Mandatfordeling
+from deltaprotokol import valgforbund_fra_live_data
+
+
+class Scenarieberegner:
+    """
+    Udgangspunktet (én version) for hvad-nu-hvis beregninger.
+    """
+
+    __slots__ = ('version', 'mandatfordeling', 'parti_index', 'optalt', 'rest',
+                 'total_stemmer', 'total_mandater')
+
+    def __init__(self, version: int, data: dict, mandatfordeling):
+        """
+        Args:
+            version: Versionen udgangspunktet stammer fra
+            data: Live-data som fra byg_live_data
+            mandatfordeling: KompileretMandatfordeling over partiindekset
+        """
+        self.version = version
+        self.mandatfordeling = mandatfordeling
+        self.parti_index = mandatfordeling.indeks.index
+
+        metadata = data["metadata"]
+        self.total_stemmer = metadata["total_stemmer"]
+        self.total_mandater = metadata["total_mandater"]
+
+        # Procent ud fra stemmerne (ikke de afrundede procenter), så et
+        # scenarie uden justering giver præcis den publicerede fordeling
+        procent = np.zeros(len(self.parti_index))
+        for parti in data["partier"]:
+            procent[self.parti_index[parti["bogstav"]]] = parti["stemmer"]
+        procent *= 100 / self.total_stemmer
+
+        # Optalte stemmer i procent af alle stemmer, resten er prognosen for
+        # de valgsteder der mangler
+        if "optalte_stemmer" in metadata:
+            self.optalt = np.zeros_like(procent)
+            for parti, antal in metadata["optalte_stemmer"].items():
+                i = self.parti_index.get(parti)
+                if i is not None:
+                    self.optalt[i] = antal
+            self.optalt *= 100 / self.total_stemmer
+            np.minimum(self.optalt, procent, out=self.optalt)
+        else:
+            # Uden loggens summer: andelen af optalte valgsteder
+            self.optalt = procent * (metadata["procent_optalt"] / 100)
+        self.rest = procent - self.optalt
+
+    def beregn(self, justering: Dict[str, float]) -> dict:
+        """
+        Beregner et scenarie.
+
+        Args:
+            justering: Dictionary med parti_bogstav -> ekstra procentpoint på
+                       de valgsteder der endnu ikke er optalt
+
+        Returns:
+            Dictionary med version, procent og mandater per parti og mandater
+            per forbund
+        """
+        rest = self.rest.copy()
+        rest_i_alt = rest.sum()
+        justeret = np.zeros(len(rest), dtype=bool)
+        for parti, point in justering.items():
+            if parti not in self.parti_index:
+                raise ValueError(f"Ukendt parti: {parti}")
+            if not np.isfinite(point):
+                raise ValueError(f"Ugyldig justering for {parti}: {point}")
+            i = self.parti_index[parti]
+            rest[i] = max(rest[i] + point / 100 * rest_i_alt, 0)
+            justeret[i] = True
+
+        # De justerede partier får præcis deres ekstra procentpoint af de
+        # resterende stemmer. De øvrige skaleres, så de resterende stemmer
+        # ikke bliver flere
+        justeret_i_alt = rest[justeret].sum()
+        if justeret_i_alt > rest_i_alt:
+            rest[justeret] *= rest_i_alt / justeret_i_alt
+            rest[~justeret] = 0
+        else:
+            øvrige = rest[~justeret].sum()
+            if øvrige > 0:
+                rest[~justeret] *= (rest_i_alt - justeret_i_alt) / øvrige
+        procent = self.optalt + rest
+
+        stemmer = np.round(procent / 100 * self.total_stemmer)
+        parti_mandater, forbund_mandater = self.mandatfordeling.fordel(stemmer, self.total_mandater)
+
+        partier = self.mandatfordeling.partier
+        return {
+            "version": self.version,
+            "procent": dict(zip(partier, np.round(procent, 2).tolist())),
+            "mandater": dict(zip(partier, parti_mandater.tolist())),
+            "forbund": dict(zip(self.mandatfordeling.forbund, forbund_mandater.tolist())),
+        }
+
+
+class Scenarieudgivelse:
+    """
+    Scenarieberegner for den seneste version.
+
+    Læser fra en Snapshotpublicering (eller Bussnapshots) ligesom
+    Deltaudgivelse. Beregneren udskiftes med én referencetildeling, når en ny
+    version ses, så samtidige forespørgsler aldrig deler foranderlig tilstand.
+    """
+
+    def __init__(self, publicering, valgforbund: Dict[str, List[str]] = None):
+        """
+        Args:
+            publicering: Kilde med `seneste` LiveSnapshot
+            valgforbund: Pipelinens valgforbund (None = aflæses af hver version)
+        """
+        self.publicering = publicering
+        self.valgforbund = valgforbund
+        self.mandatfordeling = self._kompiler(valgforbund) if valgforbund else None
+        # Valgforbundene mandatfordelingen er kompileret til, når de aflæses
+        self._aflæste_forbund = None
+        self._beregner = None
+        self._lås = threading.Lock()
+
+    def beregner(self) -> Scenarieberegner:
+        """Beregneren for den seneste version (None hvis der ikke er data endnu)."""
+        snapshot = self.publicering.seneste
+        beregner = self._beregner
+        if snapshot.data is None or (beregner is not None and beregner.version == snapshot.version):
+            return beregner
+
+        with self._lås:
+            if self._beregner is None or self._beregner.version != snapshot.version:
+                if self.valgforbund is None:
+                    valgforbund = valgforbund_fra_live_data(snapshot.data)
+                    if valgforbund != self._aflæste_forbund:
+                        self.mandatfordeling = self._kompiler(valgforbund)
+                        self._aflæste_forbund = valgforbund
+                self._beregner = Scenarieberegner(snapshot.version, snapshot.data, self.mandatfordeling)
+            return self._beregner
+
+    @staticmethod
+    def justering_fra_forespørgsel(forespørgsel: Dict[str, List[str]]) -> Dict[str, float]:
+        """
+        Justeringen i en forespørgsel (?Ø=2&A=-1).
+
+        Partibogstaver er store bogstaver. Andre parametre (f.eks. ?t= mod
+        caching) ignoreres.
+
+        Raises:
+            ValueError: Hvis en justering ikke er et tal
+        """
+        return {parti: float(værdier[0]) for parti, værdier in forespørgsel.items() if parti.isupper()}
+
+    @staticmethod
+    def _kompiler(valgforbund: Dict[str, List[str]]):
+        partier = [parti for partier in valgforbund.values() for parti in partier]
+        return Mandatfordeling(valgforbund).kompiler(partier)
+
+    def beregn_json(self, justering: Dict[str, float]) -> bytes:
+        """
+        Beregner et scenarie som JSON.
+
+        Raises:
+            ValueError: Ved ukendte partier eller hvis der ikke er data endnu
+        """
+        beregner = self.beregner()
+        if beregner is None:
+            raise ValueError("Der er endnu ingen prognose")
+        return json.dumps(beregner.beregn(justering), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
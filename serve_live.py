@@ -3,14 +3,36 @@
 Simpel HTTP server til at serve live mandatfordeling HTML.
 
 Kør dette script og åbn http://localhost:8000/live_mandatfordeling.html i din browser.
+
+Med flere serverprocesser binder hver proces sin egen socket til samme port
+med SO_REUSEPORT, og kernen fordeler forbindelserne mellem dem. Processerne
+læser det seneste resultat fra en resultatbus i delt hukommelse.
 """
 
 import http.server
+import json
+import multiprocessing
+import socket
 import socketserver
 import webbrowser
 import threading
+import os
 import time
-from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from livesnapshot import LiveSnapshot, Snapshotpublicering
+from stakprofil import installer_signal
+
+if TYPE_CHECKING:
+    from binaerformat import Binærudgivelse
+    from deltaprotokol import Deltaudgivelse
+    from mandatfordeling import Mandatfordeling
+    from prognosehistorik import Prognosehistorik
+    from scenarie import Scenarieudgivelse
+
+# Udgivelserne (numpy) importeres først når der serveres fra en publicering,
+# så serveren starter hurtigt når den kun serverer filer fra disk
 
 PORT = 8000
 
@@ -18,6 +40,185 @@ PORT = 8000
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP request handler med CORS support."""
 
+    # Sættes når opdateringen kører i samme proces som serveren (eller
+    # serveren læser fra en resultatbus). Så serveres live_data.json direkte
+    # fra det seneste snapshot i stedet for fra disk.
+    publicering: Snapshotpublicering = None
+    # Statisk del og deltaer (sættes sammen med publicering)
+    deltaudgivelse: "Deltaudgivelse" = None
+    # Binært format (sættes sammen med publicering)
+    binærudgivelse: "Binærudgivelse" = None
+    # Hvad-nu-hvis beregninger (sættes sammen med publicering)
+    scenarieudgivelse: "Scenarieudgivelse" = None
+    # Tidsserie over publicerede prognoser
+    prognosehistorik: "Prognosehistorik" = None
+
+    # Foretrukne kodninger i rækkefølge
+    KODNINGER = ('br', 'gzip')
+
+    # Sekunder mellem hver kontrol af nye versioner i /live_data/stream
+    STRØM_INTERVAL = 0.1
+
+    def do_GET(self):
+        sti = self.path.split('?')[0]
+        if self.publicering is not None and sti == '/live_data.json':
+            # Én referencelæsning - ingen låse, altid en hel version
+            self._send_snapshot(self.publicering.seneste)
+            return
+        if self.publicering is not None and sti == '/live_data/stream':
+            self._send_strøm()
+            return
+        if self.deltaudgivelse is not None and sti == '/live_data/statisk.json':
+            indhold = self.deltaudgivelse.statisk_json()
+            if indhold is None:
+                # Forbundene kendes først med den første version
+                self.send_response(204)
+                self.end_headers()
+                return
+            self._send_json(indhold)
+            return
+        if self.deltaudgivelse is not None and sti == '/live_data/delta.json':
+            forespørgsel = parse_qs(urlsplit(self.path).query)
+            try:
+                fra = int(forespørgsel['fra'][0])
+            except (KeyError, ValueError):
+                fra = None
+            self._send_json(self.deltaudgivelse.delta_json(fra))
+            return
+        if self.binærudgivelse is not None and sti == '/live_data.bin':
+            self._send_binær()
+            return
+        if self.prognosehistorik is not None and sti == '/live_data/historik.json':
+            self._send_historik()
+            return
+        if self.scenarieudgivelse is not None and sti == '/live_data/scenarie.json':
+            self._send_scenarie()
+            return
+        super().do_GET()
+
+    def _send_scenarie(self):
+        """Beregner et scenarie (?Ø=2&A=-1 i procentpoint på de resterende valgsteder)."""
+        forespørgsel = parse_qs(urlsplit(self.path).query)
+        try:
+            justering = self.scenarieudgivelse.justering_fra_forespørgsel(forespørgsel)
+            indhold = self.scenarieudgivelse.beregn_json(justering)
+        except ValueError as e:
+            self.send_error(400, "Ugyldigt scenarie", str(e))
+            return
+        self._send_json(indhold)
+
+    def _send_historik(self):
+        """Sender prognoserne i et tidsinterval (?fra=&til=&maks=) i søjleform."""
+        forespørgsel = parse_qs(urlsplit(self.path).query)
+
+        def parameter(navn, type_):
+            try:
+                return type_(forespørgsel[navn][0])
+            except (KeyError, ValueError):
+                return None
+
+        self.prognosehistorik.opdater()
+        data = self.prognosehistorik.som_json(
+            parameter('fra', float), parameter('til', float), parameter('maks', int)
+        )
+        self._send_json(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def _send_binær(self):
+        """Sender seneste version i binært format (strengtabel kun hvis nødvendig)."""
+        forespørgsel = parse_qs(urlsplit(self.path).query)
+        try:
+            strengtabel_id = int(forespørgsel['tabel'][0])
+        except (KeyError, ValueError):
+            strengtabel_id = None
+
+        indhold = self.binærudgivelse.hent(strengtabel_id)
+        if indhold is None:
+            self.send_response(204)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(indhold)))
+        self.end_headers()
+        self.wfile.write(indhold)
+
+    def _send_json(self, indhold: bytes):
+        """Sender færdigkodet JSON."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(indhold)))
+        self.end_headers()
+        self.wfile.write(indhold)
+
+    def _send_strøm(self):
+        """
+        Server-sent events: sender hver ny version indtil klienten lukker.
+
+        Hver hændelse har versionen som id og snapshottets tidspunkt som
+        kommentar, så en klient kan måle forsinkelsen.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+
+        version = 0
+        try:
+            while True:
+                snapshot = self.publicering.seneste
+                if snapshot.version != version:
+                    self.wfile.write(b': %.6f\nid: %d\ndata: %s\n\n' % (
+                        snapshot.tidspunkt, snapshot.version, snapshot.json_bytes
+                    ))
+                    self.wfile.flush()
+                    version = snapshot.version
+                time.sleep(self.STRØM_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _vælg_kodning(self, snapshot: LiveSnapshot) -> Optional[str]:
+        """Vælger en af snapshottets komprimeringer ud fra Accept-Encoding."""
+        accepteret = {}
+        for del_ in self.headers.get('Accept-Encoding', '').split(','):
+            navn, _, parametre = del_.strip().partition(';')
+            kvalitet = 1.0
+            parametre = parametre.strip()
+            if parametre.startswith('q='):
+                try:
+                    kvalitet = float(parametre[2:])
+                except ValueError:
+                    kvalitet = 0.0
+            accepteret[navn.strip().lower()] = kvalitet
+
+        for kodning in self.KODNINGER:
+            kvalitet = accepteret.get(kodning, accepteret.get('*', 0.0))
+            if kvalitet > 0 and kodning in snapshot.komprimeret:
+                return kodning
+        return None
+
+    def _send_snapshot(self, snapshot: LiveSnapshot):
+        """Sender et snapshots færdigrenderede (og evt. komprimerede) JSON."""
+        kodning = self._vælg_kodning(snapshot)
+        etag = snapshot.etag if kodning is None else snapshot.etag[:-1] + '-' + kodning + '"'
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+
+        indhold = snapshot.json_bytes if kodning is None else snapshot.komprimeret[kodning]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if kodning is not None:
+            self.send_header('Content-Encoding', kodning)
+        self.send_header('Content-Length', str(len(indhold)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        self.wfile.write(indhold)
+
     def end_headers(self):
         # Tilføj CORS headers for at tillade JSON loading
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -26,24 +227,221 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
 
     def log_message(self, format, *args):
         # Mindre verbose logging
-        if not any(x in args[0] for x in ['.json', '.html']):
+        if not any(x in str(args[0]) for x in ['.json', '.html']):
             return
         super().log_message(format, *args)
 
 
-def start_server():
-    """Starter HTTP serveren."""
-    with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
-        print(f"Server kører på http://localhost:{PORT}/")
-        print(f"Åbn http://localhost:{PORT}/live_mandatfordeling.html i din browser")
-        print("\nTryk Ctrl+C for at stoppe serveren")
+class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server der håndterer hver forespørgsel i sin egen tråd."""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class ReusePortServer(ThreadingServer):
+    """Server hvis socket deler porten med andre processer (SO_REUSEPORT)."""
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def start_server(publicering: Snapshotpublicering = None, port: int = PORT,
+                 reuse_port: bool = False, vis_status: bool = True,
+                 prognosehistorik: "Prognosehistorik" = None,
+                 valgforbund: Dict[str, List[str]] = None):
+    """
+    Starter HTTP serveren.
+
+    Args:
+        publicering: Snapshotpublicering (eller Bussnapshots) som
+                     live_data.json serveres fra (standard: filen på disk)
+        port: Port at lytte på
+        reuse_port: Bind med SO_REUSEPORT så flere processer deler porten
+        vis_status: Udskriv adresse og vejledning
+        prognosehistorik: Prognosehistorik som /live_data/historik.json
+                          serveres fra
+        valgforbund: Pipelinens valgforbund til den statiske del, det binære
+                     format og scenarierne (None = aflæses af snapshottet)
+    """
+    MyHTTPRequestHandler.publicering = publicering
+    MyHTTPRequestHandler.deltaudgivelse = None
+    MyHTTPRequestHandler.binærudgivelse = None
+    MyHTTPRequestHandler.scenarieudgivelse = None
+    if publicering is not None:
+        from deltaprotokol import Deltaudgivelse
+        from binaerformat import Binærudgivelse
+        from scenarie import Scenarieudgivelse
+
+        MyHTTPRequestHandler.deltaudgivelse = Deltaudgivelse(publicering, valgforbund=valgforbund)
+        MyHTTPRequestHandler.binærudgivelse = Binærudgivelse(publicering, valgforbund)
+        MyHTTPRequestHandler.scenarieudgivelse = Scenarieudgivelse(publicering, valgforbund)
+    MyHTTPRequestHandler.prognosehistorik = prognosehistorik
+    server_klasse = ReusePortServer if reuse_port else ThreadingServer
+
+    # SIGUSR1 profilerer processen (kun muligt fra hovedtråden)
+    installer_signal()
+
+    with server_klasse(("", port), MyHTTPRequestHandler) as httpd:
+        if vis_status:
+            print(f"Server kører på http://localhost:{port}/")
+            print(f"Åbn http://localhost:{port}/live_mandatfordeling.html i din browser")
+            print("\nTryk Ctrl+C for at stoppe serveren")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print("\n\nServeren stoppes...")
+            if vis_status:
+                print("\n\nServeren stoppes...")
             httpd.shutdown()
 
 
+def _kør_serverproces(busnavn: str, port: int, prognose_fil: Optional[str],
+                      valgforbund: Optional[Dict[str, List[str]]]):
+    """Én serverproces der serverer det seneste resultat fra resultatbussen."""
+    from resultatbus import Resultatbus, Bussnapshots
+    from prognosehistorik import Prognosehistorik
+
+    bus = Resultatbus.tilslut(busnavn)
+    prognosehistorik = None
+    if prognose_fil:
+        try:
+            prognosehistorik = Prognosehistorik(prognose_fil)
+        except ValueError as e:
+            # Pipelinen har ikke oprettet historikken
+            print(f"  ✗ {e}")
+    try:
+        start_server(Bussnapshots(bus), port=port, reuse_port=True, vis_status=False,
+                     prognosehistorik=prognosehistorik, valgforbund=valgforbund)
+    finally:
+        bus.luk()
+
+
+def start_serverprocesser(busnavn: str, antal: int, port: int = PORT, prognose_fil: str = None,
+                          valgforbund: Dict[str, List[str]] = None) -> List[multiprocessing.Process]:
+    """
+    Starter flere serverprocesser der deler porten med SO_REUSEPORT.
+
+    Args:
+        busnavn: Navn på resultatbussen processerne læser fra
+        antal: Antal serverprocesser (typisk antal kerner)
+        port: Port at lytte på
+        prognose_fil: Prognosehistorik som processerne læser (skrives af pipelinen)
+        valgforbund: Pipelinens valgforbund (None = aflæses af snapshottet)
+
+    Returns:
+        Liste med de startede processer
+    """
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise ValueError("SO_REUSEPORT understøttes ikke på denne platform")
+
+    processer = [
+        multiprocessing.Process(target=_kør_serverproces, args=(busnavn, port, prognose_fil, valgforbund),
+                                name=f"server-{i + 1}", daemon=True)
+        for i in range(antal)
+    ]
+    for proces in processer:
+        proces.start()
+    return processer
+
+
+def start_live_server(model, live_sti: str, interval: float = 1.0, antal_processer: int = 1,
+                      port: int = PORT, prognose_fil: Optional[str] = "prognosehistorik.bin",
+                      kontrolpunkt: str = None, eksport: str = None, bootstrap: int = 0,
+                      mandatfordeling: "Mandatfordeling" = None):
+    """
+    Kører opdateringen og serveren.
+
+    Med én proces publicerer opdateringspipelinen snapshots som serveren
+    læser direkte. Med flere processer skriver pipelinen til en resultatbus,
+    og serverprocesserne deler porten med SO_REUSEPORT. I begge tilfælde
+    skrives eller læses live_data.json aldrig fra disk.
+
+    Args:
+        model: Valgmodel instans
+        live_sti: Sti til live CSV eller mappe med én fil per valgsted,
+                  eller URL til et HTTP-feed
+        interval: Sekunder mellem hver indlæsning
+        antal_processer: Antal serverprocesser
+        port: Port at lytte på
+        prognose_fil: Fil med tidsserien over alle publicerede prognoser
+                      (None = ingen historik)
+        kontrolpunkt: Fil med kontrolpunkt af den levende tilstand, som der
+                      genoptages fra efter en genstart
+        eksport: Mappe som valgstederne og alle publicerede prognoser
+                 eksporteres til som Parquet (kræver pyarrow)
+        bootstrap: Antal bootstrap-gentagelser for konfidensintervaller
+                   (0 = ingen intervaller)
+        mandatfordeling: Valgforbund at fordele med (standard: Københavns).
+                         Den statiske del, det binære format, scenarierne og
+                         prognosehistorikken følger de samme forbund
+    """
+    from opdateringspipeline import Opdateringspipeline
+    from prognosehistorik import Prognosehistorik
+    from kolonneeksport import åbn_eksport
+    from mandatfordeling import Mandatfordeling, KØBENHAVN_VALGFORBUND
+
+    if mandatfordeling is None:
+        mandatfordeling = Mandatfordeling(KØBENHAVN_VALGFORBUND)
+    valgforbund = mandatfordeling.valgforbund
+    partier = [parti for forbund in valgforbund.values() for parti in forbund]
+    prognosehistorik = Prognosehistorik(prognose_fil, partier) if prognose_fil else None
+    kolonneeksport = åbn_eksport(eksport)
+
+    if antal_processer <= 1:
+        publicering = Snapshotpublicering()
+        pipeline = Opdateringspipeline(
+            model, live_sti, output_json=None, mandatfordeling=mandatfordeling, interval=interval,
+            publicering=publicering, prognosehistorik=prognosehistorik, kolonneeksport=kolonneeksport,
+            bootstrap=bootstrap, kontrolpunkt=kontrolpunkt
+        )
+        opdatering = threading.Thread(target=pipeline.kør, name="opdatering", daemon=True)
+        opdatering.start()
+
+        try:
+            start_server(publicering, port=port, prognosehistorik=prognosehistorik, valgforbund=valgforbund)
+        finally:
+            # Vent på at opdateringen har gemt sit sidste kontrolpunkt, før
+            # historikken og eksporten lukkes og processen slutter
+            pipeline.stop()
+            opdatering.join()
+            if prognosehistorik is not None:
+                prognosehistorik.luk()
+            if kolonneeksport is not None:
+                kolonneeksport.luk()
+        return
+
+    from resultatbus import Resultatbus
+
+    bus = Resultatbus.opret(f"valgmodel_live_{os.getpid()}")
+    # Serverprocesserne startes før pipelinens tråde og arbejdsprocesser
+    processer = start_serverprocesser(bus.segment.name, antal_processer, port=port,
+                                      prognose_fil=prognose_fil, valgforbund=valgforbund)
+    pipeline = Opdateringspipeline(
+        model, live_sti, output_json=None, mandatfordeling=mandatfordeling, interval=interval,
+        resultatbus=bus, prognosehistorik=prognosehistorik, kolonneeksport=kolonneeksport,
+        bootstrap=bootstrap, kontrolpunkt=kontrolpunkt
+    )
+    print(f"{antal_processer} serverprocesser kører på http://localhost:{port}/")
+    print("\nTryk Ctrl+C for at stoppe")
+
+    installer_signal()
+
+    try:
+        pipeline.kør()
+    except KeyboardInterrupt:
+        print("\n\nServeren stoppes...")
+    finally:
+        for proces in processer:
+            proces.terminate()
+            proces.join()
+        bus.luk()
+        if prognosehistorik is not None:
+            prognosehistorik.luk()
+        if kolonneeksport is not None:
+            kolonneeksport.luk()
+
+
 def open_browser():
     """Åbner browseren efter 1 sekund."""
     time.sleep(1)
@@ -51,18 +449,7 @@ def open_browser():
 
 
 if __name__ == '__main__':
-    # Skift til script directory
-    import os
-    os.chdir(Path(__file__).parent)
-
-    print("="*70)
-    print("LIVE MANDATFORDELING SERVER")
-    print("="*70)
-    print("\nForbereder server...")
-
-    # Start browser i separat tråd
-    browser_thread = threading.Thread(target=open_browser, daemon=True)
-    browser_thread.start()
+    import sys
+    from valgmodel_cli import main
 
-    # Start server
-    start_server()
+    sys.exit(main(["serve", "--browser", *sys.argv[1:]]))
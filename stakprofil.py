@@ -0,0 +1,174 @@
+"""
+Indbygget stakprøvetager der slås til og fra med et signal.
+
+Bliver opdateringen langsom på valgnatten, kan den kørende proces profileres
+uden genstart:
+
+    kill -USR1 <pid>     # start (stopper selv efter et fast tidsrum)
+    kill -USR1 <pid>     # stop før tid
+
+Mens prøvetageren kører, læser en baggrundstråd alle trådes stakke med
+sys._current_frames() med et fast interval og tæller hver stak. Resultatet
+skrives i "collapsed stack" formatet (én linje per stak: rammer adskilt af
+semikolon efterfulgt af antal), som flamegraph.pl, speedscope og inferno
+læser direkte. Når prøvetageren er slået fra, kører der intet - kun
+signalhåndteringen er installeret.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+def _ramme(kode) -> str:
+    """Én ramme som 'funktion (fil:linje)' uden tegn der bryder formatet."""
+    navn = f"{kode.co_name} ({os.path.basename(kode.co_filename)}:{kode.co_firstlineno})"
+    return navn.replace(';', ':')
+
+
+class Stakprofil:
+    """
+    Stakprøvetager for alle tråde i processen.
+    """
+
+    def __init__(self, mappe: str = ".", varighed: float = 30.0, interval: float = 0.005):
+        """
+        Args:
+            mappe: Mappe som profilerne skrives til
+            varighed: Sekunder prøvetageren højst kører per start
+            interval: Sekunder mellem hver prøve
+        """
+        self.mappe = mappe
+        self.varighed = varighed
+        self.interval = interval
+        self.sidste_fil: Optional[str] = None
+        self._tråd: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lås = threading.Lock()
+
+    @property
+    def aktiv(self) -> bool:
+        tråd = self._tråd
+        return tråd is not None and tråd.is_alive()
+
+    def start(self) -> bool:
+        """
+        Starter prøvetagningen.
+
+        Returns:
+            False hvis den allerede kører
+        """
+        with self._lås:
+            if self.aktiv:
+                return False
+            self._stop.clear()
+            self._tråd = threading.Thread(target=self._kør, name="stakprofil", daemon=True)
+            self._tråd.start()
+            return True
+
+    def stop(self, vent: bool = True) -> Optional[str]:
+        """
+        Stopper prøvetagningen før tid.
+
+        Args:
+            vent: Vent til profilen er skrevet
+
+        Returns:
+            Stien til profilen (hvis der blev ventet)
+        """
+        tråd = self._tråd
+        self._stop.set()
+        if vent and tråd is not None:
+            tråd.join()
+            return self.sidste_fil
+        return None
+
+    def skift(self) -> bool:
+        """
+        Starter prøvetagningen, eller stopper den hvis den kører.
+
+        Returns:
+            True hvis den blev startet
+        """
+        if self.start():
+            return True
+        self.stop(vent=False)
+        return False
+
+    def _kør(self) -> None:
+        """Tager prøver indtil tiden er gået eller stop() kaldes, og skriver profilen."""
+        egen = threading.get_ident()
+        navne = {}
+        stakke = Counter()
+        antal = 0
+
+        start = time.perf_counter()
+        slut = start + self.varighed
+        næste = start
+        while not self._stop.is_set() and næste < slut:
+            for ident, ramme in sys._current_frames().items():
+                if ident == egen:
+                    continue
+                rammer = []
+                while ramme is not None:
+                    rammer.append(ramme.f_code)
+                    ramme = ramme.f_back
+                stakke[(ident, tuple(rammer))] += 1
+            antal += 1
+
+            næste += self.interval
+            self._stop.wait(max(0.0, næste - time.perf_counter()))
+
+        # Trådnavne og rammer formateres først til sidst
+        for tråd in threading.enumerate():
+            navne[tråd.ident] = tråd.name
+        linjer = Counter()
+        for (ident, rammer), n in stakke.items():
+            tråd = navne.get(ident, f"tråd-{ident}").replace(';', ':')
+            linjer[';'.join([tråd] + [_ramme(kode) for kode in reversed(rammer)])] += n
+
+        os.makedirs(self.mappe, exist_ok=True)
+        tidspunkt = time.time()
+        sti = os.path.join(self.mappe, f"profil_{os.getpid()}_{time.strftime('%Y%m%d-%H%M%S', time.localtime(tidspunkt))}"
+                                       f"-{int(tidspunkt * 1000) % 1000:03d}.folded")
+        with open(sti, 'w', encoding='utf-8') as f:
+            for stak, n in linjer.most_common():
+                f.write(f"{stak} {n}\n")
+
+        self.sidste_fil = sti
+        print(f"[{time.strftime('%H:%M:%S')}] Profil med {antal} prøver over "
+              f"{time.perf_counter() - start:.1f} s gemt i {sti}", file=sys.stderr)
+
+
+def installer_signal(signalnummer: int = None, **kwargs) -> Optional[Stakprofil]:
+    """
+    Installerer en signalhåndtering der slår en Stakprofil til og fra.
+
+    Signalhåndteringer kan kun installeres fra hovedtråden og ikke på
+    platforme uden SIGUSR1 (Windows). I de tilfælde gøres intet.
+
+    Args:
+        signalnummer: Signal (standard: SIGUSR1)
+        **kwargs: Videre til Stakprofil (mappe, varighed, interval)
+
+    Returns:
+        Stakprofilen, eller None hvis der ikke kunne installeres et signal
+    """
+    if signalnummer is None:
+        signalnummer = getattr(signal, 'SIGUSR1', None)
+    if signalnummer is None or threading.current_thread() is not threading.main_thread():
+        return None
+
+    profil = Stakprofil(**kwargs)
+
+    def håndtering(signum, frame):
+        if profil.skift():
+            print(f"[{time.strftime('%H:%M:%S')}] Profilering startet i {profil.varighed:.0f} s "
+                  f"(send signalet igen for at stoppe)", file=sys.stderr)
+
+    signal.signal(signalnummer, håndtering)
+    return profil
@@ -0,0 +1,285 @@
+"""
+Estimering af vælgervandringer mellem forrige og nuværende valg.
+
+Modellen estimerer en overflytningsmatrix B, hvor B[k, m] er andelen af
+parti k's vælgere ved forrige valg der stemmer på parti m nu. Estimatet
+bygger på variationen mellem valgstederne (økologisk inferens):
+
+    y_s ≈ x_s · B
+
+hvor x_s er forrige valgs stemmer på valgsted s (skaleret til samme antal
+stemmer som nu) og y_s er de nuværende stemmer på valgstedet.
+
+Normalligningernes statistikker X'X og X'Y akkumuleres efterhånden som
+valgstederne bliver optalt. Et nyt estimat kræver derfor kun løsning af et
+lille parti × parti problem - uafhængigt af hvor mange valgsteder der er optalt.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from valgmodel import Valgmodel
+
+
+class Stemmeoverflytning:
+    """
+    Inkrementel estimator for overflytningsmatricen mellem to valg.
+
+    Hver række i matricen summer til 1 og alle elementer er ikke-negative.
+    Estimatet trækkes mod en "loyalitets-prior" hvor partiets vælgere bliver
+    hos partiet. Partier i modellens `nye_partier` har ingen modpart ved
+    forrige valg og får derfor ingen loyale vælgere i prioren.
+    """
+
+    def __init__(self, model: Valgmodel, prior_vægt: float = 0.1):
+        """
+        Initialiserer estimatoren med forrige valgs valgstedsdata.
+
+        Args:
+            model: Valgmodel instans med data fra forrige valg
+            prior_vægt: Priorens vægt målt i antal "gennemsnitlige valgsteder"
+        """
+        self.model = model
+
+        forrige_matrix = model._beregn_valgsted_matrix(model.forrige_valg_data)
+        self.forrige_partier: List[str] = list(forrige_matrix.columns)
+        self.forrige_stemmer: Dict[str, np.ndarray] = {
+            valgsted: række.astype(float)
+            for valgsted, række in zip(forrige_matrix.index, forrige_matrix.to_numpy())
+        }
+
+        # Priorens styrke svarer til prior_vægt valgsteder af gennemsnitlig størrelse
+        self.prior_styrke = prior_vægt * float(
+            np.mean(np.sum(forrige_matrix.to_numpy(dtype=float) ** 2, axis=1))
+        )
+
+        antal_forrige = len(self.forrige_partier)
+        self.nuværende_partier: List[str] = []
+        self._parti_index: Dict[str, int] = {}
+
+        # Akkumulerede normalligninger
+        self.xtx = np.zeros((antal_forrige, antal_forrige))
+        self.xty = np.zeros((antal_forrige, 0))
+
+        # Hvert valgsteds bidrag gemmes så rettelser kan trækkes fra igen
+        self._bidrag: Dict[str, np.ndarray] = {}
+        self._overflytning: Optional[np.ndarray] = None
+
+    def _sikr_partier(self, partier) -> None:
+        """Udvider søjlerne med partier der ikke er set før."""
+        nye = [p for p in partier if p not in self._parti_index]
+        if not nye:
+            return
+
+        for parti in nye:
+            self._parti_index[parti] = len(self.nuværende_partier)
+            self.nuværende_partier.append(parti)
+
+        self.xty = np.pad(self.xty, ((0, 0), (0, len(nye))))
+        if self._overflytning is not None:
+            self._overflytning = np.pad(self._overflytning, ((0, 0), (0, len(nye))))
+        for valgsted, y in self._bidrag.items():
+            self._bidrag[valgsted] = np.pad(y, (0, len(nye)))
+
+    def _akkumuler(self, valgsted: str, y: np.ndarray, fortegn: float) -> None:
+        """Lægger (eller trækker) et valgsteds bidrag til normalligningerne."""
+        x = self.forrige_stemmer[valgsted]
+        total_forrige = x.sum()
+        if total_forrige > 0:
+            # Skaler forrige valg til samme antal stemmer som nu
+            x = x * (y.sum() / total_forrige)
+
+        self.xtx += fortegn * np.outer(x, x)
+        self.xty += fortegn * np.outer(x, y)
+
+    def tilføj_valgsted(self, valgsted: str, stemmer: Dict[str, float]) -> bool:
+        """
+        Registrerer (eller retter) resultatet fra ét valgsted.
+
+        Args:
+            valgsted: Navn på valgstedet
+            stemmer: Dictionary med partibogstav -> antal stemmer
+
+        Returns:
+            True hvis valgstedet indgår i estimatet, False hvis det ikke
+            findes ved forrige valg
+        """
+        if valgsted not in self.forrige_stemmer:
+            return False
+
+        self._sikr_partier(stemmer.keys())
+
+        y = np.zeros(len(self.nuværende_partier))
+        for parti, antal in stemmer.items():
+            y[self._parti_index[parti]] = antal
+
+        # Rettelser: træk det gamle bidrag fra før det nye lægges til
+        if valgsted in self._bidrag:
+            gammel_y = self._bidrag[valgsted]
+            if np.array_equal(gammel_y, y):
+                return True
+            self._akkumuler(valgsted, gammel_y, -1.0)
+
+        self._akkumuler(valgsted, y, 1.0)
+        self._bidrag[valgsted] = y
+        return True
+
+    def opdater(self, nuværende_data: pd.DataFrame) -> int:
+        """
+        Registrerer alle valgsteder i nuværende data.
+
+        Valgsteder med uændrede stemmetal koster kun en sammenligning.
+
+        Args:
+            nuværende_data: DataFrame med data fra nuværende valg
+
+        Returns:
+            Antal valgsteder der indgår i estimatet
+        """
+        matrix = self.model._beregn_valgsted_matrix(nuværende_data)
+        partier = list(matrix.columns)
+
+        for valgsted, række in zip(matrix.index, matrix.to_numpy(dtype=float)):
+            self.tilføj_valgsted(valgsted, dict(zip(partier, række)))
+
+        return len(self._bidrag)
+
+    def _prior(self) -> np.ndarray:
+        """
+        Loyalitets-prior: partier der findes ved begge valg beholder deres
+        vælgere. Øvrige rækker fordeles ligeligt på de nuværende partier.
+        """
+        antal_nuværende = len(self.nuværende_partier)
+        prior = np.full(
+            (len(self.forrige_partier), antal_nuværende),
+            1.0 / max(antal_nuværende, 1)
+        )
+
+        for k, parti in enumerate(self.forrige_partier):
+            if parti in self.model.nye_partier or parti not in self._parti_index:
+                continue
+            prior[k, :] = 0.0
+            prior[k, self._parti_index[parti]] = 1.0
+
+        return prior
+
+    @staticmethod
+    def _projicer_på_simplex(matrix: np.ndarray) -> np.ndarray:
+        """
+        Projicerer hver række ortogonalt på sandsynlighedssimplexet
+        (ikke-negative elementer der summer til 1).
+        """
+        sorteret = -np.sort(-matrix, axis=1)
+        kumsum = np.cumsum(sorteret, axis=1) - 1.0
+        indeks = np.arange(1, matrix.shape[1] + 1)
+        betingelse = sorteret - kumsum / indeks > 0
+        rho = matrix.shape[1] - 1 - np.argmax(betingelse[:, ::-1], axis=1)
+        theta = kumsum[np.arange(matrix.shape[0]), rho] / (rho + 1)
+        return np.maximum(matrix - theta[:, None], 0.0)
+
+    def estimer(
+        self,
+        max_iterationer: int = 500,
+        tolerance: float = 1e-6
+    ) -> pd.DataFrame:
+        """
+        Estimerer overflytningsmatricen ud fra de akkumulerede statistikker.
+
+        Løser min ½‖XB - Y‖² + ½λ‖B - B₀‖² under betingelse af at hver række
+        i B ligger på simplexet (accelereret projiceret gradient). Forrige
+        estimat bruges som startpunkt, så små opdateringer konvergerer hurtigt.
+
+        Args:
+            max_iterationer: Maksimalt antal iterationer
+            tolerance: Stopkriterium for den maksimale ændring i B
+
+        Returns:
+            DataFrame med forrige partier som rækker og nuværende partier som
+            kolonner
+        """
+        if not self.nuværende_partier:
+            raise ValueError("Ingen valgsteder er registreret endnu")
+
+        prior = self._prior()
+        lam = self.prior_styrke
+
+        hessian = self.xtx + lam * np.eye(len(self.forrige_partier))
+        lineær = self.xty + lam * prior
+        skridt = 1.0 / np.linalg.eigvalsh(hessian)[-1]
+
+        b = self._overflytning if self._overflytning is not None else prior
+        z = b
+        t = 1.0
+
+        for _ in range(max_iterationer):
+            ny_b = self._projicer_på_simplex(z - skridt * (hessian @ z - lineær))
+            ændring = np.max(np.abs(ny_b - b))
+
+            ny_t = (1.0 + np.sqrt(1.0 + 4.0 * t * t)) / 2.0
+            z = ny_b + ((t - 1.0) / ny_t) * (ny_b - b)
+            b, t = ny_b, ny_t
+
+            if ændring < tolerance:
+                break
+
+        self._overflytning = b
+
+        return pd.DataFrame(b, index=self.forrige_partier, columns=self.nuværende_partier)
+
+    def print_overflytning(
+        self,
+        overflytning: pd.DataFrame,
+        partier: List[str] = None,
+        min_andel: float = 0.05
+    ):
+        """
+        Printer de største vælgerstrømme for hvert parti.
+
+        Args:
+            overflytning: Resultat fra estimer()
+            partier: Forrige partier der skal vises (standard: alle)
+            min_andel: Mindste andel der vises
+        """
+        print("\nVælgervandringer (forrige → nuværende)")
+        print("=" * 60)
+
+        for parti in partier or overflytning.index:
+            række = overflytning.loc[parti].sort_values(ascending=False)
+            strømme = [
+                f"{mål}: {andel * 100:4.1f}%"
+                for mål, andel in række.items()
+                if andel >= min_andel
+            ]
+            print(f"{parti:3s} → " + ", ".join(strømme))
+
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    import time
+
+    model = Valgmodel(
+        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
+        nye_partier=["M", "N", "Æ", "Q"]
+    )
+
+    # Simuler at 20% af A's vælgere går til Ø og 10% af C's går til V
+    nuværende_data = model.forrige_valg_data.copy()
+    matrix = model._beregn_valgsted_matrix(nuværende_data)
+    matrix['Ø'] += (matrix['A'] * 0.2).round()
+    matrix['A'] -= (matrix['A'] * 0.2).round()
+    matrix['V'] += (matrix['C'] * 0.1).round()
+    matrix['C'] -= (matrix['C'] * 0.1).round()
+
+    estimator = Stemmeoverflytning(model)
+
+    for valgsted, række in matrix.iterrows():
+        estimator.tilføj_valgsted(valgsted, række.to_dict())
+
+    start = time.perf_counter()
+    overflytning = estimator.estimer()
+    varighed = (time.perf_counter() - start) * 1000
+
+    estimator.print_overflytning(overflytning, partier=["A", "C", "Ø", "V"])
+    print(f"Estimat beregnet på {varighed:.1f} ms")
@@ -0,0 +1,143 @@
+"""
+Test af anomalitjek og karantæne på indkomne valgsteder.
+"""
+
+import time
+
+import numpy as np
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER
+from indberetningslog import Indberetningslog
+from anomali import Anomalitjek
+from genafspil_valgnat import lav_valgnat
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def _batch(valgnat):
+    """Valgnattens rækker som (valgsted, stemmer) til registrer_batch."""
+    return [
+        (valgsted, rækker.groupby('Bogstavbetegnelse')['Stemmetal'].sum().to_dict())
+        for valgsted, rækker in valgnat
+    ]
+
+
+def test_ren_valgnat_giver_ingen_anomalier():
+    """Test at en valgnat uden fejl kommer igennem uden markeringer."""
+    print("="*70)
+    print("TEST: Ingen falske anomalier")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    for seed in range(3):
+        batch = _batch(lav_valgnat(CSV_2021, swing={"Ø": 1.2, "A": 0.85}, seed=seed))
+        log = Indberetningslog(model, anomalitjek=Anomalitjek())
+        uden = Indberetningslog(model)
+
+        varigheder = []
+        for i in range(0, len(batch), 5):
+            start = time.perf_counter()
+            log.registrer_batch(batch[i:i + 5], float(i))
+            varigheder.append(time.perf_counter() - start)
+            uden.registrer_batch(batch[i:i + 5], float(i))
+
+        assert not log.anomalier and not log.karantæne
+        assert np.array_equal(log.nuværende_sum, uden.nuværende_sum)
+        assert log.antal_optalte == len(batch)
+        print(f"Seed {seed}: {len(batch)} valgsteder, længste batch {max(varigheder) * 1000:.1f} ms")
+
+
+def test_fejlindtastninger_holdes_i_karantæne():
+    """Test at et nul for meget og ombyttede partier holdes ude af summerne."""
+    print("="*70)
+    print("TEST: Karantæne af fejlindtastninger")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    batch = _batch(lav_valgnat(CSV_2021, swing={"Ø": 1.2, "A": 0.85}, seed=1))
+    log = Indberetningslog(model, anomalitjek=Anomalitjek())
+    log.registrer_batch(batch[:20], 1.0)
+    summer = log.nuværende_sum.copy()
+
+    # Et nul for meget på hele valgstedet, på ét parti og A og Ø byttet om
+    rettede = dict(batch[20:30])
+    ti_gange, ét_parti, byttet = list(rettede)[:3]
+    rettede[ti_gange] = {p: 10 * n for p, n in rettede[ti_gange].items()}
+    rettede[ét_parti] = {**rettede[ét_parti], "V": 10 * rettede[ét_parti]["V"]}
+    rettede[byttet] = {**rettede[byttet], "A": rettede[byttet]["Ø"], "Ø": rettede[byttet]["A"]}
+
+    antal = log.registrer_batch(list(rettede.items()), 2.0)
+    for anomali in log.anomalier:
+        print(f"  {anomali.valgsted}: {anomali.score:.1f} ({anomali.grund})")
+
+    assert antal == 7
+    assert set(log.karantæne) == {ti_gange, ét_parti, byttet}
+    assert log.karantæne[ti_gange].grund == "stemmetal"
+    assert log.karantæne[ét_parti].grund == "V"
+    assert log.antal_optalte == 27
+
+    # Kun de godkendte valgsteder er lagt til summerne
+    godkendte = Indberetningslog(model)
+    godkendte.registrer_batch(batch[:20], 1.0)
+    godkendte.registrer_batch([(v, s) for v, s in rettede.items() if v not in log.karantæne], 2.0)
+    assert np.array_equal(log.nuværende_sum, godkendte.nuværende_sum)
+    assert not np.array_equal(log.nuværende_sum[:len(summer)], summer)
+    nuværende, forrige = log.valgstedsmatricer()
+    assert np.allclose(nuværende.sum(axis=0), log.nuværende_sum)
+    assert np.allclose(forrige.sum(axis=0), log.forrige_sum)
+
+    # Den samme fejl genindlæst (som ved hver genlæsning af live CSV'en) scores ikke igen
+    antal_anomalier = len(log.anomalier)
+    assert log.registrer_batch(list(rettede.items()), 2.5) == 0
+    assert len(log.anomalier) == antal_anomalier
+
+    # En rettet indberetning afløser karantænen, og et valgsted kan frigives
+    assert log.registrer_batch([batch[20]], 3.0) == 1
+    assert ti_gange not in log.karantæne
+    assert log.frigiv(ét_parti, 4.0)
+    log.afvis(byttet)
+    assert not log.karantæne
+    assert log.antal_optalte == 29
+
+    try:
+        log.frigiv(byttet)
+        assert False, "Et valgsted uden for karantæne blev frigivet"
+    except ValueError:
+        pass
+
+    # Enkelte indberetninger går gennem samme tjek
+    valgsted, stemmer = batch[30]
+    assert not log.registrer(valgsted, {p: 10 * n for p, n in stemmer.items()}, 5.0)
+    assert valgsted in log.karantæne and log.antal_optalte == 29
+    assert log.registrer(valgsted, stemmer, 6.0)
+    assert valgsted not in log.karantæne and log.antal_optalte == 30
+
+
+def test_markering_uden_karantæne():
+    """Test at afvigere kun markeres når karantænen er slået fra."""
+    print("="*70)
+    print("TEST: Markering uden karantæne")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    batch = _batch(lav_valgnat(CSV_2021, seed=2))
+    log = Indberetningslog(model, anomalitjek=Anomalitjek(karantæne=False))
+    log.registrer_batch(batch[:20], 1.0)
+
+    valgsted, stemmer = batch[20]
+    assert log.registrer_batch([(valgsted, {p: 10 * n for p, n in stemmer.items()})], 2.0) == 1
+    assert [a.valgsted for a in log.anomalier] == [valgsted]
+    assert not log.karantæne
+    assert log.antal_optalte == 21
+
+    # For få valgsteder til at kende swinget: intet scores
+    tidlig = Indberetningslog(model, anomalitjek=Anomalitjek())
+    tidlig.registrer_batch([(valgsted, {p: 10 * n for p, n in stemmer.items()})], 1.0)
+    assert not tidlig.anomalier and tidlig.antal_optalte == 1
+
+
+if __name__ == "__main__":
+    test_ren_valgnat_giver_ingen_anomalier()
+    test_fejlindtastninger_holdes_i_karantæne()
+    test_markering_uden_karantæne()
@@ -0,0 +1,60 @@
+"""
+Test af belastningstesten mod en lokal server.
+"""
+
+import asyncio
+import threading
+
+from belastningstest import kør_belastning
+from livesnapshot import Snapshotpublicering
+from serve_live import MyHTTPRequestHandler, ThreadingServer
+
+
+def test_belastningstest():
+    """Test at dashboards og SSE-abonnenter måles uden fejl."""
+    print("="*70)
+    print("TEST: Belastningstest")
+    print("="*70)
+
+    publicering = Snapshotpublicering()
+    publicering.publicer({"version": 1})
+
+    # Egen handlerklasse, så MyHTTPRequestHandler ikke ændres for andre tests
+    class Handler(MyHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    Handler.publicering = publicering
+    server = ThreadingServer(("", 0), Handler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def opdater():
+        for version in range(2, 6):
+            threading.Event().wait(0.2)
+            publicering.publicer({"version": version})
+
+    try:
+        threading.Thread(target=opdater, daemon=True).start()
+        resultat = asyncio.run(kør_belastning(
+            port=port, antal_klienter=20, varighed=1.5, interval=0.25, antal_abonnenter=3
+        ))
+    finally:
+        server.shutdown()
+        server.server_close()
+    resultat.print_rapport()
+
+    assert resultat.antal_forespørgsler > 20
+    assert resultat.fejlrate == 0
+    # Hver abonnent ser alle fem versioner
+    assert resultat.sse_hændelser == 15
+
+    try:
+        asyncio.run(kør_belastning(vært="example.com", varighed=0.1))
+        assert False, "Belastningstest mod ekstern vært blev tilladt"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_belastningstest()
@@ -0,0 +1,80 @@
+"""
+Test af det binære resultatformat.
+"""
+
+import json
+import time
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER, generer_live_data
+from livesnapshot import Snapshotpublicering
+from binaerformat import Binærkoder, Binærudgivelse, afkod
+from deltaprotokol import byg_statisk_data, valgforbund_fra_live_data
+from mandatfordeling import KØBENHAVN_VALGFORBUND
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def _efter_bogstav(partier):
+    return sorted(partier, key=lambda p: p["bogstav"])
+
+
+def test_binærformat():
+    """Test at det binære format afkodes til samme live-data som JSON."""
+    print("="*70)
+    print("TEST: Binært format")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    data = generer_live_data(model, CSV_2021)
+    forventet = json.loads(json.dumps(data))
+    forventet["metadata"]["procent_optalt"] = round(forventet["metadata"]["procent_optalt"], 2)
+
+    koder = Binærkoder(byg_statisk_data(55, KØBENHAVN_VALGFORBUND))
+    kodet = koder.kod(data, 7)
+    version, afkodet, strengtabel = afkod(kodet)
+    assert version == 7
+    assert afkodet == forventet
+
+    # Uden strengtabel kræves klientens tabel
+    uden = koder.kod(data, 8, med_strengtabel=False)
+    assert afkod(uden, strengtabel)[1] == forventet
+    try:
+        afkod(uden)
+        assert False, "Afkodning uden strengtabel blev accepteret"
+    except ValueError:
+        pass
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    json_tid = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        koder.kod(data, 8, med_strengtabel=False)
+    binær_tid = time.perf_counter() - start
+
+    print(f"JSON:   {len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode())} bytes, "
+          f"{json_tid * 1000:.1f} µs per kodning")
+    print(f"Binær:  {len(uden)} bytes ({len(kodet)} med strengtabel), {binær_tid * 1000:.1f} µs per kodning")
+    assert len(uden) < 300
+
+    # Udgivelsen koder én gang per version og udelader kendt strengtabel
+    publicering = Snapshotpublicering()
+    udgivelse = Binærudgivelse(publicering, KØBENHAVN_VALGFORBUND)
+    assert udgivelse.hent() is None
+    publicering.publicer(data)
+    assert udgivelse.hent() == koder.kod(data, 1)
+    assert udgivelse.hent(koder.strengtabel_id) == koder.kod(data, 1, med_strengtabel=False)
+    assert udgivelse.hent(koder.strengtabel_id) is udgivelse.hent(koder.strengtabel_id)
+
+    # Uden pipelinens valgforbund aflæses de af snapshottet
+    aflæst = Binærudgivelse(publicering)
+    afkodet = afkod(aflæst.hent())[1]
+    assert afkodet["forbund"] == forventet["forbund"]
+    assert _efter_bogstav(afkodet["partier"]) == _efter_bogstav(forventet["partier"])
+    assert aflæst.hent() == Binærkoder(byg_statisk_data(55, valgforbund_fra_live_data(data))).kod(data, 1)
+
+
+if __name__ == "__main__":
+    test_binærformat()
@@ -0,0 +1,79 @@
+"""
+Test af delta-protokollen til dashboardet.
+"""
+
+import json
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER, byg_live_data
+from indberetningslog import Indberetningslog
+from genafspil_valgnat import lav_valgnat
+from livesnapshot import Snapshotpublicering
+from deltaprotokol import (
+    Deltaudgivelse, anvend_delta, byg_live_data_fra_tilstand, byg_statisk_data, valgforbund_fra_live_data
+)
+from mandatfordeling import KØBENHAVN_VALGFORBUND
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def _efter_bogstav(partier):
+    return sorted(partier, key=lambda p: p["bogstav"])
+
+
+def test_deltaprotokol():
+    """Test at statisk del + deltaer giver præcis samme data som live_data.json."""
+    print("="*70)
+    print("TEST: Delta-protokol")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    log = Indberetningslog(model)
+    publicering = Snapshotpublicering()
+    udgivelse = Deltaudgivelse(publicering, historik_længde=3, valgforbund=KØBENHAVN_VALGFORBUND)
+    aflæst = Deltaudgivelse(publicering)
+
+    assert json.loads(udgivelse.delta_json(None)) == {"til": 0}
+    assert udgivelse.statisk_json() is None
+
+    # Klienten henter fuld tilstand første gang og deltaer derefter
+    klient_version, klient_tilstand = None, None
+    for i, (valgsted, rå) in enumerate(lav_valgnat(CSV_2021, swing={"Ø": 1.3}, seed=2)[:10]):
+        log.registrer_dataframe(model._aggreger_data(rå))
+        data = byg_live_data(model, log.prediкtion(), log.antal_optalte)
+        snapshot = publicering.publicer(data)
+        if i == 0:
+            statisk = json.loads(udgivelse.statisk_json())
+            assert statisk == byg_statisk_data(55, KØBENHAVN_VALGFORBUND)
+
+        svar = json.loads(udgivelse.delta_json(klient_version))
+        assert svar["til"] == snapshot.version
+        if klient_version is None:
+            klient_tilstand = svar["fuld"]
+        else:
+            klient_tilstand = anvend_delta(klient_tilstand, svar["delta"])
+        klient_version = svar["til"]
+
+        forventet = json.loads(snapshot.json_bytes)
+        forventet["metadata"]["procent_optalt"] = round(forventet["metadata"]["procent_optalt"], 2)
+        assert byg_live_data_fra_tilstand(statisk, klient_tilstand) == forventet
+
+        # Uden pipelinens valgforbund aflæses de af snapshottet
+        aflæst_statisk = json.loads(aflæst.statisk_json())
+        assert aflæst_statisk == byg_statisk_data(55, valgforbund_fra_live_data(data))
+        genskabt = byg_live_data_fra_tilstand(aflæst_statisk, json.loads(aflæst.delta_json(None))["fuld"])
+        assert genskabt["forbund"] == forventet["forbund"]
+        assert _efter_bogstav(genskabt["partier"]) == _efter_bogstav(forventet["partier"])
+
+        if i > 0:
+            print(f"Version {klient_version}: fuld {len(snapshot.json_bytes)} bytes, "
+                  f"delta {len(udgivelse.delta_json(klient_version - 1))} bytes")
+
+    # Uden for historikken sendes hele tilstanden
+    assert "fuld" in json.loads(udgivelse.delta_json(1))
+    assert "delta" in json.loads(udgivelse.delta_json(klient_version - 1))
+    assert json.loads(udgivelse.delta_json(klient_version))["delta"] == {}
+
+
+if __name__ == "__main__":
+    test_deltaprotokol()
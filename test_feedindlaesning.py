@@ -0,0 +1,231 @@
+"""
+Test af indlæsning fra HTTP-feeds mod en lokal stand-in server.
+"""
+
+import gzip
+import socket
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER
+from indberetningslog import Indberetningslog
+from feedindlaesning import Feedindlæser
+from opdateringspipeline import Opdateringspipeline
+from genafspil_valgnat import lav_valgnat
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+class _Feedserver(ThreadingHTTPServer):
+    """Stand-in for valgnattens resultatfeed med ETag og Last-Modified."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Feedhandler)
+        self.feeds = {}
+        self.forbindelser = 0
+        self.sokler = []
+        self.svar = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def udgiv(self, sti: str, rækker: pd.DataFrame):
+        """Lægger en ny version af et feed ud."""
+        indhold = rækker.to_csv(sep=';', index=False).encode('utf-8')
+        version = len(self.svar) + time.time_ns()
+        self.feeds[sti] = (indhold, f'"{version}"', formatdate(time.time(), usegmt=True))
+
+    def url(self, sti: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{sti}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def luk_forbindelser(self):
+        """Lukker de åbne keep-alive forbindelser fra serversiden."""
+        for sokkel in self.sokler:
+            try:
+                sokkel.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.sokler = []
+
+
+class _Feedhandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.forbindelser += 1
+        self.server.sokler.append(self.connection)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        feed = self.server.feeds.get(self.path)
+        if feed is None:
+            self.server.svar.append(404)
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        indhold, etag, ændret = feed
+        if self.headers.get('If-None-Match') == etag:
+            self.server.svar.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.server.svar.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', ændret)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            indhold = gzip.compress(indhold)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(indhold)))
+        self.end_headers()
+        self.wfile.write(indhold)
+
+
+def test_betingede_forespørgsler_over_genbrugte_forbindelser():
+    """Test at uændrede feeds giver 304 og at forbindelserne genbruges."""
+    print("="*70)
+    print("TEST: Betingede forespørgsler og genbrugte forbindelser")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2}, seed=3)
+    kredse = [pd.concat([r for _, r in valgnat[i::4]]) for i in range(4)]
+
+    server = _Feedserver()
+    for i, rækker in enumerate(kredse):
+        server.udgiv(f"/kreds/{i}.csv", rækker)
+    log = Indberetningslog(model)
+    indlæser = Feedindlæser([server.url(f"/kreds/{i}.csv") for i in range(4)], log, maks_samtidige=2)
+    try:
+        start = time.perf_counter()
+        assert indlæser.indlæs(1.0) == len(valgnat)
+        første = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(5):
+            assert indlæser.indlæs(2.0 + i) == 0
+        uændret = (time.perf_counter() - start) / 5
+
+        # Én ny version af ét feed: kun det hentes og registreres igen
+        rettet = kredse[1].copy()
+        rettet.loc[rettet.index[0], 'Stemmetal'] += 100
+        server.udgiv("/kreds/1.csv", rettet)
+        assert indlæser.indlæs(10.0) == 1
+    finally:
+        indlæser.luk()
+        server.stop()
+
+    print(f"Første gennemløb {første * 1000:.1f} ms, uændret {uændret * 1000:.1f} ms, "
+          f"{server.forbindelser} forbindelser til {len(server.svar)} forespørgsler")
+    assert server.forbindelser <= 2
+    assert server.svar.count(304) == 4 * 5 + 3
+    assert indlæser.statistik['uændrede'] == 4 * 5 + 3
+
+    separat = Indberetningslog(model)
+    separat.registrer_dataframe(model._aggreger_data(pd.concat([kredse[0], rettet, kredse[2], kredse[3]])))
+    assert np.array_equal(log.nuværende_sum, separat.nuværende_sum)
+    assert log.antal_optalte == separat.antal_optalte
+
+
+def test_fejlende_feed_og_lukkede_forbindelser():
+    """Test at et fejlende feed ikke stopper de andre, og at lukkede forbindelser genåbnes."""
+    print("="*70)
+    print("TEST: Fejlende feed og lukkede forbindelser")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, seed=4)[:10]
+
+    server = _Feedserver()
+    server.udgiv("/feed.csv", pd.concat([r for _, r in valgnat]))
+    log = Indberetningslog(model)
+    indlæser = Feedindlæser([server.url("/mangler.csv"), server.url("/feed.csv")], log)
+    try:
+        assert indlæser.indlæs(1.0) == 10
+        assert indlæser.statistik['fejl'] == 1
+
+        # Serveren lukker de ledige forbindelser (som efter en keep-alive timeout):
+        # begge genåbnes, og kun det manglende feed fejler
+        server.luk_forbindelser()
+        server.udgiv("/feed.csv", pd.concat([r for _, r in lav_valgnat(CSV_2021, seed=4)[:12]]))
+        assert indlæser.indlæs(2.0) == 2
+        assert log.antal_optalte == 12
+        assert indlæser.statistik['fejl'] == 2
+        assert server.forbindelser == 4
+    finally:
+        indlæser.luk()
+        server.stop()
+
+    # luk() kan kaldes igen, og en lukket indlæser indlæser ikke mere
+    indlæser.luk()
+    assert indlæser.indlæs() == 0
+
+    try:
+        Feedindlæser("/tmp/live.csv", log)
+        assert False, "En filsti blev accepteret som feed"
+    except ValueError:
+        pass
+
+
+def test_forsinkelse_fra_feed_til_prognose():
+    """Test at en ny feedversion er publiceret som prognose inden for få hundrede ms."""
+    print("="*70)
+    print("TEST: Forsinkelse fra feed til prognose")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, swing={"A": 0.85}, seed=5)
+
+    server = _Feedserver()
+    server.udgiv("/feed.csv", pd.concat([r for _, r in valgnat[:5]]))
+    publiceret = []
+    pipeline = Opdateringspipeline(
+        model, server.url("/feed.csv"), None, interval=0.05,
+        ved_publicering=lambda data, version, forsinkelse: publiceret.append(time.perf_counter())
+    )
+    tråd = threading.Thread(target=pipeline.kør, daemon=True)
+    tråd.start()
+    forsinkelser = []
+    try:
+        for antal in (10, 20, 30, 40, len(valgnat)):
+            while pipeline.publiceret_version < pipeline.version or not publiceret:
+                time.sleep(0.005)
+            før = len(publiceret)
+            udgivet = time.perf_counter()
+            server.udgiv("/feed.csv", pd.concat([r for _, r in valgnat[:antal]]))
+            grænse = time.time() + 5
+            while len(publiceret) == før and time.time() < grænse:
+                time.sleep(0.002)
+            forsinkelser.append(publiceret[-1] - udgivet)
+            assert pipeline.log.antal_optalte == antal
+    finally:
+        pipeline.stop()
+        tråd.join(5)
+        server.stop()
+
+    print(f"Fra ny feedversion til publiceret prognose: "
+          f"median {np.median(forsinkelser) * 1000:.0f} ms, max {max(forsinkelser) * 1000:.0f} ms")
+    assert max(forsinkelser) < 0.5
+
+
+if __name__ == "__main__":
+    test_betingede_forespørgsler_over_genbrugte_forbindelser()
+    test_fejlende_feed_og_lukkede_forbindelser()
+    test_forsinkelse_fra_feed_til_prognose()
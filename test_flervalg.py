@@ -0,0 +1,144 @@
+"""
+Test af fælles indlæsning til flere valg.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import flervalg
+from flervalg import Flervalgspipeline, Valgopsætning
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER
+from indberetningslog import Indberetningslog
+from mandatfordeling import Mandatfordeling, KØBENHAVN_VALGFORBUND, uden_valgforbund
+from genafspil_valgnat import lav_valgnat
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def _vent(pipelines, slut: float = 5.0):
+    """Venter til alle valg har publiceret deres seneste version."""
+    grænse = time.time() + slut
+    while time.time() < grænse and any(p.publiceret_version < p.version for p in pipelines):
+        time.sleep(0.01)
+
+
+def test_flere_valg_fra_samme_filer():
+    """Test at hver fil parses én gang og at hvert valg får sine egne stemmer og mandater."""
+    print("="*70)
+    print("TEST: Flere valg fra samme indlæsning")
+    print("="*70)
+
+    kommunal = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    regional = Valgmodel(CSV_2021)
+    kommunal_valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2}, seed=5)[:25]
+    regional_valgnat = dict(lav_valgnat(CSV_2021, swing={"A": 1.3, "V": 0.8}, seed=6))
+
+    with tempfile.TemporaryDirectory() as mappe:
+        valgsteder = os.path.join(mappe, "valgsteder")
+        os.mkdir(valgsteder)
+        for i, (valgsted, rækker) in enumerate(kommunal_valgnat):
+            # Et par filer uden Valg-kolonne hører til det første valg
+            if i % 10 == 0:
+                rækker.to_csv(os.path.join(valgsteder, f"{i:03d}.csv"), sep=';', index=False)
+                continue
+            pd.concat([
+                rækker.assign(Valg="kommunal"),
+                regional_valgnat[valgsted].assign(Valg="regional"),
+            ]).to_csv(os.path.join(valgsteder, f"{i:03d}.csv"), sep=';', index=False)
+
+        # Tæl hvor mange gange filerne parses
+        kald = []
+        original = flervalg.parse_valgstedsfil_per_valg
+
+        def tællende(sti, standard_valg):
+            kald.append(sti)
+            return original(sti, standard_valg)
+
+        flervalg.parse_valgstedsfil_per_valg = tællende
+        try:
+            pipeline = Flervalgspipeline(valgsteder, {
+                "kommunal": Valgopsætning(kommunal, Mandatfordeling(KØBENHAVN_VALGFORBUND), 55,
+                                          os.path.join(mappe, "live_data.json")),
+                "regional": Valgopsætning(regional, Mandatfordeling(uden_valgforbund(regional.forrige_valg_samlet)),
+                                          41, os.path.join(mappe, "live_data_regional.json")),
+            }, antal_arbejdere=1)
+            pipeline.start()
+            try:
+                start = time.perf_counter()
+                antal = pipeline.indlæs()
+                varighed = time.perf_counter() - start
+                _vent(pipeline.pipelines.values())
+            finally:
+                pipeline.stop()
+        finally:
+            flervalg.parse_valgstedsfil_per_valg = original
+
+        print(f"{len(kald)} filer parset én gang for {len(pipeline.pipelines)} valg på {varighed * 1000:.0f} ms")
+        assert len(kald) == len(kommunal_valgnat)
+        assert antal == {"kommunal": 25, "regional": 22}
+
+        # Hvert valg har de samme summer som en separat indlæsning af valgets rækker
+        for navn, model, rækker in (
+            ("kommunal", kommunal, [r for _, r in kommunal_valgnat]),
+            ("regional", regional, [regional_valgnat[v] for i, (v, _) in enumerate(kommunal_valgnat) if i % 10]),
+        ):
+            separat = Indberetningslog(model)
+            separat.registrer_dataframe(model._aggreger_data(pd.concat(rækker)))
+            log = pipeline.pipelines[navn].log
+            nuværende = dict(zip(log.partier, log.nuværende_sum))
+            for parti, stemmer in zip(separat.partier, separat.nuværende_sum):
+                assert nuværende.get(parti, 0) == stemmer
+            assert log.antal_optalte == separat.antal_optalte
+
+        # Hvert valg fordeler sit eget antal mandater
+        for navn, fil, mandater in (("kommunal", "live_data.json", 55), ("regional", "live_data_regional.json", 41)):
+            with open(os.path.join(mappe, fil), encoding='utf-8') as f:
+                data = json.load(f)
+            assert data["metadata"]["total_mandater"] == mandater
+            assert sum(p["mandater"] for p in data["partier"]) == mandater
+        print(f"Regional: {len(data['forbund'])} partier uden valgforbund")
+
+
+def test_flere_valg_fra_live_csv():
+    """Test at en samlet live CSV med Valg-kolonne læses én gang og fordeles på valgene."""
+    print("="*70)
+    print("TEST: Flere valg fra én live CSV")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, seed=7)[:10]
+    rækker = pd.concat([r for _, r in valgnat])
+
+    with tempfile.TemporaryDirectory() as mappe:
+        live_csv = os.path.join(mappe, "live.csv")
+        pd.concat([rækker.assign(Valg="kommunal"), rækker.assign(Valg="regional"),
+                   rækker.assign(Valg="folkeafstemning")]).to_csv(live_csv, sep=';', index=False)
+
+        pipeline = Flervalgspipeline(live_csv, {
+            "kommunal": Valgopsætning(model, Mandatfordeling(KØBENHAVN_VALGFORBUND), 55),
+            "regional": Valgopsætning(model, Mandatfordeling(uden_valgforbund(model.forrige_valg_samlet)), 41),
+        })
+        assert pipeline.indlæs() == {"kommunal": 10, "regional": 10}
+        assert pipeline.indlæs() == {}
+
+        kommunal, regional = pipeline.pipelines["kommunal"], pipeline.pipelines["regional"]
+        assert np.array_equal(kommunal.log.nuværende_sum, regional.log.nuværende_sum)
+        assert kommunal.version == regional.version == 1
+        pipeline.stop()
+
+    try:
+        Flervalgspipeline(live_csv, {})
+        assert False, "Ingen valg blev accepteret"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_flere_valg_fra_samme_filer()
+    test_flere_valg_fra_live_csv()
@@ -0,0 +1,66 @@
+"""
+Test af den versionerede indberetningslog.
+"""
+
+from valgmodel import Valgmodel
+from indberetningslog import Indberetningslog
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def test_rettelser_og_tilbagerulning():
+    """Test rettelser, forældede versioner og genskabelse af tidligere tilstand."""
+    print("="*70)
+    print("TEST: Indberetningslog")
+    print("="*70)
+
+    model = Valgmodel(
+        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
+        nye_partier=NYE_PARTIER
+    )
+    matrix = model._beregn_valgsted_matrix(model.forrige_valg_data)
+    valgsteder = list(matrix.index[:20])
+
+    log = Indberetningslog(model, snapshot_interval=7)
+
+    # Første ti valgsteder indberettes med Ø fordoblet
+    for i, valgsted in enumerate(valgsteder[:10]):
+        stemmer = matrix.loc[valgsted].to_dict()
+        stemmer['Ø'] *= 2
+        log.registrer(valgsted, stemmer, tidspunkt=float(i))
+
+    prediкtion_før = log.prediкtion()
+
+    # Herefter rettes de ti valgsteder, og ti nye kommer til
+    for i, valgsted in enumerate(valgsteder[:10]):
+        log.registrer(valgsted, matrix.loc[valgsted].to_dict(), tidspunkt=10.0 + i)
+    for i, valgsted in enumerate(valgsteder[10:]):
+        log.registrer(valgsted, matrix.loc[valgsted].to_dict(), tidspunkt=20.0 + i)
+
+    # En forældet version ignoreres
+    assert not log.registrer(valgsteder[0], {'A': 1}, tidspunkt=30.0, version=1)
+
+    print(f"Hændelser i loggen: {len(log.hændelser)}")
+    assert log.antal_optalte == 20
+    assert len(log.hændelser) == 30
+
+    # Summerne svarer til en fuld genberegning
+    nuværende_data = model.forrige_valg_data
+    forventet = model.prediкer(nuværende_data, valgsteder)
+    for parti, pct in forventet.items():
+        assert abs(log.prediкtion()[parti] - pct) < 1e-9
+
+    # Tilstanden før rettelserne kan genskabes
+    genskabt = log.prediкtion(tidspunkt=9.5)
+    for parti, pct in prediкtion_før.items():
+        assert abs(genskabt[parti] - pct) < 1e-9
+
+    _, _, antal = log.tilstand_ved(4.0)
+    assert antal == 5
+
+    model.print_resultat(genskabt, "Prediкtion genskabt før rettelserne")
+
+
+if __name__ == "__main__":
+    test_rettelser_og_tilbagerulning()
@@ -0,0 +1,109 @@
+"""
+Test af søjleeksporten til Parquet.
+"""
+
+import os
+import tempfile
+import time
+
+import pytest
+
+import kolonneeksport
+from kolonneeksport import Kolonneeksport, åbn_eksport, læs
+from valgmodel import Valgmodel
+from opdateringspipeline import Opdateringspipeline
+from genafspil_valgnat import lav_valgnat, genafspil
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def test_kolonneeksport():
+    """Test at valgsteder og prognoser kan læses tilbage fra eksporten under og efter natten."""
+    print("="*70)
+    print("TEST: Kolonneeksport")
+    print("="*70)
+
+    pytest.importorskip("pyarrow")
+
+    with tempfile.TemporaryDirectory() as mappe:
+        model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+        valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2}, seed=2)
+        live_csv = os.path.join(mappe, "live.csv")
+        eksport = Kolonneeksport(os.path.join(mappe, "eksport"), række_gruppe=500)
+
+        pipeline = Opdateringspipeline(model, live_csv, output_json=None, kolonneeksport=eksport)
+        pipeline.start()
+        try:
+            for antal in (10, 20, 30):
+                genafspil(valgnat[:antal], live_csv=live_csv, hastighed=0, vis_status=False)
+                os.utime(live_csv, ns=(0, antal))
+                assert pipeline.indlæs()
+                slut = time.time() + 5
+                while pipeline.publiceret_version < pipeline.version and time.time() < slut:
+                    time.sleep(0.01)
+        finally:
+            pipeline.stop()
+
+        # Fulde rækkegrupper kan læses mens eksporten kører
+        delfiler = os.listdir(os.path.join(mappe, "eksport", "indberetninger"))
+        assert delfiler and not any(navn.startswith('.del') for navn in delfiler)
+        eksport.luk()
+
+        start = time.perf_counter()
+        forrige = læs(os.path.join(mappe, "eksport"), "forrige_valg")
+        indberetninger = læs(os.path.join(mappe, "eksport"), "indberetninger")
+        prognoser = læs(os.path.join(mappe, "eksport"), "prognoser")
+        varighed = time.perf_counter() - start
+        print(f"{len(forrige)} + {len(indberetninger)} + {len(prognoser)} rækker læst på {varighed * 1000:.0f} ms")
+
+        # Valgsted og parti er kategorier
+        for tabel in (forrige, indberetninger, prognoser):
+            assert str(tabel['parti'].dtype) == 'category'
+        assert str(indberetninger['valgsted'].dtype) == 'category'
+
+        # Forrige valg svarer til modellens matrix
+        matrix = model._beregn_valgsted_matrix(model.forrige_valg_data)
+        assert len(forrige) == matrix.size
+        assert forrige['stemmer'].sum() == int(matrix.to_numpy().sum())
+
+        # Indberetningerne giver de samme summer som loggen
+        valgsteder, _, stemmer = pipeline.log.valgstedstilstand()
+        assert indberetninger['valgsted'].nunique() == len(valgsteder) == 30
+        summer = indberetninger.groupby('parti', observed=True)['stemmer'].sum()
+        for i, parti in enumerate(pipeline.log.partier):
+            assert summer.get(parti, 0) == round(stemmer[:, i].sum())
+
+        # Én prognose per publiceret version med den publicerede fordeling
+        assert sorted(prognoser['version'].unique()) == [1, 2, 3]
+        seneste = prognoser[prognoser['version'] == 3]
+        data = pipeline.publicering.seneste.data
+        assert dict(zip(seneste['parti'], seneste['mandater'])) == {
+            p['bogstav']: p['mandater'] for p in data['partier']
+        }
+        assert seneste['mandater'].sum() == 55
+
+
+def test_eksport_uden_pyarrow():
+    """Test at eksporten slås fra uden pyarrow, men valgnatten kører videre."""
+    print("="*70)
+    print("TEST: Kolonneeksport uden pyarrow")
+    print("="*70)
+
+    assert åbn_eksport(None) is None
+
+    pa, pq = kolonneeksport.pa, kolonneeksport.pq
+    kolonneeksport.pa = kolonneeksport.pq = None
+    try:
+        with tempfile.TemporaryDirectory() as mappe:
+            assert åbn_eksport(mappe) is None
+            assert not os.listdir(mappe)
+    finally:
+        kolonneeksport.pa, kolonneeksport.pq = pa, pq
+
+
+if __name__ == "__main__":
+    test_kolonneeksport()
+    test_eksport_uden_pyarrow()
@@ -0,0 +1,73 @@
+"""
+Test af bootstrap-konfidensintervaller på prediкtionen.
+"""
+
+import time
+
+import numpy as np
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER, byg_live_data
+from indberetningslog import Indberetningslog
+from genafspil_valgnat import lav_valgnat
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def test_konfidensinterval():
+    """Test at intervallerne omslutter prediкtionen, snævres ind og er hurtige nok til hver opdatering."""
+    print("="*70)
+    print("TEST: Bootstrap-konfidensintervaller")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    log = Indberetningslog(model)
+    valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2, "A": 0.9}, seed=3)
+
+    bredder = {}
+    for i, (valgsted, rå) in enumerate(valgnat, start=1):
+        log.registrer_dataframe(model._aggreger_data(rå))
+        if i not in (10, 40):
+            continue
+
+        nuværende, forrige = log.valgstedsmatricer()
+        assert np.allclose(nuværende.sum(axis=0), log.nuværende_sum)
+        assert np.allclose(forrige.sum(axis=0), log.forrige_sum)
+
+        prediкtion = log.prediкtion()
+        start = time.perf_counter()
+        interval = model.bootstrap_interval(nuværende, forrige, log.indeks, antal=1000, seed=0)
+        varighed = time.perf_counter() - start
+        print(f"{i} valgsteder: 1000 gentagelser på {varighed * 1000:.1f} ms")
+
+        assert set(interval.lav) == set(prediкtion)
+        for parti, pct in prediкtion.items():
+            assert interval.lav[parti] <= interval.høj[parti]
+            assert interval.lav[parti] <= pct <= interval.høj[parti]
+        bredder[i] = np.mean([interval.høj[p] - interval.lav[p] for p in prediкtion])
+        print(f"  gennemsnitlig bredde {bredder[i]:.2f} procentpoint")
+
+        # Samme seed giver samme intervaller
+        igen = model.bootstrap_interval(nuværende, forrige, log.indeks, antal=1000, seed=0)
+        assert np.array_equal(igen.lav.værdier, interval.lav.værdier)
+
+        data = byg_live_data(model, prediкtion, log.antal_optalte, konfidensinterval=interval)
+        ki = data["metadata"]["konfidensinterval"]
+        assert ki["niveau"] == 0.9 and ki["antal"] == 1000
+        for parti in data["partier"]:
+            lav, høj = ki["procent"][parti["bogstav"]]
+            assert lav <= høj
+
+    # Flere optalte valgsteder giver snævrere intervaller
+    assert bredder[40] < bredder[10]
+
+    for niveau in (0, 1, 1.5):
+        try:
+            model.bootstrap_interval(nuværende, forrige, log.indeks, niveau=niveau)
+            assert False, f"Niveau {niveau} blev accepteret"
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_konfidensinterval()
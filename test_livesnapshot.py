@@ -0,0 +1,76 @@
+"""
+Test af låsefri publicering af live-snapshots.
+"""
+
+import json
+import threading
+
+from livesnapshot import LiveSnapshot, Snapshotpublicering
+
+
+def test_snapshot_er_uforanderligt():
+    """Test at et snapshot hverken kan ændres eller ændrer sig med sine input-data."""
+    print("="*70)
+    print("TEST: Uforanderligt snapshot")
+    print("="*70)
+
+    data = {"metadata": {"total_mandater": 55}, "partier": [{"bogstav": "Ø", "mandater": 15}]}
+    snapshot = LiveSnapshot(1, data)
+
+    # Ændringer i de oprindelige data slår ikke igennem
+    data["partier"][0]["mandater"] = 99
+    assert snapshot.data["partier"][0]["mandater"] == 15
+    assert json.loads(snapshot.json_bytes)["partier"][0]["mandater"] == 15
+
+    for ændring in (
+        lambda: setattr(snapshot, 'version', 2),
+        lambda: snapshot.data.__setitem__("metadata", None),
+    ):
+        try:
+            ændring()
+            assert False, "Snapshot blev ændret"
+        except (AttributeError, TypeError):
+            pass
+
+
+def test_læsere_ser_altid_hele_versioner():
+    """Test at samtidige læsere kun ser konsistente versioner."""
+    print("="*70)
+    print("TEST: Samtidige læsere")
+    print("="*70)
+
+    publicering = Snapshotpublicering()
+    stop = threading.Event()
+    fejl = []
+    sete_versioner = set()
+
+    def læser():
+        while not stop.is_set():
+            snapshot = publicering.seneste
+            if snapshot.version == 0:
+                continue
+            indhold = json.loads(snapshot.json_bytes)
+            if indhold["version"] != snapshot.version or snapshot.data["version"] != snapshot.version:
+                fejl.append(snapshot.version)
+            sete_versioner.add(snapshot.version)
+
+    læsere = [threading.Thread(target=læser) for _ in range(8)]
+    for tråd in læsere:
+        tråd.start()
+
+    for version in range(1, 501):
+        snapshot = publicering.publicer({"version": version, "partier": list(range(50))})
+        assert snapshot.version == version
+
+    stop.set()
+    for tråd in læsere:
+        tråd.join()
+
+    print(f"Versioner set af læserne: {len(sete_versioner)}")
+    assert not fejl
+    assert publicering.seneste.version == 500
+
+
+if __name__ == "__main__":
+    test_snapshot_er_uforanderligt()
+    test_læsere_ser_altid_hele_versioner()
@@ -0,0 +1,103 @@
+"""
+Test af indlæsning af én fil per valgsted.
+"""
+
+import glob
+import os
+import tempfile
+
+import pandas as pd
+
+from valgmodel import Valgmodel
+from indberetningslog import Indberetningslog
+from mappeindlaesning import Mappeindlæser
+from genafspil_valgnat import lav_valgnat, genafspil
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def test_mappeindlæsning():
+    """Test at valgstedsfiler giver samme prediкtion som den samlede CSV."""
+    print("="*70)
+    print("TEST: Mappeindlæsning")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2, "A": 0.9}, seed=1)
+
+    with tempfile.TemporaryDirectory() as mappe:
+        genafspil(valgnat[:30], mappe=mappe, hastighed=0, vis_status=False)
+
+        indlæser = Mappeindlæser(mappe, Indberetningslog(model), antal_arbejdere=2)
+        try:
+            assert indlæser.indlæs() == 30
+            assert indlæser.indlæs() == 0
+
+            # Samme prediкtion som ved at læse alle filerne med pandas
+            filer = glob.glob(os.path.join(mappe, "*.csv"))
+            nuværende_data = model._aggreger_data(
+                pd.concat([pd.read_csv(f, sep=';') for f in filer])
+            )
+            forventet = model.prediкer(nuværende_data, list(nuværende_data['Valgsted'].unique()))
+            prediкtion = indlæser.log.prediкtion()
+            for parti, pct in forventet.items():
+                assert abs(prediкtion[parti] - pct) < 1e-9
+
+            # En genudgivet fil med rettede tal giver én rettelse
+            sti = sorted(filer)[0]
+            rettet = pd.read_csv(sti, sep=';')
+            rettet.loc[0, 'Stemmetal'] += 100
+            rettet.to_csv(sti, sep=';', index=False)
+            os.utime(sti, (0, 1))
+
+            assert indlæser.indlæs() == 1
+            assert indlæser.log.antal_optalte == 30
+            print(f"Hændelser i loggen: {len(indlæser.log.hændelser)}")
+        finally:
+            indlæser.luk()
+
+
+def test_ulæselig_fil_springes_over():
+    """Test at en halvt skrevet fil ikke taber resten af gennemløbet og prøves igen."""
+    print("="*70)
+    print("TEST: Ulæselig valgstedsfil")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, seed=2)[:10]
+
+    with tempfile.TemporaryDirectory() as mappe:
+        genafspil(valgnat, mappe=mappe, hastighed=0, vis_status=False)
+        filer = sorted(glob.glob(os.path.join(mappe, "*.csv")))
+
+        # Den midterste fil er afbrudt midt i en partirække (før Stemmetal)
+        halv = filer[4]
+        with open(halv, encoding='utf-8') as f:
+            indhold = f.read()
+        linjer = indhold.splitlines()
+        i = next(i for i in range(len(linjer) // 2, len(linjer)) if linjer[i].split(';')[1])
+        with open(halv, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linjer[:i] + [linjer[i].rsplit(';', 1)[0] + ';']))
+
+        indlæser = Mappeindlæser(mappe, Indberetningslog(model), antal_arbejdere=2)
+        try:
+            assert indlæser.indlæs() == 9
+            assert halv not in indlæser.sete_filer
+            assert len(indlæser.sete_filer) == 9
+
+            # Filen prøves igen og kommer med, når den er skrevet færdig
+            with open(halv, 'w', encoding='utf-8') as f:
+                f.write(indhold)
+            assert indlæser.indlæs() == 1
+            assert indlæser.log.antal_optalte == 10
+            assert indlæser.indlæs() == 0
+        finally:
+            indlæser.luk()
+
+
+if __name__ == "__main__":
+    test_mappeindlæsning()
+    test_ulæselig_fil_springes_over()
@@ -0,0 +1,129 @@
+"""
+Test af den trinopdelte opdateringspipeline.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from valgmodel import Valgmodel
+from opdateringspipeline import Opdateringspipeline, Senestepost, Version
+from genafspil_valgnat import lav_valgnat, genafspil
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def test_senestepost_sammenlægger():
+    """Test at kun den nyeste version hentes når trinet er bagud."""
+    print("="*70)
+    print("TEST: Sammenlægning af versioner")
+    print("="*70)
+
+    post = Senestepost()
+    for nummer in range(1, 6):
+        post.læg(Version(nummer, 0.0, None))
+
+    assert post.hent(timeout=0).nummer == 5
+    assert post.hent(timeout=0) is None
+    assert post.antal_sammenlagt == 4
+
+
+def test_pipeline_publicerer_nyeste_version():
+    """Test at pipelinen publicerer den nyeste version af en live CSV."""
+    print("="*70)
+    print("TEST: Opdateringspipeline")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, swing={"Ø": 1.2}, seed=1)
+
+    with tempfile.TemporaryDirectory() as mappe:
+        live_csv = os.path.join(mappe, "live.csv")
+        output_json = os.path.join(mappe, "live_data.json")
+
+        publiceret = []
+        pipeline = Opdateringspipeline(
+            model, live_csv, output_json,
+            ved_publicering=lambda data, version, forsinkelse: publiceret.append(version.nummer)
+        )
+
+        # Tre indlæsninger i træk, inden beregningen er startet
+        for antal in (10, 20, 30):
+            genafspil(valgnat[:antal], live_csv=live_csv, hastighed=0, vis_status=False)
+            os.utime(live_csv, ns=(0, antal))
+            assert pipeline.indlæs()
+
+        assert not pipeline.indlæs()
+
+        pipeline.start()
+        try:
+            slut = time.time() + 5
+            while pipeline.publiceret_version < 3 and time.time() < slut:
+                time.sleep(0.01)
+        finally:
+            pipeline.stop()
+
+        # Kun den nyeste version blev beregnet og publiceret
+        assert publiceret == [3]
+        with open(output_json, encoding='utf-8') as f:
+            data = json.load(f)
+        assert data['metadata']['antal_optalte_valgsteder'] == 30
+        print(f"Publicerede versioner: {publiceret}")
+
+
+def test_genstart_fra_kontrolpunkt():
+    """Test at en genstartet pipeline genoptager fra kontrolpunktet og kun indlæser nye filer."""
+    print("="*70)
+    print("TEST: Genstart fra kontrolpunkt")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    valgnat = lav_valgnat(CSV_2021, swing={"A": 0.8}, seed=3)
+
+    with tempfile.TemporaryDirectory() as mappe:
+        valgsteder = os.path.join(mappe, "valgsteder")
+        os.makedirs(valgsteder)
+        kontrolpunkt = os.path.join(mappe, "kontrolpunkt.npz")
+        genafspil(valgnat[:20], mappe=valgsteder, hastighed=0, vis_status=False)
+
+        pipeline = Opdateringspipeline(model, valgsteder, None, kontrolpunkt=kontrolpunkt)
+        assert pipeline.indlæs()
+        pipeline._publicer(pipeline._beregn(pipeline.til_beregning.hent(timeout=0)))
+        pipeline.gem_kontrolpunkt()
+        pipeline.stop()
+        før = pipeline.publicering.seneste
+
+        # Nye filer mens processen er nede
+        genafspil(valgnat[20:30], mappe=valgsteder, hastighed=0, vis_status=False)
+
+        start = time.perf_counter()
+        genstartet = Opdateringspipeline(model, valgsteder, None, kontrolpunkt=kontrolpunkt)
+        genoptaget = time.perf_counter() - start
+        print(f"Genoptaget på {genoptaget * 1000:.1f} ms")
+
+        # Den seneste version er publiceret igen med samme nummer
+        assert genstartet.publicering.seneste.version == før.version
+        assert genstartet.publicering.seneste.json_bytes == før.json_bytes
+        assert genstartet.log.antal_optalte == 20
+
+        # Kun de ti nye filer indlæses
+        assert genstartet.indlæser.indlæs() == 10
+        assert genstartet.log.antal_optalte == 30
+
+        frisk = Opdateringspipeline(model, valgsteder, None)
+        frisk.indlæs()
+        forventet = frisk.log.prediкtion()
+        for parti, pct in genstartet.log.prediкtion().items():
+            assert abs(pct - forventet[parti]) < 1e-9
+        genstartet.stop()
+        frisk.stop()
+
+
+if __name__ == "__main__":
+    test_senestepost_sammenlægger()
+    test_pipeline_publicerer_nyeste_version()
+    test_genstart_fra_kontrolpunkt()
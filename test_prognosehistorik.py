@@ -0,0 +1,76 @@
+"""
+Test af tidsserien over publicerede prognoser.
+"""
+
+import os
+import tempfile
+
+from prognosehistorik import Prognosehistorik
+from mandatfordeling import KØBENHAVN_VALGFORBUND
+
+
+def _data(i):
+    return {
+        "metadata": {"procent_optalt": i * 2.5},
+        "partier": [
+            {"bogstav": "Ø", "procent": 20.0 + i / 10, "mandater": 11 + i % 3},
+            {"bogstav": "A", "procent": 18.5, "mandater": 10},
+        ]
+    }
+
+
+def test_prognosehistorik():
+    """Test tilføjelse, intervaller fra ring og fil, genåbning og læsning fra anden instans."""
+    print("="*70)
+    print("TEST: Prognosehistorik")
+    print("="*70)
+
+    with tempfile.TemporaryDirectory() as mappe:
+        sti = os.path.join(mappe, "prognoser.bin")
+        try:
+            Prognosehistorik(sti)
+            assert False, "En ny historik uden partier blev oprettet"
+        except ValueError:
+            pass
+
+        partier = [p for forbund in KØBENHAVN_VALGFORBUND.values() for p in forbund]
+        historik = Prognosehistorik(sti, partier, ring_størrelse=8)
+        læser = Prognosehistorik(sti)
+        assert læser.partier == partier
+        assert len(historik.hent()) == 0
+
+        for i in range(30):
+            historik.tilføj(_data(i), version=i + 1, tidspunkt=1000.0 + i)
+
+        alle = historik.hent()
+        assert list(alle['version']) == list(range(1, 31))
+        ø = historik.parti_index["Ø"]
+        assert alle['mandater'][5, ø] == 11 + 5 % 3
+
+        # Seneste poster fra ringen, ældre fra filen - samme resultat
+        assert list(historik.hent(fra=1025.0)['version']) == [26, 27, 28, 29, 30]
+        assert list(historik.hent(fra=1002.0, til=1004.0)['version']) == [3, 4, 5]
+
+        udtyndet = historik.hent(maks_punkter=5)
+        assert len(udtyndet) == 5 and udtyndet['version'][-1] == 30
+
+        # En anden instans (f.eks. en serverproces) henter nye poster
+        assert læser.opdater() == 30
+        assert list(læser.hent(fra=1028.0)['version']) == [29, 30]
+
+        data = historik.som_json(fra=1029.0)
+        print(f"Søjleform: {data['tidspunkt']}, Ø: {data['procent']['Ø']}")
+        assert data['procent']['Ø'] == [22.9]
+        historik.luk()
+
+        # En halvt skrevet post skæres væk ved genåbning
+        with open(sti, 'ab') as f:
+            f.write(b'\0' * 5)
+        genåbnet = Prognosehistorik(sti, ring_størrelse=8)
+        assert genåbnet.antal == 30
+        assert list(genåbnet.hent(fra=1027.0)['version']) == [28, 29, 30]
+        print(f"Post størrelse: {genåbnet.dtype.itemsize} bytes")
+
+
+if __name__ == "__main__":
+    test_prognosehistorik()
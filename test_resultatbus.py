@@ -0,0 +1,74 @@
+"""
+Test af resultatbussen i delt hukommelse.
+"""
+
+import json
+import multiprocessing
+import os
+
+from resultatbus import Resultatbus
+
+
+def _læs_i_anden_proces(navn, kø):
+    """Tilslutter fra en anden proces og venter på version 3."""
+    bus = Resultatbus.tilslut(navn)
+    try:
+        sidste_sekvens = 0
+        while True:
+            if bus.ny_version(sidste_sekvens):
+                sidste_sekvens, version, indhold = bus.læs()
+                if version == 3:
+                    kø.put(json.loads(indhold))
+                    return
+    finally:
+        bus.luk()
+
+
+def test_resultatbus():
+    """Test at forbrugere ser hele versioner og opdager nye via sekvensnummeret."""
+    print("="*70)
+    print("TEST: Resultatbus")
+    print("="*70)
+
+    navn = f"valgmodel_test_{os.getpid()}"
+    bus = Resultatbus.opret(navn, kapacitet=4096)
+    try:
+        læser = Resultatbus.tilslut(navn)
+        assert læser.læs() == (0, 0, None)
+        assert not læser.ny_version(0)
+
+        sekvens = bus.skriv(b'{"version":1}', 1)
+        assert læser.ny_version(0)
+        assert læser.læs() == (sekvens, 1, b'{"version":1}')
+        assert not læser.ny_version(sekvens)
+
+        # Visning uden kopi er gyldig indtil næste skrivning
+        sekvens, version, view = læser.læs_uden_kopi()
+        assert bytes(view) == b'{"version":1}'
+        bus.skriv(b'{"version":2}', 2)
+        assert not læser.stadig_gyldig(sekvens)
+        view.release()
+        læser.luk()
+
+        try:
+            bus.skriv(b'x' * 5000, 3)
+            assert False, "For stort indhold blev accepteret"
+        except ValueError:
+            pass
+
+        # En anden proces læser samme segment
+        kø = multiprocessing.Queue()
+        proces = multiprocessing.Process(target=_læs_i_anden_proces, args=(navn, kø))
+        proces.start()
+        bus.skriv(json.dumps({"version": 3, "partier": ["Ø", "A"]}).encode(), 3)
+        resultat = kø.get(timeout=10)
+        proces.join(timeout=10)
+
+        print(f"Læst i anden proces: {resultat}")
+        assert resultat["partier"] == ["Ø", "A"]
+    finally:
+        bus.luk()
+
+
+if __name__ == "__main__":
+    test_resultatbus()
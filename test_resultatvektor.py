@@ -0,0 +1,84 @@
+"""
+Test af resultatvektorer gennem prediкtion, mandatfordeling og JSON.
+"""
+
+import time
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER, byg_live_data
+from indberetningslog import Indberetningslog
+from genafspil_valgnat import lav_valgnat
+from mandatfordeling import Mandatfordeling, KØBENHAVN_VALGFORBUND
+from resultatvektor import Partiindeks, Resultatvektor
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def test_resultatvektor():
+    """Test at vektorerne giver præcis samme resultat som dicts."""
+    print("="*70)
+    print("TEST: Resultatvektorer")
+    print("="*70)
+
+    # Dict-visningen
+    indeks = Partiindeks(["A", "B", "C"])
+    vektor = Resultatvektor.fra_dict({"C": 2.5, "A": 1.0}, indeks)
+    assert vektor == {"A": 1.0, "C": 2.5}
+    assert list(vektor) == ["A", "C"]
+    assert "B" not in vektor and vektor.get("B", 0) == 0
+    assert vektor.som_dict() == {"A": 1.0, "C": 2.5}
+    try:
+        Resultatvektor(indeks, vektor.værdier[:2])
+        assert False, "Forkert antal værdier blev accepteret"
+    except ValueError:
+        pass
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    log = Indberetningslog(model)
+    mf = Mandatfordeling(KØBENHAVN_VALGFORBUND)
+
+    for i, (valgsted, rå) in enumerate(lav_valgnat(CSV_2021, swing={"Ø": 1.2, "A": 0.9}, seed=4)):
+        log.registrer_dataframe(model._aggreger_data(rå))
+        if i % 10:
+            continue
+
+        # Prediкtion på arrays = prediкtion på dicts
+        nuværende_sum, forrige_sum, antal = log.tilstand_ved()
+        vektor = log.prediкtion()
+        som_dict = model.prediкer_fra_stemmer(
+            dict(zip(log.partier, nuværende_sum)), dict(zip(log.partier, forrige_sum))
+        )
+        assert isinstance(vektor, Resultatvektor)
+        assert set(vektor) == set(som_dict)
+        for parti, pct in som_dict.items():
+            assert abs(vektor[parti] - pct) < 1e-9
+
+        # Mandatfordeling og JSON
+        stemmer = {p: int(pct / 100 * model.total_stemmer) for p, pct in vektor.items()}
+        parti_m, forbund_m = mf.fordel_mandater(stemmer, 55)
+        parti_v, forbund_v = mf.fordel_mandater(Resultatvektor.fra_dict(stemmer, log.indeks), 55)
+        assert all(parti_v.get(p, 0) == m for p, m in parti_m.items())
+        assert all(forbund_v[f] == m for f, m in forbund_m.items())
+        assert byg_live_data(model, vektor, antal) == byg_live_data(model, som_dict, antal)
+
+    n = 2000
+    nuværende_sum, forrige_sum, antal = log.tilstand_ved()
+    start = time.perf_counter()
+    for _ in range(n):
+        byg_live_data(model, model.prediкer_fra_stemmer(
+            dict(zip(log.partier, nuværende_sum)), dict(zip(log.partier, forrige_sum))
+        ), antal)
+    dict_tid = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        byg_live_data(model, model.prediкer_fra_stemmer(
+            Resultatvektor(log.indeks, nuværende_sum), Resultatvektor(log.indeks, forrige_sum)
+        ), antal)
+    vektor_tid = (time.perf_counter() - start) / n
+
+    print(f"Prediкtion + mandater + JSON med dicts:    {dict_tid * 1e6:.0f} µs")
+    print(f"Prediкtion + mandater + JSON med vektorer: {vektor_tid * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    test_resultatvektor()
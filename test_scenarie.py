@@ -0,0 +1,127 @@
+"""
+Test af hvad-nu-hvis scenarier.
+"""
+
+import json
+import time
+
+from valgmodel import Valgmodel
+from generate_live_data import NYE_PARTIER, byg_live_data
+from indberetningslog import Indberetningslog
+from genafspil_valgnat import lav_valgnat
+from livesnapshot import Snapshotpublicering
+from resultatvektor import Resultatvektor
+from scenarie import Scenarieudgivelse
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def test_scenarie():
+    """Test at scenarier tager udgangspunkt i den publicerede prognose."""
+    print("="*70)
+    print("TEST: Hvad-nu-hvis scenarier")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    log = Indberetningslog(model)
+    publicering = Snapshotpublicering()
+    udgivelse = Scenarieudgivelse(publicering)
+
+    try:
+        udgivelse.beregn_json({})
+        assert False, "Scenarie uden data blev accepteret"
+    except ValueError:
+        pass
+
+    for valgsted, rå in lav_valgnat(CSV_2021, seed=3)[:15]:
+        log.registrer_dataframe(model._aggreger_data(rå))
+    data = byg_live_data(model, log.prediкtion(), log.antal_optalte)
+    publicering.publicer(data)
+
+    # Uden justering: præcis den publicerede fordeling
+    svar = json.loads(udgivelse.beregn_json({}))
+    assert svar["version"] == 1
+    for parti in data["partier"]:
+        assert svar["mandater"][parti["bogstav"]] == parti["mandater"], parti["bogstav"]
+    for forbund in data["forbund"]:
+        assert svar["forbund"][forbund["navn"]] == forbund["mandater"]
+
+    # Ø op, resten skaleres ned - kun på den andel der mangler
+    ø = next(p for p in data["partier"] if p["bogstav"] == "Ø")
+    svar = json.loads(udgivelse.beregn_json({"Ø": 5}))
+    optalt = data["metadata"]["procent_optalt"] / 100
+    total = data["metadata"]["total_stemmer"]
+    rest = sum(p["stemmer"] for p in data["partier"]) / total * 100 * (1 - optalt)
+    assert abs(svar["procent"]["Ø"] - (ø["stemmer"] / total * 100 + 0.05 * rest)) < 0.01
+    assert svar["mandater"]["Ø"] >= ø["mandater"]
+    assert sum(svar["mandater"].values()) == 55
+
+    try:
+        udgivelse.beregn_json({"X": 1})
+        assert False, "Ukendt parti blev accepteret"
+    except ValueError:
+        pass
+
+    # Ny version giver ny beregner
+    beregner = udgivelse.beregner()
+    assert udgivelse.beregner() is beregner
+    publicering.publicer(data)
+    assert udgivelse.beregner() is not beregner
+
+    start = time.perf_counter()
+    for i in range(1000):
+        udgivelse.beregn_json({"Ø": i % 7 - 3, "A": 1.5})
+    tid = (time.perf_counter() - start) / 1000
+    print(f"Beregning per scenarie: {tid * 1e6:.0f} µs (optalt: {data['metadata']['procent_optalt']:.1f}%)")
+
+    # Andre parametre i forespørgslen end partier ignoreres
+    assert udgivelse.justering_fra_forespørgsel({"Ø": ["2"], "t": ["1700000000"]}) == {"Ø": 2.0}
+
+
+def test_scenarie_fra_optalte_stemmer():
+    """Test at de optalte stemmer ligger fast, og kun resten af prognosen justeres."""
+    print("="*70)
+    print("TEST: Scenarier ud fra de optalte stemmer")
+    print("="*70)
+
+    model = Valgmodel(CSV_2021, nye_partier=NYE_PARTIER)
+    log = Indberetningslog(model)
+    publicering = Snapshotpublicering()
+    udgivelse = Scenarieudgivelse(publicering)
+
+    # De største valgsteder først, så andelen af stemmer er større end andelen af valgsteder
+    valgnat = sorted(lav_valgnat(CSV_2021, seed=3), key=lambda v: -v[1]['Stemmetal'].sum())
+    for valgsted, rå in valgnat[:15]:
+        log.registrer_dataframe(model._aggreger_data(rå))
+    data = byg_live_data(model, log.prediкtion(), log.antal_optalte,
+                         optalte_stemmer=Resultatvektor(log.indeks, log.nuværende_sum))
+    publicering.publicer(data)
+
+    svar = json.loads(udgivelse.beregn_json({}))
+    for parti in data["partier"]:
+        assert svar["mandater"][parti["bogstav"]] == parti["mandater"], parti["bogstav"]
+
+    # Ø kan ikke komme under de stemmer der allerede er talt op
+    optalt_ø = data["metadata"]["optalte_stemmer"]["Ø"] / data["metadata"]["total_stemmer"] * 100
+    svar = json.loads(udgivelse.beregn_json({"Ø": -100}))
+    assert abs(svar["procent"]["Ø"] - optalt_ø) < 0.01
+
+    # Justeringen gælder kun stemmerne der mangler, ikke andelen af valgsteder der mangler:
+    # Ø får præcis 5 procentpoint mere af de resterende stemmer
+    total = data["metadata"]["total_stemmer"]
+    optalte = data["metadata"]["optalte_stemmer"]
+    rest = sum(max(p["stemmer"] - optalte.get(p["bogstav"], 0), 0) for p in data["partier"]) / total * 100
+    ø = next(p for p in data["partier"] if p["bogstav"] == "Ø")
+    rest_ø = ø["stemmer"] / total * 100 - optalt_ø
+    svar = json.loads(udgivelse.beregn_json({"Ø": 5}))
+    print(f"Optalt: {data['metadata']['procent_optalt']:.1f}% af valgstederne, {100 - rest:.1f}% af stemmerne")
+    assert rest < 100 - data["metadata"]["procent_optalt"]
+    assert abs(svar["procent"]["Ø"] - (ø["stemmer"] / total * 100 + 0.05 * rest)) < 0.01
+    assert abs((svar["procent"]["Ø"] - optalt_ø) / rest - (rest_ø / rest + 0.05)) < 0.001
+    # De øvrige partier skaleres, så summen er uændret
+    assert abs(sum(svar["procent"].values()) - sum(p["stemmer"] for p in data["partier"]) / total * 100) < 0.1
+
+
+if __name__ == "__main__":
+    test_scenarie()
+    test_scenarie_fra_optalte_stemmer()
@@ -0,0 +1,85 @@
+"""
+Test af flere serverprocesser med SO_REUSEPORT og forhåndskomprimeret JSON.
+"""
+
+import gzip
+import json
+import os
+import socket
+import time
+import urllib.request
+
+from livesnapshot import LiveSnapshot
+from resultatbus import Resultatbus
+from serve_live import start_serverprocesser
+
+
+def _ledig_port() -> int:
+    with socket.socket() as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+def _hent(port, headers=None):
+    anmodning = urllib.request.Request(f"http://127.0.0.1:{port}/live_data.json", headers=headers or {})
+    try:
+        with urllib.request.urlopen(anmodning, timeout=5) as svar:
+            return svar.status, dict(svar.headers), svar.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), b''
+
+
+def test_serverprocesser():
+    """Test at alle processer serverer seneste version, komprimeret efter Accept-Encoding."""
+    print("="*70)
+    print("TEST: Serverprocesser")
+    print("="*70)
+
+    data = {"version": 1, "partier": [{"bogstav": "Ø", "mandater": 15}] * 20}
+    snapshot = LiveSnapshot(1, data)
+    assert gzip.decompress(snapshot.komprimeret['gzip']) == snapshot.json_bytes
+
+    bus = Resultatbus.opret(f"valgmodel_test_server_{os.getpid()}", kapacitet=4096)
+    port = _ledig_port()
+    processer = start_serverprocesser(bus.segment.name, 2, port=port)
+    try:
+        bus.skriv(snapshot.json_bytes, snapshot.version)
+
+        for _ in range(50):
+            try:
+                status, headers, indhold = _hent(port)
+                break
+            except OSError:
+                time.sleep(0.1)
+        assert status == 200
+        assert 'Content-Encoding' not in headers
+        assert json.loads(indhold) == data
+
+        status, headers, indhold = _hent(port, {'Accept-Encoding': 'gzip, deflate'})
+        assert headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(indhold)) == data
+        print(f"Ukomprimeret {len(snapshot.json_bytes)} bytes, gzip {len(indhold)} bytes")
+
+        # gzip;q=0 betyder at klienten ikke vil have gzip
+        status, headers, indhold = _hent(port, {'Accept-Encoding': 'gzip;q=0'})
+        assert 'Content-Encoding' not in headers
+
+        # ETag er per kodning, og 304 når versionen er uændret
+        etag = _hent(port, {'Accept-Encoding': 'gzip'})[1]['ETag']
+        assert etag.endswith('-gzip"')
+        assert _hent(port, {'Accept-Encoding': 'gzip', 'If-None-Match': etag})[0] == 304
+
+        # En ny version ses af alle processer
+        data["version"] = 2
+        bus.skriv(LiveSnapshot(2, data).json_bytes, 2)
+        for _ in range(10):
+            assert json.loads(_hent(port)[2])["version"] == 2
+    finally:
+        for proces in processer:
+            proces.terminate()
+            proces.join()
+        bus.luk()
+
+
+if __name__ == "__main__":
+    test_serverprocesser()
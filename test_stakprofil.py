@@ -0,0 +1,70 @@
+"""
+Test af stakprøvetageren.
+"""
+
+import os
+import signal
+import tempfile
+import threading
+import time
+
+from stakprofil import Stakprofil, installer_signal
+
+
+def _travl(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_stakprofil():
+    """Test at profilen fanger en travl tråd i collapsed stack formatet."""
+    print("="*70)
+    print("TEST: Stakprofil")
+    print("="*70)
+
+    stop = threading.Event()
+    tråd = threading.Thread(target=_travl, args=(stop,), name="travl", daemon=True)
+    tråd.start()
+
+    with tempfile.TemporaryDirectory() as mappe:
+        try:
+            profil = Stakprofil(mappe, varighed=0.3, interval=0.002)
+            assert profil.start()
+            assert not profil.start()
+            profil._tråd.join()
+            assert not profil.aktiv
+
+            with open(profil.sidste_fil, encoding='utf-8') as f:
+                linjer = f.read().splitlines()
+            stakke = {}
+            for linje in linjer:
+                stak, antal = linje.rsplit(' ', 1)
+                stakke[stak] = int(antal)
+            travle = sum(n for stak, n in stakke.items() if stak.startswith("travl;") and "_travl" in stak)
+            print(f"{len(linjer)} forskellige stakke, {travle} prøver i den travle tråd")
+            assert travle > 20
+            assert not any("stakprofil;" in stak for stak in stakke)
+
+            # Signalet starter og stopper før tid
+            if hasattr(signal, 'SIGUSR1'):
+                tidligere = signal.getsignal(signal.SIGUSR1)
+                try:
+                    profil = installer_signal(mappe=mappe, varighed=60.0)
+                    os.kill(os.getpid(), signal.SIGUSR1)
+                    time.sleep(0.1)
+                    assert profil.aktiv
+                    start = time.perf_counter()
+                    os.kill(os.getpid(), signal.SIGUSR1)
+                    profil._tråd.join(timeout=5)
+                    assert not profil.aktiv
+                    assert time.perf_counter() - start < 5
+                    assert os.path.getsize(profil.sidste_fil) > 0
+                finally:
+                    signal.signal(signal.SIGUSR1, tidligere)
+        finally:
+            stop.set()
+            tråd.join()
+
+
+if __name__ == "__main__":
+    test_stakprofil()
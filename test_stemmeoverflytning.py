@@ -0,0 +1,83 @@
+"""
+Test af den inkrementelle estimator for vælgervandringer.
+"""
+
+from valgmodel import Valgmodel
+from stemmeoverflytning import Stemmeoverflytning
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def lav_simuleret_valg(model: Valgmodel):
+    """Simulerer et valg hvor 20% af A's vælgere går til Ø."""
+    matrix = model._beregn_valgsted_matrix(model.forrige_valg_data)
+    overflyttet = (matrix['A'] * 0.2).round()
+    matrix['Ø'] += overflyttet
+    matrix['A'] -= overflyttet
+    return matrix
+
+
+def test_overflytning_estimeres():
+    """Test at den simulerede vælgervandring genfindes."""
+    print("="*70)
+    print("TEST: Estimering af vælgervandringer")
+    print("="*70)
+
+    model = Valgmodel(
+        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
+        nye_partier=NYE_PARTIER
+    )
+    matrix = lav_simuleret_valg(model)
+
+    estimator = Stemmeoverflytning(model)
+    for valgsted, række in matrix.iterrows():
+        estimator.tilføj_valgsted(valgsted, række.to_dict())
+
+    overflytning = estimator.estimer()
+    estimator.print_overflytning(overflytning, partier=["A", "Ø"])
+
+    # Rækkerne er fordelinger
+    assert (overflytning.to_numpy() >= 0).all()
+    assert abs(overflytning.sum(axis=1) - 1).max() < 1e-6
+
+    # A afgiver vælgere til Ø
+    assert overflytning.loc['A', 'Ø'] > 0.1
+    assert overflytning.loc['A', 'A'] > 0.7
+
+
+def test_rettelse_af_valgsted():
+    """Test at en rettelse giver samme statistik som kun at se den rettede version."""
+    print("="*70)
+    print("TEST: Rettelse af valgsted")
+    print("="*70)
+
+    model = Valgmodel(
+        "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
+        nye_partier=NYE_PARTIER
+    )
+    matrix = lav_simuleret_valg(model)
+    valgsted = matrix.index[0]
+    korrekt = matrix.loc[valgsted].to_dict()
+    fejlindtastet = dict(korrekt, A=korrekt['A'] * 10)
+
+    rettet = Stemmeoverflytning(model)
+    rettet.tilføj_valgsted(valgsted, fejlindtastet)
+    rettet.tilføj_valgsted(valgsted, korrekt)
+
+    direkte = Stemmeoverflytning(model)
+    direkte.tilføj_valgsted(valgsted, korrekt)
+
+    print(f"Valgsted: {valgsted}")
+    assert abs(rettet.xtx - direkte.xtx).max() < 1e-6 * abs(direkte.xtx).max()
+    assert abs(rettet.xty - direkte.xty).max() < 1e-6 * abs(direkte.xty).max()
+
+    # Nye partier har ingen loyale vælgere fra forrige valg
+    prior = direkte._prior()
+    k = direkte.forrige_partier.index('M')
+    assert prior[k, direkte._parti_index['M']] < 1.0
+
+
+if __name__ == "__main__":
+    test_overflytning_estimeres()
+    test_rettelse_af_valgsted()
@@ -0,0 +1,120 @@
+"""
+Test af prediкtion med blandet swing mod flere historiske valg.
+"""
+
+import glob
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from valgmodel import Valgmodel
+from valghistorik import Valghistorik
+from valgstedsnoegle import Valgstedsnøgle
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+# Partier der skal behandles som nye
+NYE_PARTIER = ["M", "N", "Æ", "Q"]
+
+
+def lav_nuværende_data(model: Valgmodel):
+    """Simulerer et valg hvor Ø går 30% frem."""
+    nuværende_data = model.forrige_valg_data.copy()
+    mask = nuværende_data['Parti_bogstav'] == 'Ø'
+    nuværende_data.loc[mask, 'Stemmer'] = (
+        nuværende_data.loc[mask, 'Stemmer'] * 1.3
+    ).round().astype(int)
+    return nuværende_data
+
+
+def lav_tidligere_valg(sti: str):
+    """Skriver et tidligere valg med et andet resultat (Ø svagere, A stærkere) og ujævnt swing."""
+    df = pd.read_csv(CSV_2021, sep=';', encoding='utf-8-sig')
+    rng = np.random.default_rng(0)
+    faktor = df['Bogstavbetegnelse'].map({"Ø": 0.6, "A": 1.4}).fillna(1.0)
+    faktor *= np.exp(rng.normal(0, 0.2, len(df)))
+    df['Stemmetal'] = (df['Stemmetal'] * faktor).round().astype(int)
+    df.to_csv(sti, sep=';', index=False)
+
+
+def test_blandet_swing():
+    """Test at blandingen er det vægtede gennemsnit af prediкtionerne mod hvert valg."""
+    print("="*70)
+    print("TEST: Blandet swing mod flere valg")
+    print("="*70)
+
+    with tempfile.TemporaryDirectory() as mappe:
+        historik_fil = os.path.join(mappe, "historik.npy")
+        csv_2017 = os.path.join(mappe, "2017.csv")
+        lav_tidligere_valg(csv_2017)
+
+        model = Valgmodel(
+            CSV_2021,
+            nye_partier=NYE_PARTIER,
+            historiske_valg={"2017": csv_2017, "2021": CSV_2021},
+            historik_vægte={"2017": 1.0, "2021": 3.0},
+            historik_fil=historik_fil
+        )
+
+        assert model.historik.stemmer.shape[0] == 2
+        assert set(model.historik.valgsteder) == set(model.forrige_valg_data['Valgsted'])
+
+        nuværende_data = lav_nuværende_data(model)
+        optalte = list(nuværende_data['Valgsted'].unique()[:10])
+
+        mod_2021 = model.prediкer(nuværende_data, optalte)
+        mod_2017 = Valgmodel(csv_2017, nye_partier=NYE_PARTIER).prediкer(nuværende_data, optalte)
+        blandet = model.prediкer_blandet(nuværende_data, optalte)
+        model.print_resultat(blandet, "Blandet prediкtion (10 valgsteder)")
+
+        # De to baselines giver forskellige prediкtioner, og vægtene bruges
+        assert abs(mod_2017["Ø"] - mod_2021["Ø"]) > 0.1
+        assert set(blandet) == set(mod_2021)
+        for parti in blandet:
+            forventet = (1.0 * mod_2017.get(parti, 0.0) + 3.0 * mod_2021[parti]) / 4.0
+            assert abs(blandet[parti] - forventet) < 1e-9
+
+        # Historikken kan genåbnes uden at parse CSV
+        genåbnet = Valghistorik.åbn(historik_fil)
+        assert genåbnet.valg == ["2017", "2021"]
+        assert abs(genåbnet.samlet - model.historik.samlet).max() == 0
+
+
+def test_historik_med_valgstedsnøgle():
+    """Test at nøglen bruges på alle historiske valg og indgår i cachens nøgle."""
+    print("="*70)
+    print("TEST: Historik med valgstedsnøgle")
+    print("="*70)
+
+    valgsteder = sorted(Valgmodel(CSV_2021).forrige_valg_data['Valgsted'].unique())
+    nøgle = Valgstedsnøgle([(valgsteder[0], "Nyt navn", 1.0), (valgsteder[1], "Nyt navn", 1.0)])
+
+    with tempfile.TemporaryDirectory() as mappe:
+        historik_fil = os.path.join(mappe, "historik.npy")
+        csv_2017 = os.path.join(mappe, "2017.csv")
+        lav_tidligere_valg(csv_2017)
+        historiske_valg = {"2017": csv_2017, "2021": CSV_2021}
+
+        model = Valgmodel(CSV_2021, valgstedsnøgle=nøgle, historiske_valg=historiske_valg,
+                          historik_fil=historik_fil)
+        historik = model.historik
+        assert "Nyt navn" in historik.valgsteder and valgsteder[0] not in historik.valgsteder
+        # Det omlagte valgsted har stemmer i begge valg
+        assert (historik.summer_for_valgsteder(["Nyt navn"]).sum(axis=1) > 0).all()
+
+        # Samme fil uden nøgle bygges om i stedet for at genbruge den omregnede historik
+        uden_nøgle = Valgmodel(CSV_2021, historiske_valg=historiske_valg, historik_fil=historik_fil)
+        assert valgsteder[0] in uden_nøgle.historik.valgsteder
+
+    # Uden historik_fil bygges historikken i hukommelsen uden midlertidige filer
+    før = set(glob.glob(os.path.join(tempfile.gettempdir(), "valghistorik_*")))
+    model = Valgmodel(CSV_2021, historiske_valg={"2021": CSV_2021})
+    assert not isinstance(model.historik.stemmer, np.memmap)
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), "valghistorik_*"))) == før
+
+
+if __name__ == "__main__":
+    test_blandet_swing()
+    test_historik_med_valgstedsnøgle()
@@ -0,0 +1,51 @@
+"""
+Test af kommandolinjen.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from valgmodel_cli import main
+
+MAPPE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_kommandolinje():
+    """Test at --help og serve starter uden pandas/numpy, og at predict virker."""
+    print("="*70)
+    print("TEST: Kommandolinje")
+    print("="*70)
+
+    start = time.perf_counter()
+    hjælp = subprocess.run([sys.executable, os.path.join(MAPPE, "valgmodel"), "--help"],
+                           capture_output=True, text=True, cwd=MAPPE)
+    varighed = time.perf_counter() - start
+    assert hjælp.returncode == 0
+    for kommando in ("predict", "watch", "serve", "replay", "bench"):
+        assert kommando in hjælp.stdout
+    print(f"valgmodel --help: {varighed * 1000:.0f} ms")
+
+    # Serve fra disk indlæser hverken modellen, pandas eller numpy
+    kode = (
+        "import sys, valgmodel_cli, serve_live\n"
+        "valgmodel_cli.byg_parser().parse_args(['serve'])\n"
+        "print(sorted(m for m in ('pandas', 'numpy', 'valgmodel') if m in sys.modules))\n"
+    )
+    importeret = subprocess.run([sys.executable, "-c", kode], capture_output=True, text=True, cwd=MAPPE)
+    assert importeret.returncode == 0, importeret.stderr
+    assert importeret.stdout.strip() == "[]", importeret.stdout
+
+    with tempfile.TemporaryDirectory() as mappe:
+        output = os.path.join(mappe, "live_data.json")
+        assert main(["predict", "--output", output, "--mandater", "31"]) == 0
+        with open(output, encoding="utf-8") as f:
+            data = json.load(f)
+        assert sum(p["mandater"] for p in data["partier"]) == 31
+
+
+if __name__ == "__main__":
+    test_kommandolinje()
@@ -0,0 +1,56 @@
+"""
+Test af omlægning af afstemningsområder mellem valgene.
+"""
+
+from valgmodel import Valgmodel
+from valgstedsnoegle import Valgstedsnøgle
+
+CSV_2021 = "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv"
+
+
+def test_omdøbning_sammenlægning_og_deling():
+    """Test at stemmer bevares og at omdøbte valgsteder stadig matches."""
+    print("="*70)
+    print("TEST: Valgstedsnøgle")
+    print("="*70)
+
+    uden_nøgle = Valgmodel(CSV_2021)
+    valgsteder = sorted(uden_nøgle.forrige_valg_data['Valgsted'].unique())
+
+    nøgle = Valgstedsnøgle([
+        # Omdøbning
+        (valgsteder[0], "Nyt navn", 1.0),
+        # Sammenlægning
+        (valgsteder[1], "Sammenlagt", 1.0),
+        (valgsteder[2], "Sammenlagt", 1.0),
+        # Deling
+        (valgsteder[3], "Del 1", 0.25),
+        (valgsteder[3], "Del 2", 0.75),
+    ])
+    model = Valgmodel(CSV_2021, valgstedsnøgle=nøgle)
+
+    nye_valgsteder = set(model.forrige_valg_data['Valgsted'])
+    print(f"Valgsteder før: {len(valgsteder)}, efter: {len(nye_valgsteder)}")
+
+    assert valgsteder[0] not in nye_valgsteder
+    assert {"Nyt navn", "Sammenlagt", "Del 1", "Del 2"} <= nye_valgsteder
+    assert len(nye_valgsteder) == len(valgsteder) - 4 + 4
+
+    # Samlet antal stemmer og samlet resultat er uændret
+    assert abs(model.forrige_valg_data['Stemmer'].sum()
+               - uden_nøgle.forrige_valg_data['Stemmer'].sum()) < 1e-6
+    for parti, pct in uden_nøgle.forrige_valg_samlet.items():
+        assert abs(model.forrige_valg_samlet[parti] - pct) < 1e-9
+
+    # Et omdøbt valgsted indgår nu i q med sit nye navn
+    nuværende = uden_nøgle.forrige_valg_data.copy()
+    nuværende['Valgsted'] = nuværende['Valgsted'].replace(valgsteder[0], "Nyt navn")
+    pred = model.prediкer(nuværende, ["Nyt navn"])
+    for parti, pct in model.forrige_valg_samlet.items():
+        assert abs(pred[parti] - pct) < 1e-9
+
+    model.print_resultat(pred, "Prediкtion med omdøbt valgsted")
+
+
+if __name__ == "__main__":
+    test_omdøbning_sammenlægning_og_deling()
@@ -0,0 +1,139 @@
+"""
+Historik over flere tidligere valg som ét memory-mapped array.
+
+Stemmerne fra alle historiske valg gemmes i ét array med formen
+valg × valgsted × parti, med fælles (alignet) valgsteds- og partiindeks.
+Arrayet ligger i en .npy-fil og åbnes memory-mapped; indekset ligger i en
+.json-fil ved siden af. Når filerne først er bygget, kan historikken åbnes
+igen uden at parse en eneste CSV. Uden en fil bygges historikken i
+hukommelsen.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+class Valghistorik:
+    """
+    Stemmetal fra flere tidligere valg med fælles valgsteds- og partiindeks.
+    """
+
+    def __init__(
+        self,
+        stemmer: np.ndarray,
+        valg: List[str],
+        valgsteder: List[str],
+        partier: List[str],
+        kilder: Dict[str, dict] = None
+    ):
+        """
+        Initialiserer historikken.
+
+        Args:
+            stemmer: Array med formen (valg, valgsted, parti)
+            valg: Navne på valgene (f.eks. "2013", "2017", "2021")
+            valgsteder: Valgstedsindeks (anden akse)
+            partier: Partiindeks (tredje akse)
+            kilder: Beskrivelse af kildefilerne (bruges til at genkende cachen)
+        """
+        self.stemmer = stemmer
+        self.valg = list(valg)
+        self.valgsteder = list(valgsteder)
+        self.partier = list(partier)
+        self.kilder = kilder or {}
+
+        self.valgsted_index = {v: i for i, v in enumerate(self.valgsteder)}
+        self.parti_index = {p: i for i, p in enumerate(self.partier)}
+
+        # Samlede stemmer per valg og parti (r før normalisering)
+        self.samlet = self.stemmer.sum(axis=1, dtype=np.float64)
+
+    @staticmethod
+    def _index_fil(sti: str) -> str:
+        """Sti til indeksfilen der hører til arrayet."""
+        return os.path.splitext(sti)[0] + '.json'
+
+    @classmethod
+    def opbyg(
+        cls,
+        data: Dict[str, pd.DataFrame],
+        sti: Optional[str],
+        kilder: Dict[str, dict] = None
+    ) -> "Valghistorik":
+        """
+        Bygger historikken fra valgdata og gemmer den som memory-mapped fil.
+
+        Args:
+            data: Dictionary med valgnavn -> DataFrame med valgdata
+                  (som fra Valgmodel._load_data)
+            sti: Sti til .npy-filen (None = kun i hukommelsen)
+            kilder: Beskrivelse af kildefilerne
+
+        Returns:
+            Valghistorik instans med memory-mapped stemmer (eller stemmer i
+            hukommelsen uden sti)
+        """
+        valg = list(data.keys())
+
+        # Én samlet pivot over alle valg i stedet for én per valg
+        samlet = pd.concat(data.values(), keys=valg, names=['Valg']).reset_index(level='Valg')
+        valgsteder = sorted(samlet['Valgsted'].unique())
+        partier = sorted(samlet['Parti_bogstav'].unique())
+
+        valg_idx = samlet['Valg'].map({v: i for i, v in enumerate(valg)}).to_numpy()
+        valgsted_idx = pd.Categorical(samlet['Valgsted'], categories=valgsteder).codes
+        parti_idx = pd.Categorical(samlet['Parti_bogstav'], categories=partier).codes
+
+        form = (len(valg), len(valgsteder), len(partier))
+        if sti is None:
+            stemmer = np.zeros(form)
+        else:
+            stemmer = np.lib.format.open_memmap(sti, mode='w+', dtype=np.float64, shape=form)
+            stemmer[:] = 0
+        np.add.at(stemmer, (valg_idx, valgsted_idx, parti_idx), samlet['Stemmer'].to_numpy(dtype=float))
+        if sti is None:
+            return cls(stemmer, valg, valgsteder, partier, kilder)
+        stemmer.flush()
+
+        with open(cls._index_fil(sti), 'w', encoding='utf-8') as f:
+            json.dump({
+                "valg": valg,
+                "valgsteder": valgsteder,
+                "partier": partier,
+                "kilder": kilder or {}
+            }, f, ensure_ascii=False)
+
+        return cls.åbn(sti)
+
+    @classmethod
+    def åbn(cls, sti: str) -> "Valghistorik":
+        """
+        Åbner en tidligere bygget historik memory-mapped.
+
+        Args:
+            sti: Sti til .npy-filen
+
+        Returns:
+            Valghistorik instans
+        """
+        with open(cls._index_fil(sti), encoding='utf-8') as f:
+            index = json.load(f)
+
+        stemmer = np.load(sti, mmap_mode='r')
+        return cls(stemmer, index['valg'], index['valgsteder'], index['partier'], index['kilder'])
+
+    def summer_for_valgsteder(self, valgsteder: List[str]) -> np.ndarray:
+        """
+        Summerer stemmerne på de givne valgsteder for alle valg på én gang.
+
+        Args:
+            valgsteder: Liste af valgsteder
+
+        Returns:
+            Array med formen (valg, parti)
+        """
+        idx = [self.valgsted_index[v] for v in valgsteder if v in self.valgsted_index]
+        return self.stemmer[:, idx, :].sum(axis=1, dtype=np.float64)
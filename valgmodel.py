@@ -9,9 +9,23 @@ Modellen fungerer ved at:
 5. Normalisere resultatet
 """
 
+import os
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, NamedTuple, Tuple, Union
+
+from valghistorik import Valghistorik
+from valgstedsnoegle import Valgstedsnøgle
+from resultatvektor import Partiindeks, Resultatvektor
+
+
+class Konfidensinterval(NamedTuple):
+    """Percentilinterval for de prediкerede procenter."""
+    # Andel af bootstrap-gentagelserne der ligger i intervallet (f.eks. 0.9)
+    niveau: float
+    antal: int
+    lav: Resultatvektor
+    høj: Resultatvektor
 
 
 class Valgmodel:
@@ -20,7 +34,15 @@ class Valgmodel:
     delvist optalte valgsteder.
     """
 
-    def __init__(self, forrige_valg_csv: str, nye_partier: List[str] = None):
+    def __init__(
+        self,
+        forrige_valg_csv: str,
+        nye_partier: List[str] = None,
+        valgstedsnøgle: Union[str, Valgstedsnøgle] = None,
+        historiske_valg: Dict[str, str] = None,
+        historik_vægte: Dict[str, float] = None,
+        historik_fil: str = None
+    ):
         """
         Initialiserer modellen med data fra forrige valg.
 
@@ -28,11 +50,93 @@ class Valgmodel:
             forrige_valg_csv: Sti til CSV-fil med data fra forrige valg
             nye_partier: Liste af partibogstaver der skal behandles som nye partier
                         (selvom de måske findes i forrige valg med samme bogstav)
+            valgstedsnøgle: Valgstedsnøgle (eller sti til CSV med nøglen) der
+                        omregner forrige valgs afstemningsområder til de nuværende
+            historiske_valg: Dictionary med valgnavn -> sti til CSV for de valg
+                        prediкer_blandet() skal bruge som baseline
+                        (f.eks. {"2013": ..., "2017": ..., "2021": ...})
+            historik_vægte: Dictionary med valgnavn -> vægt i blandingen
+                        (standard: samme vægt til alle valg)
+            historik_fil: Sti til .npy-fil hvor historikken gemmes. Findes
+                        filen allerede og er bygget af de samme CSV-filer
+                        med samme valgstedsnøgle, åbnes den direkte uden at
+                        parse CSV (None = historikken bygges i hukommelsen)
         """
         self.forrige_valg_data = self._load_data(forrige_valg_csv)
+
+        # Omregn én gang til nuværende afstemningsområder, så prediкtionen
+        # kan matche valgsteder direkte på navn
+        if isinstance(valgstedsnøgle, str):
+            valgstedsnøgle = Valgstedsnøgle.fra_csv(valgstedsnøgle)
+        self.valgstedsnøgle = valgstedsnøgle
+        if valgstedsnøgle is not None:
+            self.forrige_valg_data = valgstedsnøgle.anvend(self.forrige_valg_data)
+
         self.forrige_valg_samlet = self._beregn_samlet_resultat(self.forrige_valg_data)
         self.nye_partier = set(nye_partier) if nye_partier else set()
 
+        # Bruges ved hver opdatering og beregnes derfor kun én gang
+        self.total_stemmer = int(round(self.forrige_valg_data['Stemmer'].sum()))
+        self.antal_valgsteder = self.forrige_valg_data['Valgsted'].nunique()
+
+        # (indeks, r, r findes, nye) for seneste partiindeks i prediкer_fra_stemmer
+        self._vektorgrundlag = None
+
+        self.historik = None
+        self.historik_vægte = None
+        if historiske_valg:
+            self.historik = self._indlæs_historik(forrige_valg_csv, historiske_valg, historik_fil)
+            vægte = historik_vægte or {}
+            self.historik_vægte = np.array([vægte.get(v, 1.0) for v in self.historik.valg])
+
+    def _indlæs_historik(
+        self,
+        forrige_valg_csv: str,
+        historiske_valg: Dict[str, str],
+        historik_fil: str = None
+    ) -> Valghistorik:
+        """
+        Indlæser historiske valg som ét memory-mapped array.
+
+        Alle valg omregnes med modellens valgstedsnøgle, så de deler de
+        nuværende afstemningsområder.
+
+        Args:
+            forrige_valg_csv: Sti til forrige valg (genbruges hvis det også er
+                              et af de historiske valg)
+            historiske_valg: Dictionary med valgnavn -> sti til CSV
+            historik_fil: Sti til .npy-fil til historikken (None = i hukommelsen)
+
+        Returns:
+            Valghistorik instans
+        """
+        nøgle = self.valgstedsnøgle.fingeraftryk() if self.valgstedsnøgle is not None else None
+        kilder = {}
+        for navn, csv_fil in historiske_valg.items():
+            stat = os.stat(csv_fil)
+            kilder[navn] = {
+                "fil": os.path.abspath(csv_fil), "mtime": stat.st_mtime, "størrelse": stat.st_size,
+                "valgstedsnøgle": nøgle
+            }
+
+        if (historik_fil is not None and os.path.exists(historik_fil)
+                and os.path.exists(Valghistorik._index_fil(historik_fil))):
+            historik = Valghistorik.åbn(historik_fil)
+            if historik.kilder == kilder and historik.valg == list(historiske_valg):
+                return historik
+
+        data = {}
+        for navn, csv_fil in historiske_valg.items():
+            if os.path.abspath(csv_fil) == os.path.abspath(forrige_valg_csv):
+                # Allerede omregnet med nøglen
+                data[navn] = self.forrige_valg_data
+            else:
+                data[navn] = self._load_data(csv_fil)
+                if self.valgstedsnøgle is not None:
+                    data[navn] = self.valgstedsnøgle.anvend(data[navn])
+
+        return Valghistorik.opbyg(data, historik_fil, kilder)
+
     def _load_data(self, csv_fil: str) -> pd.DataFrame:
         """
         Indlæser valgdata fra CSV.
@@ -49,6 +153,18 @@ class Valgmodel:
             encoding='utf-8-sig'  # Håndterer BOM i filen
         )
 
+        return self._aggreger_data(df)
+
+    def _aggreger_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggregerer rå valgdata (med kandidatrækker) per valgsted og parti.
+
+        Args:
+            df: DataFrame med kolonnerne fra CSV-formatet
+
+        Returns:
+            DataFrame med valgdata
+        """
         # Aggreger stemmer per valgsted og parti
         result = df.groupby(['Afstemningsområde', 'Bogstavbetegnelse', 'Listenavn'])['Stemmetal'].sum().reset_index()
         result.columns = ['Valgsted', 'Parti_bogstav', 'Parti_navn', 'Stemmer']
@@ -71,6 +187,24 @@ class Valgmodel:
 
         return procent
 
+    def _beregn_valgsted_matrix(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Omformer valgdata til en valgsted × parti matrix med stemmetal.
+
+        Args:
+            data: DataFrame med valgdata
+
+        Returns:
+            DataFrame med valgsteder som rækker og partibogstaver som kolonner
+        """
+        return data.pivot_table(
+            index='Valgsted',
+            columns='Parti_bogstav',
+            values='Stemmer',
+            aggfunc='sum',
+            fill_value=0
+        )
+
     def _beregn_resultat_for_valgsteder(
         self,
         data: pd.DataFrame,
@@ -125,6 +259,192 @@ class Valgmodel:
         # q_i: procenter for samme valgsteder (forrige valg)
         q = self._beregn_resultat_for_valgsteder(self.forrige_valg_data, optalte_valgsteder)
 
+        return self._prediкer_fra_procenter(p, q)
+
+    def prediкer_fra_stemmer(
+        self,
+        nuværende_stemmer: Dict[str, float],
+        forrige_stemmer: Dict[str, float]
+    ) -> Dict[str, float]:
+        """
+        Prediкerer ud fra allerede summerede stemmer på de optalte valgsteder.
+
+        Bruges når stemmerne holdes opsummeret løbende, så der ikke skal
+        filtreres og grupperes i DataFrames ved hver opdatering. Er begge
+        stemmer Resultatvektorer over samme partiindeks, beregnes alt på
+        arrays, og resultatet er også en Resultatvektor.
+
+        Args:
+            nuværende_stemmer: Parti_bogstav -> stemmer på optalte valgsteder (nuværende valg)
+            forrige_stemmer: Parti_bogstav -> stemmer på samme valgsteder (forrige valg)
+
+        Returns:
+            Dictionary (eller Resultatvektor) med parti_bogstav -> prediкeret procent
+        """
+        if (isinstance(nuværende_stemmer, Resultatvektor) and isinstance(forrige_stemmer, Resultatvektor)
+                and nuværende_stemmer.indeks == forrige_stemmer.indeks):
+            grundlag = self._grundlag_for(nuværende_stemmer.indeks)
+            if grundlag is not None:
+                return self._prediкer_fra_vektorer(nuværende_stemmer, forrige_stemmer, grundlag)
+
+        p_total = sum(nuværende_stemmer.values())
+        q_total = sum(forrige_stemmer.values())
+
+        if p_total <= 0:
+            raise ValueError("Ingen stemmer på de optalte valgsteder")
+
+        p = {k: v / p_total * 100 for k, v in nuværende_stemmer.items() if v > 0}
+        q = {k: v / q_total * 100 for k, v in forrige_stemmer.items() if v > 0} if q_total > 0 else {}
+
+        return self._prediкer_fra_procenter(p, q)
+
+    def _grundlag_for(self, indeks: Partiindeks):
+        """
+        Forrige valgs resultat alignet med et partiindeks (gemt for seneste indeks).
+
+        Returns:
+            Tuple med (indeks, r, r findes, nye partier) som arrays, eller None
+            hvis indekset ikke dækker alle partier fra forrige valg
+        """
+        grundlag = self._vektorgrundlag
+        if grundlag is not None and grundlag[0] is indeks:
+            return grundlag
+
+        r = self.forrige_valg_samlet
+        if not all(parti in indeks.index for parti in r):
+            return None
+        grundlag = (
+            indeks,
+            np.array([r.get(parti, 0.0) for parti in indeks.navne]),
+            np.array([parti in r for parti in indeks.navne]),
+            np.array([parti in self.nye_partier for parti in indeks.navne])
+        )
+        self._vektorgrundlag = grundlag
+        return grundlag
+
+    def _prediкer_fra_vektorer(
+        self,
+        nuværende_stemmer: Resultatvektor,
+        forrige_stemmer: Resultatvektor,
+        grundlag
+    ) -> Resultatvektor:
+        """
+        Samme swing-model som _prediкer_fra_procenter, men på arrays.
+
+        Returns:
+            Resultatvektor med prediкeret procent for partierne der er med
+        """
+        indeks = grundlag[0]
+        nuværende = nuværende_stemmer.værdier
+        if nuværende.sum() <= 0:
+            raise ValueError("Ingen stemmer på de optalte valgsteder")
+
+        prediкtion, med = self._swing(nuværende, forrige_stemmer.værdier, grundlag)
+        return Resultatvektor(indeks, prediкtion, med)
+
+    @staticmethod
+    def _swing(nuværende: np.ndarray, forrige: np.ndarray, grundlag) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Swing-modellen på arrays med partierne langs sidste akse.
+
+        Med 2D-arrays (gentagelse × parti) beregnes alle gentagelser på én gang.
+
+        Returns:
+            Tuple med prediкeret procent og hvilke partier der er med
+        """
+        _, r, i_r, nye = grundlag
+
+        p_total = nuværende.sum(axis=-1, keepdims=True)
+        q_total = forrige.sum(axis=-1, keepdims=True)
+
+        har_p = nuværende > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(har_p, nuværende / p_total * 100, 0.0)
+            q = np.where((forrige > 0) & (q_total > 0), forrige / q_total * 100, 0.0)
+
+            # Swing hvor partiet havde stemmer på valgstederne, ellers p (eller r)
+            prediкtion = np.where(q > 0, r * p / q, np.where(har_p, p, r))
+
+        # Nye partier og partier uden forrige resultat: p direkte
+        prediкtion = np.where(nye | ~i_r, p, prediкtion)
+        med = (i_r & ~nye) | har_p
+        prediкtion = np.where(med, prediкtion, 0.0)
+
+        total = prediкtion.sum(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prediкtion = np.where(total > 0, prediкtion / total * 100, prediкtion)
+        return prediкtion, med
+
+    def bootstrap_interval(
+        self,
+        nuværende: np.ndarray,
+        forrige: np.ndarray,
+        indeks: Partiindeks,
+        antal: int = 1000,
+        niveau: float = 0.9,
+        seed: int = None
+    ) -> Konfidensinterval:
+        """
+        Konfidensintervaller for prediкtionen ved bootstrap over de optalte valgsteder.
+
+        Hver gentagelse trækker valgstederne med tilbagelægning og beregner
+        swing-prediкtionen igen. Gentagelserne er vægte på valgstederne, så
+        alle summer findes med ét matrixprodukt (gentagelse × valgsted) @
+        (valgsted × parti), og swing-modellen køres på alle rækker på én gang.
+
+        Args:
+            nuværende: Stemmer per optalt valgsted × parti (nuværende valg)
+            forrige: Stemmer på samme valgsteder × parti (forrige valg)
+            indeks: Partiindeks som søjlerne svarer til
+            antal: Antal bootstrap-gentagelser
+            niveau: Intervallernes dækning (0.9 = 5%- og 95%-percentilen)
+            seed: Seed til trækningen (samme seed giver samme intervaller)
+
+        Returns:
+            Konfidensinterval med nedre og øvre grænse per parti
+        """
+        if not 0 < niveau < 1:
+            raise ValueError(f"Niveauet skal ligge mellem 0 og 1, ikke {niveau}")
+        nuværende = np.asarray(nuværende, dtype=np.float64)
+        forrige = np.asarray(forrige, dtype=np.float64)
+        if nuværende.shape != forrige.shape or nuværende.shape[1:] != (len(indeks),):
+            raise ValueError("Stemmerne skal være valgsted × parti alignet med partiindekset")
+        if nuværende.sum() <= 0:
+            raise ValueError("Ingen stemmer på de optalte valgsteder")
+        grundlag = self._grundlag_for(indeks)
+        if grundlag is None:
+            raise ValueError("Partiindekset dækker ikke alle partier fra forrige valg")
+
+        # Vægte: hvor mange gange hvert valgsted er trukket i hver gentagelse
+        antal_valgsteder = len(nuværende)
+        rng = np.random.default_rng(seed)
+        træk = rng.integers(0, antal_valgsteder, size=(antal, antal_valgsteder))
+        træk += np.arange(antal)[:, None] * antal_valgsteder
+        vægte = np.bincount(træk.ravel(), minlength=antal * antal_valgsteder)
+        vægte = vægte.reshape(antal, antal_valgsteder).astype(np.float64)
+
+        prediкtioner, _ = self._swing(vægte @ nuværende, vægte @ forrige, grundlag)
+        _, med = self._swing(nuværende.sum(axis=0), forrige.sum(axis=0), grundlag)
+
+        hale = (1 - niveau) / 2 * 100
+        lav, høj = np.percentile(prediкtioner, [hale, 100 - hale], axis=0)
+        return Konfidensinterval(niveau, antal, Resultatvektor(indeks, lav, med), Resultatvektor(indeks, høj, med))
+
+    def _prediкer_fra_procenter(
+        self,
+        p: Dict[str, float],
+        q: Dict[str, float]
+    ) -> Dict[str, float]:
+        """
+        Anvender swing-modellen på procenter for de optalte valgsteder.
+
+        Args:
+            p: Parti_bogstav -> procent på optalte valgsteder (nuværende valg)
+            q: Parti_bogstav -> procent på samme valgsteder (forrige valg)
+
+        Returns:
+            Dictionary med parti_bogstav -> prediкeret procent
+        """
         # r_i: samlet resultat fra forrige valg
         r = self.forrige_valg_samlet
 
@@ -168,6 +488,75 @@ class Valgmodel:
 
         return prediкtion
 
+    def prediкer_blandet(
+        self,
+        nuværende_valg_data: pd.DataFrame,
+        optalte_valgsteder: List[str]
+    ) -> Dict[str, float]:
+        """
+        Prediкerer med swing mod flere historiske valg og blander resultaterne.
+
+        For hvert historisk valg e beregnes r_e,i * p_i / q_e,i som i prediкer()
+        og normaliseres. Prediкtionerne vægtes med historik_vægte. Alle valg
+        beregnes i ét vektoriseret skridt over valg × parti arrays. Valg hvor
+        ingen af de optalte valgsteder findes, indgår ikke.
+
+        Args:
+            nuværende_valg_data: DataFrame med data fra nuværende valg
+            optalte_valgsteder: Liste af valgsteder der er optalt
+
+        Returns:
+            Dictionary med parti_bogstav -> prediкeret procent
+        """
+        if self.historik is None:
+            raise ValueError("Modellen er ikke initialiseret med historiske_valg")
+
+        historik = self.historik
+
+        # p_i: stemmer for optalte valgsteder (nuværende valg)
+        filtreret_data = nuværende_valg_data[nuværende_valg_data['Valgsted'].isin(optalte_valgsteder)]
+        if len(filtreret_data) == 0:
+            raise ValueError(f"Ingen data fundet for valgstederne: {optalte_valgsteder}")
+        p_stemmer = filtreret_data.groupby('Parti_bogstav')['Stemmer'].sum()
+
+        # Fælles partiakse: historikkens partier efterfulgt af helt nye partier
+        partier = historik.partier + [p for p in p_stemmer.index if p not in historik.parti_index]
+        antal_ekstra = len(partier) - len(historik.partier)
+
+        p = p_stemmer.reindex(partier, fill_value=0).to_numpy(dtype=float)
+        p = p / p.sum() * 100
+
+        # q_e,i og r_e,i for alle valg på én gang: (valg, parti)
+        q = np.pad(historik.summer_for_valgsteder(optalte_valgsteder), ((0, 0), (0, antal_ekstra)))
+        r = np.pad(historik.samlet, ((0, 0), (0, antal_ekstra)))
+
+        har_data = q.sum(axis=1) > 0
+        if not har_data.any():
+            raise ValueError(f"Ingen historiske data for valgstederne: {optalte_valgsteder}")
+
+        q = q[har_data] / q[har_data].sum(axis=1, keepdims=True) * 100
+        r = r[har_data] / r[har_data].sum(axis=1, keepdims=True) * 100
+        vægte = self.historik_vægte[har_data]
+
+        # Samme regler som prediкer(): swing hvor q > 0, ellers p (eller r)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            swing_pred = np.where(q > 0, r * p / q, np.where(p > 0, p, r))
+
+        # Partier uden forrige resultat eller markeret som nye: brug p direkte
+        nye = np.array([parti in self.nye_partier for parti in partier])
+        swing_pred = np.where(nye | (r == 0), p, swing_pred)
+
+        swing_pred = swing_pred / swing_pred.sum(axis=1, keepdims=True) * 100
+        blandet = vægte @ swing_pred / vægte.sum()
+
+        # Partier uden stemmer i nogen kilde udelades som i prediкer()
+        medtag = (p > 0) | (~nye & (r > 0).any(axis=0))
+        return {
+            parti: float(pct)
+            for parti, pct, med in zip(partier, blandet, medtag)
+            if med
+        }
+
     def prediкer_fra_csv(
         self,
         nuværende_valg_csv: str,
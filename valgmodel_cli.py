@@ -0,0 +1,320 @@
+"""
+Samlet kommandolinje til valgmodellen.
+
+    ./valgmodel predict --nu live_data.csv
+    ./valgmodel watch live_data/ --kontrolpunkt kontrolpunkt.npz --eksport eksport/
+    ./valgmodel serve --live live_data/ --processer 4
+    ./valgmodel replay --mappe live_data/ --hastighed 5
+    ./valgmodel bench --start-server --klienter 2000
+
+(eller python valgmodel_cli.py ...). Modellen, pandas og numpy importeres
+først i den underkommando der bruger dem, så --help og serve fra disk starter
+uden at indlæse dem.
+"""
+
+import argparse
+import os
+import sys
+from typing import List, Tuple
+
+MAPPE = os.path.dirname(os.path.abspath(__file__))
+CSV_2021 = os.path.join(MAPPE, "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv")
+
+
+def _liste(tekst: str) -> List[str]:
+    """Parser en kommasepareret liste som 'M,N,Æ,Q'."""
+    return [del_.strip() for del_ in tekst.split(',') if del_.strip()]
+
+
+def _swing(tekst: str) -> dict:
+    """Parser swing angivet som 'Ø=1.25,A=0.85'."""
+    swing = {}
+    for del_ in _liste(tekst):
+        parti, faktor = del_.split('=')
+        swing[parti.strip()] = float(faktor)
+    return swing
+
+
+def _valg(tekst: str) -> Tuple[str, str, int]:
+    """Parser et ekstra valg angivet som 'regional=rv2021.csv:41' (mandater er valgfrit)."""
+    navn, _, csv_fil = tekst.partition('=')
+    if not navn or not csv_fil:
+        raise argparse.ArgumentTypeError(f"Forventede NAVN=CSV[:MANDATER], fik '{tekst}'")
+    mandater = 55
+    sti, _, antal = csv_fil.rpartition(':')
+    if sti and antal.isdigit():
+        csv_fil, mandater = sti, int(antal)
+    return navn.strip(), csv_fil, mandater
+
+
+def _model(args):
+    """Valgmodel med forrige valg og nye partier fra argumenterne."""
+    from valgmodel import Valgmodel
+    from generate_live_data import NYE_PARTIER
+
+    nye_partier = NYE_PARTIER if args.nye_partier is None else args.nye_partier
+    return Valgmodel(args.forrige, nye_partier=nye_partier)
+
+
+def _tilføj_model_argumenter(parser: argparse.ArgumentParser):
+    parser.add_argument('--forrige', default=CSV_2021, help="CSV med forrige valg")
+    parser.add_argument('--nye-partier', type=_liste, default=None,
+                        help="Partier der behandles som nye, f.eks. 'M,N,Æ,Q'")
+
+
+def _predict(args) -> int:
+    from generate_live_data import generer_live_data, gem_live_data_json
+
+    model = _model(args)
+    data = generer_live_data(model, args.nu or args.forrige, args.mandater)
+    gem_live_data_json(data, args.output)
+
+    metadata = data['metadata']
+    print(f"Live data genereret og gemt i {args.output}")
+    print("\nMetadata:")
+    print(f"  Total mandater: {metadata['total_mandater']}")
+    print(f"  Optalt: {metadata['antal_optalte_valgsteder']} valgsteder ({metadata['procent_optalt']:.1f}%)")
+    print("\nTop 3 partier:")
+    for parti in data['partier'][:3]:
+        print(f"  {parti['bogstav']}: {parti['mandater']} mandater ({parti['procent']:.2f}%)")
+    return 0
+
+
+def _watch(args) -> int:
+    from valgnat_workflow import watch_and_update
+    from feedindlaesning import er_feed
+
+    if len(args.live) > 1 and not er_feed(args.live):
+        print("Flere kilder understøttes kun når de alle er HTTP-feeds")
+        return 2
+    live = args.live[0] if len(args.live) == 1 else args.live
+    if args.valg:
+        if er_feed(live):
+            print("HTTP-feeds understøttes ikke sammen med --valg")
+            return 2
+        args.live = live
+        return _watch_flere_valg(args)
+    watch_and_update(_model(args), live, args.output, args.interval,
+                     args.arbejdere, args.kontrolpunkt, args.eksport, args.bootstrap, args.karantæne)
+    return 0
+
+
+def _watch_flere_valg(args) -> int:
+    from valgmodel import Valgmodel
+    from mandatfordeling import Mandatfordeling, KØBENHAVN_VALGFORBUND, uden_valgforbund
+    from flervalg import Valgopsætning
+    from valgnat_workflow import watch_flere_valg
+
+    if args.kontrolpunkt or args.eksport:
+        print("--kontrolpunkt og --eksport understøttes ikke sammen med --valg")
+        return 2
+
+    # Kommunalvalget fra --forrige, de øvrige valg uden valgforbund
+    rod, endelse = os.path.splitext(args.output)
+    valg = {"kommunal": Valgopsætning(_model(args), Mandatfordeling(KØBENHAVN_VALGFORBUND), 55, args.output)}
+    for navn, csv_fil, mandater in args.valg:
+        model = Valgmodel(os.path.abspath(csv_fil))
+        valg[navn] = Valgopsætning(model, Mandatfordeling(uden_valgforbund(model.forrige_valg_samlet)),
+                                   mandater, f"{rod}_{navn}{endelse}")
+
+    watch_flere_valg(valg, args.live, args.interval, args.arbejdere, args.bootstrap, args.karantæne)
+    return 0
+
+
+def _serve(args) -> int:
+    # Stier angives i forhold til hvor kommandoen køres, men serveren
+    # serverer HTML'en fra sin egen mappe
+    for navn in ('live', 'forrige', 'prognose_fil', 'kontrolpunkt', 'eksport'):
+        if getattr(args, navn) and not getattr(args, navn).startswith(('http://', 'https://')):
+            setattr(args, navn, os.path.abspath(getattr(args, navn)))
+    os.chdir(args.mappe)
+
+    import serve_live
+
+    serve_live.PORT = args.port
+    if args.browser:
+        import threading
+        threading.Thread(target=serve_live.open_browser, daemon=True).start()
+
+    if args.bus:
+        # Serverprocesser over en resultatbus fra en pipeline der allerede kører
+        processer = serve_live.start_serverprocesser(args.bus, args.processer, port=args.port,
+                                                     prognose_fil=args.prognose_fil)
+        print(f"{args.processer} serverprocesser kører på http://localhost:{args.port}/")
+        try:
+            for proces in processer:
+                proces.join()
+        except KeyboardInterrupt:
+            for proces in processer:
+                proces.terminate()
+                proces.join()
+        return 0
+
+    if args.live:
+        serve_live.start_live_server(
+            _model(args), args.live, interval=args.interval, antal_processer=args.processer,
+            port=args.port, prognose_fil=args.prognose_fil, kontrolpunkt=args.kontrolpunkt,
+            eksport=args.eksport, bootstrap=args.bootstrap
+        )
+        return 0
+
+    print("="*70)
+    print("LIVE MANDATFORDELING SERVER")
+    print("="*70)
+    serve_live.start_server(port=args.port)
+    return 0
+
+
+def _replay(args) -> int:
+    from genafspil_valgnat import lav_valgnat, genafspil
+
+    if args.live_csv is None and args.mappe is None:
+        args.live_csv = "live_data.csv"
+
+    valgnat = lav_valgnat(args.csv, args.swing, args.støj, seed=args.seed)
+    genafspil(valgnat, live_csv=args.live_csv, mappe=args.mappe, hastighed=args.hastighed)
+    return 0
+
+
+def _bench(args) -> int:
+    import asyncio
+    import signal
+    import tempfile
+    import threading
+    from belastningstest import hæv_filgrænse, kør_server, vent_på_server, kør_belastning
+
+    hæv_filgrænse()
+
+    server = None
+    with tempfile.TemporaryDirectory() as mappe:
+        if args.start_server:
+            import multiprocessing
+            from genafspil_valgnat import lav_valgnat, genafspil
+
+            server = multiprocessing.Process(
+                target=kør_server, args=(args.csv, mappe, args.port, args.processer), daemon=True
+            )
+            server.start()
+            vent_på_server(args.port)
+
+            valgnat = lav_valgnat(args.csv)
+            threading.Thread(
+                target=genafspil,
+                kwargs=dict(valgnat=valgnat, mappe=mappe, hastighed=args.hastighed, vis_status=False),
+                daemon=True
+            ).start()
+
+        print(f"Kører {args.klienter} dashboards og {args.sse} SSE-abonnenter i {args.varighed:.0f} s "
+              f"mod {args.vært}:{args.port}...")
+        try:
+            resultat = asyncio.run(kør_belastning(
+                args.vært, args.port, args.klienter, args.varighed, args.interval, args.sse
+            ))
+            resultat.print_rapport()
+        finally:
+            if server is not None:
+                # Ctrl+C i serveren, så den lukker pænt ned
+                os.kill(server.pid, signal.SIGINT)
+                server.join(timeout=10)
+                if server.is_alive():
+                    server.terminate()
+    return 0
+
+
+def byg_parser() -> argparse.ArgumentParser:
+    """Parser med alle underkommandoer."""
+    parser = argparse.ArgumentParser(prog="valgmodel", description="Live valgmodel til valgnatten")
+    underkommandoer = parser.add_subparsers(dest="kommando", required=True, metavar="kommando")
+
+    p = underkommandoer.add_parser('predict', help="Prediкer ud fra en CSV og gem live_data.json")
+    _tilføj_model_argumenter(p)
+    p.add_argument('--nu', help="CSV med de optalte valgsteder (standard: --forrige)")
+    p.add_argument('--output', default="live_data.json", help="JSON-fil der skrives")
+    p.add_argument('--mandater', type=int, default=55, help="Antal mandater")
+    p.set_defaults(funktion=_predict)
+
+    p = underkommandoer.add_parser('watch', help="Overvåg en live CSV (eller mappe) og opdater JSON")
+    _tilføj_model_argumenter(p)
+    p.add_argument('live', nargs='+',
+                   help="Live CSV, mappe med én fil per valgsted eller én eller flere HTTP-feed URL'er")
+    p.add_argument('--output', default="live_data.json", help="JSON-fil der skrives")
+    p.add_argument('--interval', type=float, default=5.0, help="Sekunder mellem opdateringer")
+    p.add_argument('--arbejdere', type=int, default=None, help="Processer der parser valgstedsfiler")
+    p.add_argument('--kontrolpunkt', help="Kontrolpunkt der gemmes og genoptages fra")
+    p.add_argument('--eksport', help="Mappe som valgsteder og prognoser eksporteres til som Parquet")
+    p.add_argument('--bootstrap', type=int, default=0,
+                   help="Bootstrap-gentagelser for konfidensintervaller i metadata (0 = ingen)")
+    p.add_argument('--karantæne', type=float, default=None, metavar='GRÆNSE',
+                   help="Hold valgsteder der afviger mere end GRÆNSE robuste standardafvigelser "
+                        "fra det forventede i karantæne (f.eks. 6)")
+    p.add_argument('--valg', type=_valg, action='append', default=[],
+                   help="Ekstra valg fra samme indlæsning, f.eks. 'regional=rv2021.csv:41' "
+                        "(rækkerne vælges med kolonnen Valg; kommunalvalget er standard)")
+    p.set_defaults(funktion=_watch)
+
+    p = underkommandoer.add_parser('serve', help="Server dashboardet (fra disk, live eller fra en resultatbus)")
+    _tilføj_model_argumenter(p)
+    p.add_argument('--port', type=int, default=8000)
+    p.add_argument('--live', help="Kør opdateringen i serveren over denne live CSV, mappe eller feed-URL")
+    p.add_argument('--bus', help="Server fra en resultatbus som en kørende pipeline skriver til")
+    p.add_argument('--interval', type=float, default=1.0, help="Sekunder mellem indlæsninger (med --live)")
+    p.add_argument('--processer', type=int, default=1, help="Serverprocesser (med --live eller --bus)")
+    p.add_argument('--prognose-fil', default="prognosehistorik.bin",
+                   help="Tidsserie over publicerede prognoser (med --live eller --bus)")
+    p.add_argument('--kontrolpunkt', help="Kontrolpunkt der gemmes og genoptages fra (med --live)")
+    p.add_argument('--eksport', help="Mappe som valgsteder og prognoser eksporteres til som Parquet (med --live)")
+    p.add_argument('--bootstrap', type=int, default=0,
+                   help="Bootstrap-gentagelser for konfidensintervaller i metadata (med --live)")
+    p.add_argument('--mappe', default=MAPPE, help="Mappe med live_mandatfordeling.html")
+    p.add_argument('--browser', action='store_true', help="Åbn dashboardet i browseren")
+    p.set_defaults(funktion=_serve)
+
+    p = underkommandoer.add_parser('replay', help="Genafspil en valgnat til test")
+    p.add_argument('--csv', default=CSV_2021, help="Valgdata der genafspilles")
+    p.add_argument('--live-csv', help="Skriv til én voksende live CSV")
+    p.add_argument('--mappe', help="Skriv én fil per valgsted i denne mappe")
+    p.add_argument('--hastighed', type=float, default=1.0,
+                   help="Valgsteder per sekund (0 = så hurtigt som muligt)")
+    p.add_argument('--swing', type=_swing, default={}, help="Swing per parti, f.eks. 'Ø=1.25,A=0.85'")
+    p.add_argument('--støj', type=float, default=0.05, help="Lokal variation i swing")
+    p.add_argument('--seed', type=int, default=None)
+    p.set_defaults(funktion=_replay)
+
+    p = underkommandoer.add_parser('bench', help="Belastningstest af live-serveren (kun localhost)")
+    p.add_argument('--vært', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8000)
+    p.add_argument('--klienter', type=int, default=1000, help="Antal dashboards")
+    p.add_argument('--sse', type=int, default=0, help="Antal SSE-abonnenter")
+    p.add_argument('--varighed', type=float, default=60.0, help="Sekunder testen kører")
+    p.add_argument('--interval', type=float, default=5.0, help="Sekunder mellem hvert dashboards forespørgsler")
+    p.add_argument('--start-server', action='store_true',
+                   help="Start selv en live-server drevet af en genafspillet valgnat")
+    p.add_argument('--processer', type=int, default=1, help="Serverprocesser (med --start-server)")
+    p.add_argument('--csv', default=CSV_2021, help="Valgdata der genafspilles (med --start-server)")
+    p.add_argument('--hastighed', type=float, default=2.0,
+                   help="Valgsteder per sekund i genafspilningen (med --start-server)")
+    p.set_defaults(funktion=_bench)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Kører en underkommando.
+
+    Args:
+        argv: Argumenter (standard: sys.argv[1:])
+
+    Returns:
+        Exitkode
+    """
+    args = byg_parser().parse_args(argv)
+    try:
+        return args.funktion(args)
+    except KeyboardInterrupt:
+        print("\n\nAfsluttet.")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,74 +9,174 @@ Dette script viser hvordan du bruger systemet på valgnatten:
 """
 
 from valgmodel import Valgmodel
-from generate_live_data import generer_live_data, gem_live_data_json, NYE_PARTIER
+from opdateringspipeline import Opdateringspipeline, Version
+from stakprofil import installer_signal
+from kolonneeksport import åbn_eksport
+from anomali import Anomalitjek
+from feedindlaesning import er_feed
 import time
 import os
+from typing import TYPE_CHECKING, Dict, List, Union
+
+if TYPE_CHECKING:
+    from flervalg import Valgopsætning
+
+
+def _anomalitjek(grænse: float = None):
+    """Anomalitjek med karantæne over grænsen (None = intet tjek)."""
+    if grænse is None:
+        return None
+    print(f"Valgsteder med afvigelse over {grænse:g} holdes i karantæne")
+    return Anomalitjek(grænse)
 
 
 def watch_and_update(
     model: Valgmodel,
-    live_csv_path: str,
+    live_csv_path: Union[str, List[str]],
     output_json: str = "live_data.json",
-    interval: int = 5
+    interval: int = 5,
+    antal_arbejdere: int = None,
+    kontrolpunkt: str = None,
+    eksport: str = None,
+    bootstrap: int = 0,
+    anomaligrænse: float = None
 ):
     """
     Overvåger live CSV fil og opdaterer JSON automatisk.
 
+    Opdateringen kører som en trinopdelt pipeline (indlæsning → beregning →
+    publicering), hvor kun den nyeste version behandles i hvert trin. Et
+    langsomt trin forsinker derfor aldrig indlæsningen af nye data.
+
+    Hvis live_csv_path er en mappe, læses den som én fil per valgsted: nye
+    filer parses parallelt og lægges ind i ét samlet skridt per gennemløb.
+    HTTP-feeds polles over vedvarende forbindelser med betingede
+    forespørgsler, så kun ændrede feeds hentes og parses.
+
     Args:
         model: Valgmodel instans
-        live_csv_path: Sti til live CSV fil (opdateres af valgsystem)
+        live_csv_path: Sti til live CSV fil (opdateres af valgsystem), mappe
+                       med én fil per valgsted, eller URL (eller liste af
+                       URL'er) til HTTP-feeds
         output_json: Output JSON fil som HTML'en læser
         interval: Sekunder mellem opdateringer
+        antal_arbejdere: Antal processer der parser valgstedsfiler (kun mappe)
+        kontrolpunkt: Fil med kontrolpunkt af den levende tilstand. Findes den
+                      allerede (efter et nedbrud), genoptages der derfra
+        eksport: Mappe som valgstederne og alle publicerede prognoser
+                 eksporteres til som Parquet (kræver pyarrow)
+        bootstrap: Antal bootstrap-gentagelser for konfidensintervaller
+                   (0 = ingen intervaller)
+        anomaligrænse: Valgsteder der afviger mere end dette (i robuste
+                       standardafvigelser) holdes i karantæne (None = intet tjek)
+
+    SIGUSR1 slår en indbygget stakprøvetager til og fra (se stakprofil.py),
+    så en langsom opdatering kan profileres uden at stoppe den.
     """
     print("="*70)
     print("VALGNAT LIVE OPDATERING")
     print("="*70)
-    print(f"\nOvervåger: {live_csv_path}")
+    if er_feed(live_csv_path):
+        urls = [live_csv_path] if isinstance(live_csv_path, str) else live_csv_path
+        print(f"\nOvervåger {len(urls)} HTTP-feed" + ("s" if len(urls) > 1 else "") + ": " + ", ".join(urls))
+    else:
+        print(f"\nOvervåger: {live_csv_path}" + (" (mappe)" if os.path.isdir(live_csv_path) else ""))
     print(f"Output: {output_json}")
     print(f"Opdatering hver {interval} sekund")
     print("\nTryk Ctrl+C for at stoppe\n")
 
-    last_mtime = 0
+    def ved_publicering(data: dict, version: Version, forsinkelse: float):
+        print(f"[{time.strftime('%H:%M:%S')}] Version {version.nummer} publiceret "
+              f"({forsinkelse * 1000:.0f} ms efter indlæsning)")
+        _vis_status(data)
+
+    kolonneeksport = åbn_eksport(eksport)
+    pipeline = Opdateringspipeline(
+        model,
+        live_csv_path,
+        output_json,
+        total_mandater=55,
+        interval=interval,
+        antal_arbejdere=antal_arbejdere,
+        ved_publicering=ved_publicering,
+        kolonneeksport=kolonneeksport,
+        bootstrap=bootstrap,
+        anomalitjek=_anomalitjek(anomaligrænse),
+        kontrolpunkt=kontrolpunkt
+    )
+    if pipeline.log.antal_optalte > 0:
+        print(f"Genoptaget fra {kontrolpunkt}: {pipeline.log.antal_optalte} valgsteder optalt\n")
+    if installer_signal() is not None:
+        print(f"Profilér i 30 s med: kill -USR1 {os.getpid()}\n")
 
     try:
-        while True:
-            # Check om CSV'en er opdateret
-            if os.path.exists(live_csv_path):
-                current_mtime = os.path.getmtime(live_csv_path)
+        pipeline.kør()
+    except KeyboardInterrupt:
+        print("\n\nAfslutter overvågning...")
+    finally:
+        if kolonneeksport is not None:
+            kolonneeksport.luk()
+
+
+def watch_flere_valg(
+    valg: Dict[str, "Valgopsætning"],
+    live_sti: str,
+    interval: int = 5,
+    antal_arbejdere: int = None,
+    bootstrap: int = 0,
+    anomaligrænse: float = None
+):
+    """
+    Overvåger live data for flere valg på én gang (f.eks. kommunal og regional).
 
-                if current_mtime != last_mtime:
-                    last_mtime = current_mtime
+    Hver valgstedsfil parses én gang, og stemmerne fordeles på valgene efter
+    kolonnen Valg. Hvert valg har sin egen model, mandatfordeling og JSON-fil.
 
-                    print(f"[{time.strftime('%H:%M:%S')}] Ny data detekteret - opdaterer...")
+    Args:
+        valg: Dictionary med valgets navn -> Valgopsætning
+        live_sti: Sti til live CSV eller mappe med én fil per valgsted
+        interval: Sekunder mellem opdateringer
+        antal_arbejdere: Antal processer der parser valgstedsfiler (kun mappe)
+        bootstrap: Antal bootstrap-gentagelser for konfidensintervaller
+        anomaligrænse: Grænse for karantæne af afvigende valgsteder (None = intet tjek)
+    """
+    from flervalg import Flervalgspipeline
 
-                    try:
-                        # Generer ny JSON
-                        data = generer_live_data(model, live_csv_path, 55)
-                        gem_live_data_json(data, output_json)
+    print("="*70)
+    print("VALGNAT LIVE OPDATERING - FLERE VALG")
+    print("="*70)
+    print(f"\nOvervåger: {live_sti}" + (" (mappe)" if os.path.isdir(live_sti) else ""))
+    for navn, opsætning in valg.items():
+        print(f"  {navn}: {opsætning.total_mandater} mandater → {opsætning.output_json}")
+    print(f"Opdatering hver {interval} sekund")
+    print("\nTryk Ctrl+C for at stoppe\n")
 
-                        # Vis status
-                        pct = data['metadata']['procent_optalt']
-                        antal = data['metadata']['antal_optalte_valgsteder']
-                        print(f"  ✓ Opdateret: {antal} valgsteder optalt ({pct:.1f}%)")
+    def ved_publicering(navn: str, data: dict, version: Version, forsinkelse: float):
+        print(f"[{time.strftime('%H:%M:%S')}] {navn}: version {version.nummer} publiceret "
+              f"({forsinkelse * 1000:.0f} ms efter indlæsning)")
+        _vis_status(data)
 
-                        # Vis top 3
-                        print("  Top 3 partier:")
-                        for parti in data['partier'][:3]:
-                            print(f"    {parti['bogstav']}: {parti['mandater']} mandater")
+    pipeline = Flervalgspipeline(live_sti, valg, interval=interval, antal_arbejdere=antal_arbejdere,
+                                 ved_publicering=ved_publicering, bootstrap=bootstrap,
+                                 anomalitjek=_anomalitjek(anomaligrænse))
+    installer_signal()
 
-                    except Exception as e:
-                        print(f"  ✗ Fejl: {e}")
-                else:
-                    print(f"[{time.strftime('%H:%M:%S')}] Ingen nye data...", end='\r')
+    try:
+        pipeline.kør()
+    except KeyboardInterrupt:
+        print("\n\nAfslutter overvågning...")
 
-            else:
-                print(f"[{time.strftime('%H:%M:%S')}] Venter på CSV fil...", end='\r')
 
-            time.sleep(interval)
+def _vis_status(data: dict):
+    """Printer status efter en opdatering."""
+    pct = data['metadata']['procent_optalt']
+    antal = data['metadata']['antal_optalte_valgsteder']
+    print(f"  ✓ Opdateret: {antal} valgsteder optalt ({pct:.1f}%)")
 
-    except KeyboardInterrupt:
-        print("\n\nAfslutter overvågning...")
+    # Vis top 3
+    print("  Top 3 partier:")
+    for parti in data['partier'][:3]:
+        print(f"    {parti['bogstav']}: {parti['mandater']} mandater")
 
 
 def simpel_workflow():
@@ -132,28 +232,12 @@ gem_live_data_json(data, "live_data.json")
 
 
 if __name__ == "__main__":
-    simpel_workflow()
-
-    print("\n\nVil du overvåge en live CSV fil nu?")
-    print("Dette kræver at du har en live_data.csv fil.")
-    print("\nTryk Enter for at fortsætte eller Ctrl+C for at stoppe...")
-
-    try:
-        input()
-
-        # Brug 2021 data som eksempel
-        model = Valgmodel(
-            "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
-            nye_partier=NYE_PARTIER
-        )
-
-        # Overvåg filen
-        watch_and_update(
-            model,
-            "Kommunalvalg_2021_København_17-11-2025 20.11.26.csv",
-            "live_data.json",
-            5
-        )
-
-    except KeyboardInterrupt:
-        print("\n\nAfsluttet.")
+    import sys
+    from valgmodel_cli import main
+
+    if len(sys.argv) == 1:
+        simpel_workflow()
+        print("Overvåg en live CSV (eller mappe) med:")
+        print("    ./valgmodel watch live_data.csv\n")
+        sys.exit(0)
+    sys.exit(main(["watch", *sys.argv[1:]]))
@@ -0,0 +1,168 @@
+"""
+Omlægning af afstemningsområder mellem to valg.
+
+Afstemningsområder bliver lagt sammen, delt og omdøbt mellem valgene. En
+valgstedsnøgle beskriver hvordan forrige valgs afstemningsområder fordeler
+sig på de nuværende:
+
+    Forrige_valgsted;Nuværende_valgsted;Andel
+    3. 1. Vesterbro;3. 1. Vesterbro Nord;0.6
+    3. 1. Vesterbro;3. 2. Vesterbro Syd;0.4
+    7. 2. Valby;7. 1. Valby;1
+
+Andel er den del af det forrige afstemningsområdes stemmer der tilfalder
+det nuværende. Afstemningsområder der ikke står i nøglen beholder deres navn.
+
+Nøglen kompileres til en sparse matrix T (nuværende × forrige), og forrige
+valgs valgsted × parti matrix omregnes én gang ved indlæsning: F_ny = T · F.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+
+class Valgstedsnøgle:
+    """
+    Korrespondance mellem forrige og nuværende valgs afstemningsområder.
+    """
+
+    def __init__(self, overgange: List[Tuple[str, str, float]]):
+        """
+        Initialiserer nøglen.
+
+        Args:
+            overgange: Liste af (forrige_valgsted, nuværende_valgsted, andel)
+        """
+        self.overgange = list(overgange)
+
+        # Tjek at intet afstemningsområde fordeles mere end én gang
+        samlet_andel: Dict[str, float] = {}
+        for forrige, _, andel in self.overgange:
+            if andel < 0:
+                raise ValueError(f"Negativ andel for valgstedet: {forrige}")
+            samlet_andel[forrige] = samlet_andel.get(forrige, 0.0) + andel
+
+        overfordelt = [v for v, andel in samlet_andel.items() if andel > 1 + 1e-9]
+        if overfordelt:
+            raise ValueError(f"Andelene summer til mere end 1 for valgstederne: {overfordelt}")
+
+    def fingeraftryk(self) -> str:
+        """
+        Fingeraftryk af overgangene (uafhængigt af rækkefølgen).
+
+        Bruges til at genkende data der er omregnet med den samme nøgle,
+        f.eks. i en gemt valghistorik.
+        """
+        tekst = repr(sorted((forrige, nuværende, float(andel)) for forrige, nuværende, andel in self.overgange))
+        return hashlib.sha1(tekst.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def fra_csv(cls, csv_fil: str) -> "Valgstedsnøgle":
+        """
+        Indlæser en valgstedsnøgle fra CSV.
+
+        Args:
+            csv_fil: Sti til semikolon-separeret CSV med kolonnerne
+                     Forrige_valgsted, Nuværende_valgsted og Andel
+
+        Returns:
+            Valgstedsnøgle instans
+        """
+        df = pd.read_csv(csv_fil, sep=';', encoding='utf-8-sig')
+        return cls(zip(
+            df['Forrige_valgsted'],
+            df['Nuværende_valgsted'],
+            df['Andel'].astype(float)
+        ))
+
+    def kompiler(
+        self,
+        forrige_valgsteder: List[str]
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Kompilerer nøglen til en sparse matrix i koordinatformat.
+
+        Afstemningsområder der ikke står i nøglen overføres uændret.
+
+        Args:
+            forrige_valgsteder: Forrige valgs afstemningsområder (matricens søjler)
+
+        Returns:
+            Tuple med:
+            - Liste af nuværende afstemningsområder (matricens rækker)
+            - Rækkeindeks for hvert element
+            - Søjleindeks for hvert element
+            - Vægt for hvert element
+        """
+        forrige_index = {v: i for i, v in enumerate(forrige_valgsteder)}
+        i_nøglen = {forrige for forrige, _, _ in self.overgange}
+
+        nuværende_valgsteder: List[str] = []
+        nuværende_index: Dict[str, int] = {}
+        rækker, søjler, vægte = [], [], []
+
+        def tilføj(forrige: str, nuværende: str, andel: float):
+            if nuværende not in nuværende_index:
+                nuværende_index[nuværende] = len(nuværende_valgsteder)
+                nuværende_valgsteder.append(nuværende)
+            rækker.append(nuværende_index[nuværende])
+            søjler.append(forrige_index[forrige])
+            vægte.append(andel)
+
+        for forrige in forrige_valgsteder:
+            if forrige not in i_nøglen:
+                tilføj(forrige, forrige, 1.0)
+
+        for forrige, nuværende, andel in self.overgange:
+            # Nøglen kan dække afstemningsområder der ikke er i datasættet
+            if forrige in forrige_index:
+                tilføj(forrige, nuværende, andel)
+
+        return (
+            nuværende_valgsteder,
+            np.array(rækker, dtype=np.intp),
+            np.array(søjler, dtype=np.intp),
+            np.array(vægte, dtype=float)
+        )
+
+    def anvend(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Omregner forrige valgs data til de nuværende afstemningsområder.
+
+        Args:
+            data: DataFrame med valgdata (som fra Valgmodel._load_data)
+
+        Returns:
+            DataFrame i samme format med nuværende afstemningsområder
+        """
+        matrix = data.pivot_table(
+            index='Valgsted',
+            columns='Parti_bogstav',
+            values='Stemmer',
+            aggfunc='sum',
+            fill_value=0
+        )
+        parti_navne = data.groupby('Parti_bogstav')['Parti_navn'].first()
+
+        valgsteder, rækker, søjler, vægte = self.kompiler(list(matrix.index))
+
+        # F_ny = T · F, beregnet direkte fra koordinatformatet
+        forrige = matrix.to_numpy(dtype=float)
+        ny = np.zeros((len(valgsteder), forrige.shape[1]))
+        np.add.at(ny, rækker, forrige[søjler] * vægte[:, None])
+
+        result = pd.DataFrame(ny, index=valgsteder, columns=matrix.columns)
+        result.index.name = 'Valgsted'
+        result = result.stack().reset_index()
+        result.columns = ['Valgsted', 'Parti_bogstav', 'Stemmer']
+        result = result[result['Stemmer'] > 0]
+
+        # Behold heltal når nøglen kun omdøber og lægger sammen
+        if np.all(vægte == 1.0):
+            result['Stemmer'] = result['Stemmer'].round().astype(int)
+
+        result.insert(2, 'Parti_navn', result['Parti_bogstav'].map(parti_navne))
+
+        return result.reset_index(drop=True)